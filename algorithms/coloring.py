@@ -1,68 +1,59 @@
+import heapq
+
+from radiograph import tracing
+from radiograph.distance import adjacency_from_pairs, within_range_pairs
+from radiograph.spatial import SpatialHash
 from radiograph.system import is_not_out_of_range
+from algorithms.components import color_components
+from algorithms.strategies import get_strategy
 
-def add_edge(adj, v, w):
-    if w not in adj[v]:
-        adj[v].append(w)
-    if v not in adj[w]:
-        adj[w].append(v)  
-    return adj
- 
-#Time Complexity: O(V^2 + E), in worst case.
-#https://www.geeksforgeeks.org/graph-coloring-set-2-greedy-algorithm/
-# Assigns colors (starting from 0) to all vertices and prints the assignment of colors
-def find_coloring(adj, V):
-     
-    result = [-1] * V
- 
-    # Assign the first color to first vertex
-    result[0] = 0;
- 
-    # A temporary array to store the available colors. 
-    # True value of available[cr] would mean that the color cr is assigned to one of its adjacent vertices
-    available = [False] * V
- 
-    # Assign colors to remaining V-1 vertices
-    for u in range(1, V):
-         
-        # Process all adjacent vertices and flag their colors as unavailable
-        for i in adj[u]:
-            if (result[i] != -1):
-                available[result[i]] = True
- 
-        # Find the first available color
-        cr = 0
-        while cr < V:
-            if (available[cr] == False):
-                break
-            cr += 1
-             
-        # Assign the found color
-        result[u] = cr 
- 
-        # Reset the values back to false for the next iteration
-        for i in adj[u]:
-            if (result[i] != -1):
-                available[result[i]] = False
-
-    return (V, result)
- 
-def allocate_with_coloring(colors, vertices, sim, verbose):
-
-    graph = [[] for _ in range(len(vertices))]
-    
-    for vert_index in range(len(vertices)):
-        for potential_neighbor_index in range(len(vertices)):
-            if vertices[vert_index] == vertices[potential_neighbor_index]:
-                continue
-            if is_not_out_of_range(vertices[vert_index], vertices[potential_neighbor_index], sim):
-                graph = add_edge(graph, vert_index, potential_neighbor_index)
-
-    (V, result) = find_coloring(graph, len(vertices))
-
-    num_colors_needed = max(result) + 1
+def build_interference_graph(vertices, sim):
+    """
+    Builds the interference graph of `vertices` as adjacency lists, with an edge between
+    every pair of users within transmit distance of each other.
+
+    Users are bucketed into a grid whose cells are `transmit_dist` wide, so each user is
+    only tested against the users in its own and neighbouring cells.  For a roughly uniform
+    placement this is O(V) distance checks rather than O(V^2), and the checks themselves
+    run as batched array operations rather than one Python call per pair.
+    """
+    positions = [(vertex.pos_x, vertex.pox_y) for vertex in vertices]
+    (i, j) = within_range_pairs(positions, sim.get_transmit_distance())
+    return adjacency_from_pairs(len(vertices), i, j)
+
+def allocate_with_coloring(colors, vertices, sim, verbose, graph=None, strategy="greedy", workers=1, cache=None):
+    """
+    Leases the frequencies of the authorized users in `colors` to the cognitive users in
+    `vertices` by coloring their interference graph.  If an `InterferenceGraph` that is
+    being kept up to date is passed as `graph`, its edges are reused instead of rebuilt.
+    Otherwise a `GraphCache` passed as `cache` supplies the graph, which it only builds if
+    it hasn't seen these positions before, and failing both the graph is built afresh.
+    `strategy` names a registered coloring strategy (see `algorithms.strategies`) or is a
+    coloring function itself.  With `workers` above 1, the connected components of the graph
+    are colored in parallel across that many processes; this only affects the coloring.
+    """
+    color_graph = get_strategy(strategy)
+
+    with tracing.phase("graph"):
+        if graph is None and cache is not None:
+            graph = cache.adjacency(vertices, sim)
+        elif graph is None:
+            graph = build_interference_graph(vertices, sim)
+        else:
+            graph = graph.adjacency(vertices)
+    if tracing.tracer is not None:
+        tracing.tracer.count(tracing.EDGES, sum(len(neighbors) for neighbors in graph) // 2)
+
+    with tracing.phase("coloring"):
+        if workers > 1:
+            (V, result) = color_components(graph, strategy, workers)
+        else:
+            (V, result) = color_graph(graph, len(vertices))
+
+    num_colors_needed = max(result, default=-1) + 1
+    tracing.count(tracing.COLORS, num_colors_needed)
 
     verts_by_color_index = [[] for _ in range(num_colors_needed)]
-    num_of_verts_by_color_index = [0] * num_colors_needed
 
     if verbose:
         print("Proposed Coloring:")
@@ -70,28 +61,107 @@ def allocate_with_coloring(colors, vertices, sim, verbose):
         if verbose:
             print(" Vertex", vertices[u], f" -> Color: {result[u]}")
         verts_by_color_index[result[u]].append(vertices[u])
-        num_of_verts_by_color_index[result[u]] += 1
 
     if verbose:
         print("Real Coloring:")
-    for color_we_have in colors:    
-        #Let's assign the next color_we_have to the color_index that has been assigned to the most vertices
-        max_number = max(num_of_verts_by_color_index)
-        color_index = num_of_verts_by_color_index.index(max_number)
-
-        if color_index == -1:
-            #We have successfully assigned all needed colors
-            break
-
-        #Remove from the running for the next iterations of the loop
-        num_of_verts_by_color_index[color_index] = -1
-
-        for vertex in verts_by_color_index[color_index]:
-            if verbose:
-                print(" Vertex", vertex, " -> Color", color_we_have.assigned_frequency, f"({color_we_have})")
-            color_we_have.grant_frequency(color_we_have.assigned_frequency, vertex)
-            vertex.begin_broadcasting(False)
-
-    for leftover_color_index in range(len(num_of_verts_by_color_index)):
-        if num_of_verts_by_color_index[leftover_color_index] != -1 and verbose:
+    assigned_color_indices = set()
+    with tracing.phase("lessor_assignment"):
+        for (color_we_have, color_index) in assign_color_classes(colors, verts_by_color_index, sim):
+            assigned_color_indices.add(color_index)
+
+            for vertex in verts_by_color_index[color_index]:
+                if verbose:
+                    print(" Vertex", vertex, " -> Color", color_we_have.assigned_frequency, f"({color_we_have})")
+                color_we_have.grant_frequency(color_we_have.assigned_frequency, vertex)
+                vertex.begin_broadcasting(False)
+
+    for leftover_color_index in range(num_colors_needed):
+        if leftover_color_index not in assigned_color_indices and verbose:
             print(f" Not enough colors to cover color {leftover_color_index}. {len(verts_by_color_index[leftover_color_index])} vertices left uncolored.")
+
+def assign_color_classes(lessors, verts_by_color_index, sim):
+    """
+    Matches color classes to the authorized users in `lessors`, each lessor taking at most
+    one class, and returns the matches as `(lessor, color_index)` pairs.
+
+    A class is worth its number of vertices, less any of them within range of the lessor,
+    since those would interfere with the lessor as soon as it takes its band back.  See
+    `match_color_classes` for how the matching is made.
+    """
+    conflicts = _lessor_conflicts(lessors, verts_by_color_index, sim)
+    sizes = [len(verts) for verts in verts_by_color_index]
+    matches = match_color_classes(sizes, len(lessors), lambda lessor_index, color_index: conflicts[lessor_index].get(color_index, 0))
+    return [(lessors[lessor_index], color_index) for (lessor_index, color_index) in matches]
+
+def match_color_classes(sizes, num_lessors, conflict_count):
+    """
+    Matches color classes of `sizes[c]` vertices to lessors numbered 0..num_lessors - 1,
+    where `conflict_count(l, c)` is how many vertices of class c are within range of lessor
+    l.  Returns the matches as `(lessor_index, color_index)` pairs.
+
+    Classes are matched greedily by weight through a heap: a popped class is re-pushed if
+    its best weight among the remaining lessors has dropped, and matched otherwise.  Ties go
+    to the lower color index and the earlier lessor, so with no spatial conflicts the
+    largest classes go to the first lessors in order.  Empty classes are never matched.
+    """
+    # The unmatched lessors are every index from `next_free` up, plus those in the min-heap
+    # `returned`, so only lessors that have actually been looked at are ever stored.
+    returned = []
+    next_free = 0
+    classes = [(-size, color_index) for color_index, size in enumerate(sizes) if size > 0]
+    heapq.heapify(classes)
+
+    matches = []
+    while classes and (returned or next_free < num_lessors):
+        (neg_weight, color_index) = heapq.heappop(classes)
+        size = sizes[color_index]
+
+        # Take free lessors in order until one has no conflict with this class, keeping the best.
+        popped = []
+        best = (-1, None)
+        while returned or next_free < num_lessors:
+            if returned:
+                lessor_index = heapq.heappop(returned)
+            else:
+                lessor_index = next_free
+                next_free += 1
+            popped.append(lessor_index)
+            weight = size - conflict_count(lessor_index, color_index)
+            if weight > best[0]:
+                best = (weight, lessor_index)
+            if weight == size:
+                break
+        (weight, lessor_index) = best
+
+        if weight < -neg_weight:
+            # Another class may now be worth more; try again once it has had its turn.
+            for index in popped:
+                heapq.heappush(returned, index)
+            heapq.heappush(classes, (-weight, color_index))
+            continue
+
+        for index in popped:
+            if index != lessor_index:
+                heapq.heappush(returned, index)
+        matches.append((lessor_index, color_index))
+
+    return matches
+
+def _lessor_conflicts(lessors, verts_by_color_index, sim):
+    """
+    For each lessor, counts the vertices of each color class within its range, as a sparse
+    dict from color index to count.
+    """
+    grid = SpatialHash(sim.get_transmit_distance() or 1)
+    for color_index, verts in enumerate(verts_by_color_index):
+        for vertex in verts:
+            grid.insert((color_index, vertex), vertex.pos_x, vertex.pox_y)
+
+    conflicts = []
+    for lessor in lessors:
+        counts = {}
+        for (color_index, vertex) in grid.nearby(lessor.pos_x, lessor.pox_y):
+            if is_not_out_of_range(lessor, vertex, sim):
+                counts[color_index] = counts.get(color_index, 0) + 1
+        conflicts.append(counts)
+    return conflicts
@@ -0,0 +1,90 @@
+from algorithms.strategies import get_strategy
+
+# Small components are shipped to worker processes in batches of about this many vertices,
+# so the per-task overhead is paid per batch rather than per component.
+DEFAULT_BATCH_VERTICES = 20_000
+
+def connected_components(adj):
+    """
+    Returns the connected components of the graph given by adjacency lists `adj`, each as
+    a list of vertex indices in ascending order.  Components are ordered by their lowest
+    vertex.
+    """
+    V = len(adj)
+    label = [-1] * V
+    components = []
+
+    for root in range(V):
+        if label[root] != -1:
+            continue
+        component_id = len(components)
+        label[root] = component_id
+        members = [root]
+        stack = [root]
+        while stack:
+            u = stack.pop()
+            for w in adj[u]:
+                if label[w] == -1:
+                    label[w] = component_id
+                    members.append(w)
+                    stack.append(w)
+        members.sort()
+        components.append(members)
+
+    return components
+
+def color_components(adj, strategy="greedy", workers=1, batch_vertices=DEFAULT_BATCH_VERTICES):
+    """
+    Colors each connected component of `adj` separately and merges the results, returning
+    `(V, result)` like a coloring strategy.  Components share no edges, so color k of one
+    component and color k of another together form a single valid color class.
+
+    With `workers` above 1 the components are colored in that many processes.  Isolated
+    vertices always get color 0 without leaving this process.  `strategy` must be a
+    registered name, or a module-level function, so it can be sent to the workers.
+    """
+    V = len(adj)
+    result = [-1] * V
+    batches = []
+    batch = []
+    batch_size = 0
+
+    for members in connected_components(adj):
+        if len(members) == 1:
+            result[members[0]] = 0
+            continue
+        batch.append(members)
+        batch_size += len(members)
+        if batch_size >= batch_vertices:
+            batches.append(batch)
+            batch = []
+            batch_size = 0
+    if batch:
+        batches.append(batch)
+
+    tasks = [(strategy, [_local_adjacency(adj, members) for members in batch]) for batch in batches]
+    if workers > 1 and len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            colorings = list(pool.map(_color_batch, tasks))
+    else:
+        colorings = [_color_batch(task) for task in tasks]
+
+    for batch, batch_colorings in zip(batches, colorings):
+        for members, local_result in zip(batch, batch_colorings):
+            for vertex, color in zip(members, local_result):
+                result[vertex] = color
+
+    return (V, result)
+
+def _local_adjacency(adj, members):
+    """
+    Returns the adjacency lists of one component, relabelled to 0..len(members) - 1.
+    """
+    local_index = {vertex: index for index, vertex in enumerate(members)}
+    return [[local_index[w] for w in adj[vertex]] for vertex in members]
+
+def _color_batch(task):
+    (strategy, component_adjs) = task
+    color_graph = get_strategy(strategy)
+    return [color_graph(component_adj, len(component_adj))[1] for component_adj in component_adjs]
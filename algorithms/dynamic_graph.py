@@ -0,0 +1,124 @@
+from radiograph.spatial import SpatialHash
+from radiograph.system import is_not_out_of_range
+
+class InterferenceGraph:
+    """
+    An interference graph that is kept up to date as users join, leave and move, rather
+    than rebuilt from scratch.  Each change only revisits the edges of the user involved,
+    found through a spatial hash with `transmit_dist`-wide cells, so the cost of a tick is
+    proportional to the number of users that changed rather than the whole population.
+    """
+    def __init__(self, sim, users=()):
+        self.sim = sim
+        self.grid = SpatialHash(sim.get_transmit_distance() or 1)
+        # Each user maps to a dict used as an insertion-ordered set of its neighbours.
+        self.neighbors = {}
+        for user in users:
+            self.add_user(user)
+
+    def __len__(self):
+        return len(self.neighbors)
+
+    def __contains__(self, user):
+        return user in self.neighbors
+
+    def add_user(self, user):
+        """
+        Adds an already placed `user` to the graph, connecting it to everyone in range.
+        """
+        if user in self.neighbors:
+            raise Exception(f"{user} is already part of the interference graph.")
+        self.neighbors[user] = {}
+        self._connect(user)
+        self.grid.insert(user, user.pos_x, user.pox_y)
+
+    def remove_user(self, user):
+        """
+        Removes `user` from the graph and from the simulation, freeing its position and id.
+        Any band it is on is released first, so it no longer blocks anyone from joining it.
+        """
+        self._disconnect(user)
+        self.grid.remove(user, user.pos_x, user.pox_y)
+        del self.neighbors[user]
+        _release_frequency(user)
+        self.sim.remove_user(user)
+
+    def move_user(self, user, x, y):
+        """
+        Moves `user` to (`x`, `y`), updating the simulation's occupied positions and
+        recomputing only the edges of `user`.
+        """
+        if x < 0 or y < 0:
+            raise Exception("x & y positions must not be negative.")
+        if user not in self.neighbors:
+            raise KeyError(f"{user} is not part of the interference graph.")
+        if (x, y) == user.position:
+            return
+
+        (old_x, old_y) = user.position
+        self.sim.move_pos(old_x, old_y, x, y)
+        self._disconnect(user)
+        self.grid.remove(user, old_x, old_y)
+        user.pos_x = x
+        user.pox_y = y
+        self._connect(user)
+        self.grid.insert(user, x, y)
+
+        for frequency in (getattr(user, "active_frequency", None), getattr(user, "assigned_frequency", None)):
+            if frequency is not None and user in frequency:
+                frequency.user_moved(user, old_x, old_y)
+
+    def are_neighbors(self, user1, user2):
+        """
+        Indicates whether two users in the graph are within range of each other.
+        """
+        return user2 in self.neighbors[user1]
+
+    def adjacency(self, vertices):
+        """
+        Returns the adjacency lists of the subgraph induced by `vertices`, indexed by position
+        in `vertices`, in the same form `build_interference_graph` produces.
+        """
+        index_of = {vertex: index for index, vertex in enumerate(vertices)}
+        return [
+            [index_of[neighbor] for neighbor in self.neighbors[vertex] if neighbor in index_of]
+            for vertex in vertices
+        ]
+
+    def _connect(self, user):
+        edges = self.neighbors[user]
+        for other in self.grid.nearby(user.pos_x, user.pox_y):
+            if is_not_out_of_range(user, other, self.sim):
+                edges[other] = None
+                self.neighbors[other][user] = None
+
+    def _disconnect(self, user):
+        for other in self.neighbors[user]:
+            del self.neighbors[other][user]
+        self.neighbors[user].clear()
+
+def _release_frequency(user):
+    """
+    Takes `user` off its band as if it had stopped broadcasting and given up any lease.  An
+    owner first revokes every lease on its band, then gives the band up.
+    """
+    if user.is_broadcasting:
+        user.stop_broadcasting()
+
+    frequency = getattr(user, "active_frequency", None)
+    if frequency is not None:
+        if user in frequency.lessees:
+            frequency.owner.revoke_frequency(user)
+        else:
+            frequency.user_unassigned(user)
+            user.set_frequency(None)
+
+    frequency = getattr(user, "assigned_frequency", None)
+    if frequency is not None:
+        for lessee in list(frequency.lessees):
+            if lessee.is_broadcasting:
+                lessee.stop_broadcasting()
+            user.revoke_frequency(lessee)
+        frequency.user_unassigned(user)
+        frequency.owner = None
+        user.assigned_frequency = None
@@ -0,0 +1,165 @@
+"""
+A cache of interference graphs, so allocating the same users again skips building their
+graph.
+
+Graphs are keyed by a hash of the users' positions, sorted so the order the users come in
+doesn't matter, and the transmit distance.  Each graph is stored in CSR form over the
+sorted positions: the neighbours of the vertex at sorted index `v` are
+`indices[indptr[v]:indptr[v + 1]]`.  A lookup maps that back onto the order the users
+were given in.  The most recently used graphs are kept in memory, and with a `directory`
+every graph is also written there as a pair of `.npy` files, which other processes and
+later runs open memory-mapped rather than rebuilding.
+"""
+import contextlib
+import gc
+import hashlib
+import os
+from collections import OrderedDict
+from functools import lru_cache
+
+from radiograph.distance import within_range_pairs
+from radiograph.lazy import numpy as np
+
+# How many graphs a cache keeps in memory.
+DEFAULT_MAX_ENTRIES = 8
+
+
+def graph_key(positions, transmit_dist):
+    """
+    Returns the cache key of the graph of `positions` (already sorted, as an (n, 2) float
+    array) at `transmit_dist`, as a hex digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(float(transmit_dist)).encode())
+    digest.update(positions.tobytes())
+    return digest.hexdigest()
+
+
+class GraphCache:
+    """
+    Interference graphs by positions and transmit distance, the `max_entries` most
+    recently used kept in memory and, with a `directory`, all of them kept on disk.
+    """
+    def __init__(self, directory=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def adjacency(self, vertices, sim):
+        """
+        Returns the adjacency lists of the interference graph of `vertices`, indexed by
+        position in `vertices`, exactly as `build_interference_graph` would (up to the order
+        within each list).
+        """
+        if not vertices:
+            return []
+        points = np.empty((len(vertices), 2))
+        points[:, 0] = np.fromiter((vertex.pos_x for vertex in vertices), np.float64, len(vertices))
+        points[:, 1] = np.fromiter((vertex.pox_y for vertex in vertices), np.float64, len(vertices))
+        # order[v] is the vertex at sorted index v.
+        order = np.lexsort((points[:, 1], points[:, 0]))
+        (indptr, indices) = self.graph(points[order], sim.get_transmit_distance())
+
+        neighbors = order[indices].tolist()
+        bounds = indptr.tolist()
+        sorted_index = np.empty(len(order), dtype=np.int64)
+        sorted_index[order] = np.arange(len(order))
+        with _collection_paused():
+            return [neighbors[bounds[v]:bounds[v + 1]] for v in sorted_index.tolist()]
+
+    def graph(self, positions, transmit_dist):
+        """
+        Returns the `(indptr, indices)` CSR arrays of the graph of the sorted `positions`,
+        from memory, from disk or else newly built.
+        """
+        key = graph_key(positions, transmit_dist)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        arrays = self._load(key)
+        if arrays is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            arrays = build_csr(positions, transmit_dist)
+            self._save(key, arrays)
+        self.entries[key] = arrays
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return arrays
+
+    def clear(self):
+        """
+        Forgets the graphs held in memory.  Graphs on disk are kept.
+        """
+        self.entries.clear()
+
+    def _paths(self, key):
+        return (os.path.join(self.directory, f"{key}.indptr.npy"), os.path.join(self.directory, f"{key}.indices.npy"))
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        (indptr_path, indices_path) = self._paths(key)
+        # The indptr file is written last, so a graph is only complete once it exists.
+        if not os.path.exists(indptr_path):
+            return None
+        return (np.load(indptr_path, mmap_mode="r"), np.load(indices_path, mmap_mode="r"))
+
+    def _save(self, key, arrays):
+        if self.directory is None:
+            return
+        # Write under temporary names and rename, so concurrent processes never read half a file.
+        for (path, array) in zip(reversed(self._paths(key)), reversed(arrays)):
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as file:
+                np.save(file, array)
+            os.replace(temporary, path)
+
+
+def build_csr(positions, transmit_dist):
+    """
+    Builds the interference graph of `positions` as `(indptr, indices)` CSR arrays, with
+    each vertex's neighbours in ascending order.
+    """
+    (i, j) = within_range_pairs(positions, transmit_dist)
+    sources = np.concatenate((i, j))
+    targets = np.concatenate((j, i))
+    order = np.lexsort((targets, sources))
+    indptr = np.zeros(len(positions) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(positions)), out=indptr[1:])
+    return (indptr, targets[order])
+
+
+@contextlib.contextmanager
+def _collection_paused():
+    """
+    Pauses the cyclic garbage collector, which otherwise rescans everything alive each time
+    enough new lists pile up.  Lists of ints can't form cycles, so nothing is missed.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+@lru_cache(maxsize=None)
+def shared_cache(directory=None):
+    """
+    Returns this process's cache for `directory` (or its in-memory cache), created on first
+    use, so every run in a process shares it.
+    """
+    return GraphCache(directory)
@@ -0,0 +1,113 @@
+import heapq
+
+# Coloring strategies by name.  A strategy takes adjacency lists `adj` over `V` vertices
+# and returns `(V, result)`, where `result[u]` is the color (from 0) given to vertex u and
+# no two neighbours share a color.
+COLORING_STRATEGIES = {}
+
+def register_strategy(name):
+    """
+    Decorator that makes a coloring function available to `allocate_with_coloring` by `name`.
+    """
+    def register(strategy):
+        COLORING_STRATEGIES[name] = strategy
+        return strategy
+    return register
+
+def get_strategy(strategy):
+    """
+    Returns the coloring function for `strategy`, which may be a registered name or
+    already a coloring function.
+    """
+    if callable(strategy):
+        return strategy
+    try:
+        return COLORING_STRATEGIES[strategy]
+    except KeyError:
+        raise ValueError(f"Unknown coloring strategy '{strategy}': must be one of {sorted(COLORING_STRATEGIES)}.") from None
+
+def first_fit(adj, V, order):
+    """
+    Colors vertices in `order`, giving each the smallest color none of its neighbours has.
+    A vertex's color never exceeds its degree, so this is O(V + E) on top of the ordering.
+    """
+    result = [-1] * V
+    for u in order:
+        taken = {result[w] for w in adj[u]}
+        color = 0
+        while color in taken:
+            color += 1
+        result[u] = color
+    return (V, result)
+
+@register_strategy("greedy")
+def greedy_coloring(adj, V):
+    """
+    First-fit in input order.  Fastest, but the number of colors depends on that order.
+    """
+    return first_fit(adj, V, range(V))
+
+@register_strategy("largest_first")
+def largest_first_coloring(adj, V):
+    """
+    Welsh-Powell: first-fit with vertices taken in order of decreasing degree.
+    """
+    order = sorted(range(V), key=lambda u: -len(adj[u]))
+    return first_fit(adj, V, order)
+
+@register_strategy("smallest_last")
+def smallest_last_coloring(adj, V):
+    """
+    First-fit in smallest-last (degeneracy) order: repeatedly set aside the vertex of
+    least remaining degree, then color in reverse.  Uses at most one more color than the
+    graph's degeneracy.  The heap holds stale entries that are skipped when popped.
+    """
+    degree = [len(adj[u]) for u in range(V)]
+    removed = [False] * V
+    heap = [(degree[u], u) for u in range(V)]
+    heapq.heapify(heap)
+    removal_order = []
+
+    while heap:
+        (d, u) = heapq.heappop(heap)
+        if removed[u] or d != degree[u]:
+            continue
+        removed[u] = True
+        removal_order.append(u)
+        for w in adj[u]:
+            if not removed[w]:
+                degree[w] -= 1
+                heapq.heappush(heap, (degree[w], w))
+
+    return first_fit(adj, V, reversed(removal_order))
+
+@register_strategy("dsatur")
+def dsatur_coloring(adj, V):
+    """
+    DSatur: always color next the uncolored vertex whose neighbours already use the most
+    distinct colors, breaking ties by degree.  Usually needs the fewest colors of the
+    strategies here.  A vertex is re-pushed onto the heap only when its saturation grows,
+    so the heap sees O(V + E) entries.
+    """
+    result = [-1] * V
+    saturation = [set() for _ in range(V)]
+    heap = [(0, -len(adj[u]), u) for u in range(V)]
+    heapq.heapify(heap)
+
+    while heap:
+        (neg_saturation, neg_degree, u) = heapq.heappop(heap)
+        if result[u] != -1 or -neg_saturation != len(saturation[u]):
+            continue
+
+        taken = saturation[u]
+        color = 0
+        while color in taken:
+            color += 1
+        result[u] = color
+
+        for w in adj[u]:
+            if result[w] == -1 and color not in saturation[w]:
+                saturation[w].add(color)
+                heapq.heappush(heap, (-len(saturation[w]), -len(adj[w]), w))
+
+    return (V, result)
@@ -0,0 +1,337 @@
+"""
+Out-of-core allocation for scenarios too large to hold as user objects.
+
+Works on a binary scenario (see `data_generation.binary_data`) and allocates the same way
+as `allocate_freqs` with `allocate_with_coloring`, but on arrays and one tile at a time.
+The plane is cut into square tiles, and each tile is read from disk together with a halo
+of the users within `transmit_dist` of it in the neighbouring tiles:
+
+1. The cognitive users of every tile are colored on their own, so tiles can be colored in
+   any order or in parallel.
+2. A reconciliation pass walks the tiles in order.  A user that shares a color with an
+   in-range halo user of an earlier tile is recolored with the lowest color none of its
+   neighbours have, so after the pass no two users in range share a color.
+3. Color classes are matched to lessors with `match_color_classes`, counting each lessor's
+   conflicts from its own tile and halo.
+4. Each colored user leases the band of its class's lessor, if it has one.
+
+Besides the per-user result arrays, which are memory-mapped files when an `out_dir` is
+given, memory use is bounded by the size of a tile and its halo, plus one index per lessor.
+"""
+import math
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+from algorithms.coloring import match_color_classes
+from algorithms.strategies import get_strategy
+from data_generation import binary_data
+from radiograph.distance import adjacency_from_pairs, within_range_pairs
+
+# Unless a tile size is given, tiles are sized to hold about this many users on average.
+DEFAULT_TILE_USERS = 1_000_000
+
+# Records are scanned in chunks of this many when building the tiling and the results.
+SCAN_CHUNK_ROWS = 1_000_000
+
+AUTHORIZED = binary_data.USER_TYPES.index("Authorized")
+COGNITIVE = binary_data.USER_TYPES.index("Cognitive")
+
+
+class TiledAllocation(namedtuple("TiledAllocation", [
+    "num_tiles",
+    "tile_size",
+    # Users recolored by the reconciliation pass.
+    "recolored",
+    # Per color class: the record index of its lessor and the band it leases, or -1 / NaN.
+    "lessor_of_color",
+    "frequency_of_color",
+    # Per user: its color (-1 if it is not requesting a band) and the band it leases (NaN if none).
+    "colors",
+    "leases",
+])):
+    """
+    The outcome of `allocate_tiled`.
+    """
+    __slots__ = ()
+
+
+class Tiling:
+    """
+    Buckets the records of a scenario into square tiles of side `tile_size` with a
+    counting sort, so each tile's users can be read without scanning the whole file.  The
+    record indices of tile t are `order[starts[t]:starts[t + 1]]`.
+    """
+    def __init__(self, records, transmit_dist, tile_size, work_dir):
+        self.transmit_dist = transmit_dist
+        self.tile_size = tile_size
+        (self.x0, self.y0, x1, y1) = _bounds(records)
+        self.tiles_x = int((x1 - self.x0) // tile_size) + 1
+        self.tiles_y = int((y1 - self.y0) // tile_size) + 1
+        self.num_tiles = self.tiles_x * self.tiles_y
+
+        counts = np.zeros(self.num_tiles, dtype=np.int64)
+        for start in range(0, len(records), SCAN_CHUNK_ROWS):
+            counts += np.bincount(self.tile_of(records[start:start + SCAN_CHUNK_ROWS]), minlength=self.num_tiles)
+        self.starts = np.zeros(self.num_tiles + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.starts[1:])
+
+        self.order = _new_array(work_dir, "order.npy", len(records), np.int64)
+        cursor = self.starts[:-1].copy()
+        for start in range(0, len(records), SCAN_CHUNK_ROWS):
+            tiles = self.tile_of(records[start:start + SCAN_CHUNK_ROWS])
+            by_tile = np.argsort(tiles, kind="stable")
+            sorted_tiles = tiles[by_tile]
+            chunk_counts = np.bincount(tiles, minlength=self.num_tiles)
+            # Rank of each record among the records of its tile in this chunk.
+            ranks = np.arange(len(tiles)) - (np.cumsum(chunk_counts) - chunk_counts)[sorted_tiles]
+            self.order[cursor[sorted_tiles] + ranks] = start + by_tile
+            cursor += chunk_counts
+        self.order.flush()
+
+    def __getstate__(self):
+        # Worker processes reopen the order file rather than receiving a copy of it.
+        state = dict(self.__dict__)
+        state["order"] = self.order.filename
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.order = np.load(state["order"], mmap_mode="r")
+
+    def tile_of(self, records):
+        cols = ((records["x_position"] - self.x0) // self.tile_size).astype(np.int64)
+        rows = ((records["y_position"] - self.y0) // self.tile_size).astype(np.int64)
+        return cols * self.tiles_y + rows
+
+    def members(self, tile):
+        return np.sort(self.order[self.starts[tile]:self.starts[tile + 1]])
+
+    def halo(self, tile, records, margin):
+        """
+        Returns the record indices of the users of the neighbouring tiles within `margin`
+        of `tile`, which must be at most `tile_size`.
+        """
+        (col, row) = divmod(tile, self.tiles_y)
+        (left, bottom) = (self.x0 + col * self.tile_size, self.y0 + row * self.tile_size)
+        found = []
+        for neighbor_col in range(max(col - 1, 0), min(col + 2, self.tiles_x)):
+            for neighbor_row in range(max(row - 1, 0), min(row + 2, self.tiles_y)):
+                if (neighbor_col, neighbor_row) == (col, row):
+                    continue
+                members = self.members(neighbor_col * self.tiles_y + neighbor_row)
+                x = records["x_position"][members]
+                y = records["y_position"][members]
+                # Distance from the tile's rectangle, measured per axis.
+                dx = np.maximum(np.maximum(left - x, x - (left + self.tile_size)), 0)
+                dy = np.maximum(np.maximum(bottom - y, y - (bottom + self.tile_size)), 0)
+                found.append(members[dx * dx + dy * dy <= margin * margin])
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(found))
+
+
+def allocate_tiled(scenario_path, transmit_dist, out_dir=None, tile_size=None, max_tile_users=DEFAULT_TILE_USERS, strategy="greedy", workers=1):
+    """
+    Allocates the binary scenario at `scenario_path` tile by tile and returns a
+    `TiledAllocation`.  Tiles are `tile_size` wide (at least `transmit_dist`), or sized to
+    hold about `max_tile_users` users each.  The tiling and the per-user results are kept
+    as `.npy` files in `out_dir`, or in a temporary directory and returned in memory if it
+    is not given.  With `workers` above 1, the first pass colors tiles in that many
+    processes.  `strategy` must be a registered name, so it can be sent to them.
+    """
+    records = binary_data.open_scenario(scenario_path)
+    if len(records) == 0:
+        empty = np.empty(0)
+        return TiledAllocation(0, tile_size, 0, empty.astype(np.int64), empty, empty.astype(np.int32), empty)
+    work_dir = out_dir or tempfile.mkdtemp()
+    try:
+        if tile_size is None:
+            tile_size = _default_tile_size(records, max_tile_users)
+        tile_size = max(tile_size, transmit_dist, 1)
+        tiling = Tiling(records, transmit_dist, tile_size, work_dir)
+
+        colors = _new_array(work_dir, "colors.npy", len(records), np.int32)
+        colors[:] = -1
+        tasks = [(scenario_path, tiling, tile, strategy) for tile in range(tiling.num_tiles)]
+        if workers > 1 and len(tasks) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                colored = pool.map(_color_tile, tasks)
+                for (members, tile_colors) in colored:
+                    colors[members] = tile_colors
+        else:
+            for task in tasks:
+                (members, tile_colors) = _color_tile(task)
+                colors[members] = tile_colors
+
+        recolored = sum(_reconcile_tile(records, tiling, tile, colors) for tile in range(tiling.num_tiles))
+
+        (lessor_of_color, frequency_of_color) = _match_lessors(records, tiling, colors)
+        leases = _new_array(work_dir, "leases.npy", len(records), np.float64)
+        for start in range(0, len(records), SCAN_CHUNK_ROWS):
+            chunk_colors = colors[start:start + SCAN_CHUNK_ROWS]
+            leased = chunk_colors >= 0
+            leases[start:start + len(chunk_colors)] = np.nan
+            leases[start:start + len(chunk_colors)][leased] = frequency_of_color[chunk_colors[leased]]
+
+        if out_dir is None:
+            (colors, leases) = (np.array(colors), np.array(leases))
+        else:
+            colors.flush()
+            leases.flush()
+        return TiledAllocation(tiling.num_tiles, tile_size, recolored, lessor_of_color, frequency_of_color, colors, leases)
+    finally:
+        if out_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _color_tile(task):
+    """
+    Colors the cognitive users of one tile requesting a band, ignoring every other tile.
+    Returns their record indices and colors.
+    """
+    (scenario_path, tiling, tile, strategy) = task
+    records = binary_data.open_scenario(scenario_path)
+    members = tiling.members(tile)
+    members = members[_requesting(records[members])]
+    positions = _positions(records, members)
+    (i, j) = within_range_pairs(positions, tiling.transmit_dist)
+    adj = adjacency_from_pairs(len(members), i, j)
+    (_, result) = get_strategy(strategy)(adj, len(members))
+    return (members, np.array(result, dtype=np.int32))
+
+
+def _reconcile_tile(records, tiling, tile, colors):
+    """
+    Recolors the users of `tile` that share a color with an in-range user of an earlier
+    tile, and returns how many were recolored.  Only users near the tile's edge can have
+    such a neighbour, so only they and their own neighbours are looked at.
+    """
+    distance = tiling.transmit_dist
+    members = tiling.members(tile)
+    members = members[_requesting(records[members])]
+    # Users within `distance` of the edge can conflict; their neighbours are within 2 * `distance`.
+    members = members[_edge_distance(tiling, tile, records, members) <= 2 * distance]
+    halo = tiling.halo(tile, records, distance)
+    halo = halo[_requesting(records[halo])]
+    if len(members) == 0 or len(halo) == 0:
+        return 0
+
+    points = np.concatenate((members, halo))
+    (i, j) = within_range_pairs(_positions(records, points), distance)
+    adj = adjacency_from_pairs(len(points), i, j)
+    local_colors = colors[points].tolist()
+    earlier = (tiling.tile_of(records[halo]) < tile).tolist()
+
+    recolored = 0
+    for u in range(len(members)):
+        clashes = any(w >= len(members) and earlier[w - len(members)] and local_colors[w] == local_colors[u] for w in adj[u])
+        if not clashes:
+            continue
+        taken = {local_colors[w] for w in adj[u]}
+        color = 0
+        while color in taken:
+            color += 1
+        local_colors[u] = color
+        colors[members[u]] = color
+        recolored += 1
+    return recolored
+
+
+def _match_lessors(records, tiling, colors):
+    """
+    Matches color classes to lessors as `assign_color_classes` does.  Lessors are numbered
+    in file order, and each one's conflicts are counted from its tile and halo.  Returns
+    the record index of each class's lessor and the band it leases, -1 / NaN if unmatched.
+    """
+    num_colors = int(colors.max(initial=-1)) + 1
+    sizes = np.zeros(num_colors, dtype=np.int64)
+    lessor_chunks = []
+    for start in range(0, len(records), SCAN_CHUNK_ROWS):
+        chunk_colors = colors[start:start + SCAN_CHUNK_ROWS]
+        sizes += np.bincount(chunk_colors[chunk_colors >= 0], minlength=num_colors)
+        lessor_chunks.append(start + np.flatnonzero(_lessor(records[start:start + SCAN_CHUNK_ROWS])))
+    lessors = np.concatenate(lessor_chunks)
+
+    # Sparse conflict counts, keyed by lessor number * num_colors + color.
+    keys = []
+    for tile in range(tiling.num_tiles):
+        members = tiling.members(tile)
+        tile_lessors = members[_lessor(records[members])]
+        if len(tile_lessors) == 0:
+            continue
+        requesters = np.concatenate((members, tiling.halo(tile, records, tiling.transmit_dist)))
+        requesters = requesters[colors[requesters] >= 0]
+        points = np.concatenate((tile_lessors, requesters))
+        (i, j) = within_range_pairs(_positions(records, points), tiling.transmit_dist)
+        # Pairs come out with i < j, so a lessor is always i and a requester j.
+        across = (i < len(tile_lessors)) & (j >= len(tile_lessors))
+        lessor_numbers = np.searchsorted(lessors, tile_lessors[i[across]])
+        keys.append(lessor_numbers * num_colors + colors[points[j[across]]])
+    (keys, counts) = _count(np.concatenate(keys) if keys else np.empty(0, dtype=np.int64))
+
+    def conflict_count(lessor_index, color_index):
+        key = lessor_index * num_colors + color_index
+        at = np.searchsorted(keys, key)
+        return int(counts[at]) if at < len(keys) and keys[at] == key else 0
+
+    lessor_of_color = np.full(num_colors, -1, dtype=np.int64)
+    frequency_of_color = np.full(num_colors, np.nan)
+    for (lessor_index, color_index) in match_color_classes(sizes.tolist(), len(lessors), conflict_count):
+        lessor_of_color[color_index] = lessors[lessor_index]
+        frequency_of_color[color_index] = records["assigned_frequency"][lessors[lessor_index]]
+    return (lessor_of_color, frequency_of_color)
+
+
+def _requesting(records):
+    return (records["user_type"] == COGNITIVE) & records["wants_to_broadcast"]
+
+def _lessor(records):
+    # Like the CSV loader, an authorized user's willing_to_rent flag is taken as whether it
+    # wants to broadcast itself, and it leases its band out only when it does not.
+    return (records["user_type"] == AUTHORIZED) & ~records["willing_to_rent"]
+
+def _positions(records, indices):
+    return np.column_stack((records["x_position"][indices], records["y_position"][indices]))
+
+def _edge_distance(tiling, tile, records, indices):
+    """
+    Distance from each of `indices`, all inside `tile`, to the nearest edge of the tile.
+    """
+    (col, row) = divmod(tile, tiling.tiles_y)
+    x = records["x_position"][indices] - (tiling.x0 + col * tiling.tile_size)
+    y = records["y_position"][indices] - (tiling.y0 + row * tiling.tile_size)
+    return np.minimum(np.minimum(x, tiling.tile_size - x), np.minimum(y, tiling.tile_size - y))
+
+def _count(keys):
+    """
+    Returns the distinct values of `keys`, sorted, and how many times each occurs.
+    """
+    keys = np.sort(keys)
+    if len(keys) == 0:
+        return (keys, keys)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return (keys[starts], np.diff(np.append(starts, len(keys))))
+
+def _bounds(records):
+    (x0, y0, x1, y1) = (math.inf, math.inf, -math.inf, -math.inf)
+    for start in range(0, len(records), SCAN_CHUNK_ROWS):
+        chunk = records[start:start + SCAN_CHUNK_ROWS]
+        (x0, x1) = (min(x0, chunk["x_position"].min()), max(x1, chunk["x_position"].max()))
+        (y0, y1) = (min(y0, chunk["y_position"].min()), max(y1, chunk["y_position"].max()))
+    if x0 > x1:
+        return (0.0, 0.0, 0.0, 0.0)
+    return (float(x0), float(y0), float(x1), float(y1))
+
+def _default_tile_size(records, max_tile_users):
+    (x0, y0, x1, y1) = _bounds(records)
+    tiles_per_side = math.ceil(math.sqrt(max(len(records) / max_tile_users, 1)))
+    # One past the extent, so the users on the far edges don't spill into another row of tiles.
+    return (max(x1 - x0, y1 - y0) + 1) / tiles_per_side
+
+def _new_array(work_dir, name, length, dtype):
+    return np.lib.format.open_memmap(os.path.join(work_dir, name), mode="w+", dtype=dtype, shape=(length,))
@@ -0,0 +1,66 @@
+"""
+Measures the throughput of the discrete-event engine in events per second.
+
+A generated scenario is allocated once, then run through arrivals, departures, reclaims
+and releases.  The arrival rate is set so the population stays around its starting size.
+`--sink` subscribes an event sink for the run, to measure what logging costs.
+
+Run from the repository root: `python3 -m benchmarks.event_engine`
+"""
+import argparse
+import os
+import random
+import tempfile
+
+from data_generation import binary_data
+from data_generation.generate_dataset import generate_dataset
+from radiograph import events
+from radiograph.engine import Engine
+from radiograph.simulation import allocate_freqs
+from radiograph.system import Simulation
+from radiograph.users import AuthorizedUser, CognitiveUser
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--authorized", type=int, default=1_000)
+    parser.add_argument("--max-position", type=int, default=3_000)
+    parser.add_argument("--transmit-dist", type=int, default=10)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--mean-holding", type=float, default=100.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sink", choices=["none", "null", "jsonl"], default="none")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "scenario.npy")
+        generate_dataset(path, args.users, args.authorized, args.max_position, args.authorized,
+                         seed=args.seed, distribution="hotspot", willing_share=0.3)
+        sim = Simulation(args.transmit_dist)
+        (users, spectrum) = binary_data.load_dataset(path, sim)
+    auths = [user for user in users if isinstance(user, AuthorizedUser)]
+    cogs = [user for user in users if isinstance(user, CognitiveUser)]
+    allocate_freqs(spectrum, auths, cogs, sim, verbose=False)
+
+    engine = Engine(spectrum, auths, cogs, sim, random.Random(args.seed),
+                    arrival_rate=len(cogs) / args.mean_holding, mean_holding=args.mean_holding,
+                    max_position=args.max_position)
+    with tempfile.TemporaryDirectory() as directory:
+        if args.sink == "null":
+            sink = events.NullSink()
+        elif args.sink == "jsonl":
+            sink = events.JsonLinesSink(os.path.join(directory, "events.jsonl"))
+        if args.sink == "none":
+            stats = engine.run(max_events=args.events)
+        else:
+            with events.subscribed(sink):
+                stats = engine.run(max_events=args.events)
+            sink.close()
+
+    print(f"{args.users} users, {args.authorized} authorized, transmit distance {args.transmit_dist}, sink {args.sink}")
+    print(" ".join(f"{kind}: {count}" for kind, count in stats["by_kind"].items()))
+    print(f"{stats['events']} events in {stats['seconds']:.2f}s: {stats['events_per_second']:.0f} events/s")
+    print(f"{stats['grants']} leases granted, {stats['evictions']} evictions, {stats['leasing']} leasing and {stats['waiting']} waiting at the end")
+
+if __name__ == '__main__':
+    main()
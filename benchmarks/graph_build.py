@@ -0,0 +1,71 @@
+"""
+Times interference-graph construction for uniformly placed users.
+
+The plane grows with the population so the density (and therefore the average degree)
+stays fixed, which means a spatially indexed build should scale close to linearly.
+The same users, shuffled, are then looked up in a `GraphCache`, from memory and from disk.
+
+Run from the repository root: `python3 -m benchmarks.graph_build`
+"""
+import argparse
+import math
+import random
+import tempfile
+import time
+
+from algorithms.coloring import build_interference_graph
+from algorithms.graph_cache import GraphCache
+from radiograph.system import Simulation
+
+class _Point:
+    """
+    Stand-in for a user: graph construction only reads the position.
+    """
+    __slots__ = ("pos_x", "pox_y")
+
+    def __init__(self, x, y):
+        self.pos_x = x
+        self.pox_y = y
+
+def uniform_points(num_users, transmit_dist, avg_neighbors, rng):
+    """
+    Places `num_users` points uniformly on a square sized so each point has roughly
+    `avg_neighbors` others within `transmit_dist`.
+    """
+    area = num_users * math.pi * transmit_dist ** 2 / avg_neighbors
+    side = max(int(math.sqrt(area)), 1)
+    return [_Point(rng.randint(0, side), rng.randint(0, side)) for _ in range(num_users)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--transmit-dist", type=int, default=25)
+    parser.add_argument("--avg-neighbors", type=float, default=8.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sim = Simulation(args.transmit_dist)
+    rng = random.Random(args.seed)
+
+    print(f"{'users':>10} {'edges':>12} {'seconds':>10} {'us/user':>10} {'cache hit':>10} {'disk hit':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for num_users in args.sizes:
+            points = uniform_points(num_users, args.transmit_dist, args.avg_neighbors, rng)
+            start = time.perf_counter()
+            graph = build_interference_graph(points, sim)
+            elapsed = time.perf_counter() - start
+            edges = sum(len(neighbors) for neighbors in graph) // 2
+
+            cache = GraphCache(directory)
+            cache.adjacency(points, sim)
+            rng.shuffle(points)
+            start = time.perf_counter()
+            cache.adjacency(points, sim)
+            hit = time.perf_counter() - start
+            start = time.perf_counter()
+            GraphCache(directory).adjacency(points, sim)
+            disk_hit = time.perf_counter() - start
+            print(f"{num_users:>10} {edges:>12} {elapsed:>10.3f} {elapsed / num_users * 1e6:>10.2f} {hit:>10.3f} {disk_hit:>10.3f}")
+
+if __name__ == '__main__':
+    main()
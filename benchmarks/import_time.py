@@ -0,0 +1,58 @@
+"""
+Checks how long importing the radiograph package takes against a fixed budget.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, so nothing is
+cached between runs, and the median of its cumulative import time is compared with the
+budget.  Modules that are only needed for plotting, CSV loading or batched kernels
+(matplotlib, pandas, numpy) should not be loaded by any of them.  Exits with status 1 if a
+module is over budget, so it can be run as a check.
+
+Run from the repository root: `python3 -m benchmarks.import_time`
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+DEFAULT_MODULES = ["radiograph", "radiograph.system", "radiograph.users", "radiograph.simulation", "main"]
+HEAVY_MODULES = ["numpy", "pandas", "matplotlib", "concurrent.futures"]
+
+def import_time_ms(module):
+    """
+    Returns the cumulative time in ms `module` took to import in a fresh interpreter, and
+    which of `HEAVY_MODULES` it loaded.
+    """
+    code = f"import sys, {module}; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return (int(fields[1]) / 1000, result.stdout.split())
+    raise Exception(f"No import time reported for {module}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    over_budget = []
+    print(f"{'module':>22} {'median ms':>10} {'min ms':>8}  heavy modules loaded")
+    for module in args.modules:
+        runs = [import_time_ms(module) for _ in range(args.repeat)]
+        times = [time_ms for (time_ms, _) in runs]
+        loaded = runs[-1][1]
+        median = statistics.median(times)
+        print(f"{module:>22} {median:>10.1f} {min(times):>8.1f}  {', '.join(loaded) or '-'}")
+        if median > args.budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"Over the {args.budget_ms:g} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+    print(f"All within the {args.budget_ms:g} ms budget.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Times coloring a clustered scenario serially and with a process pool.
+
+Users are placed in tight, well separated clusters, as in a real deployment of towns
+and cities, so the interference graph falls apart into many connected components.
+
+Run from the repository root: `python3 -m benchmarks.parallel_coloring`
+"""
+import argparse
+import os
+import random
+import time
+
+from algorithms.coloring import build_interference_graph
+from algorithms.components import color_components, connected_components
+from algorithms.strategies import get_strategy
+from radiograph.system import Simulation
+
+class _Point:
+    """
+    Stand-in for a user: graph construction only reads the position.
+    """
+    __slots__ = ("pos_x", "pox_y")
+
+    def __init__(self, x, y):
+        self.pos_x = x
+        self.pox_y = y
+
+def clustered_points(num_users, cluster_size, cluster_radius, transmit_dist, rng):
+    """
+    Places `num_users` points in clusters of `cluster_size`, laid out on a grid with
+    enough space between clusters that no two clusters interfere.
+    """
+    num_clusters = -(-num_users // cluster_size)
+    per_row = max(int(num_clusters ** 0.5), 1)
+    spacing = 2 * cluster_radius + 2 * transmit_dist
+    points = []
+    for cluster in range(num_clusters):
+        centre_x = (cluster % per_row) * spacing + cluster_radius
+        centre_y = (cluster // per_row) * spacing + cluster_radius
+        for _ in range(min(cluster_size, num_users - len(points))):
+            points.append(_Point(centre_x + rng.randint(-cluster_radius, cluster_radius),
+                                 centre_y + rng.randint(-cluster_radius, cluster_radius)))
+    return points
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=500_000)
+    parser.add_argument("--cluster-size", type=int, default=200)
+    parser.add_argument("--cluster-radius", type=int, default=60)
+    parser.add_argument("--transmit-dist", type=int, default=25)
+    parser.add_argument("--strategy", default="dsatur")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sim = Simulation(args.transmit_dist)
+    points = clustered_points(args.users, args.cluster_size, args.cluster_radius, args.transmit_dist, random.Random(args.seed))
+    adj = build_interference_graph(points, sim)
+    num_components = len(connected_components(adj))
+    print(f"{args.users} users, {sum(map(len, adj)) // 2} edges, {num_components} components, strategy {args.strategy}")
+
+    start = time.perf_counter()
+    (_, result) = get_strategy(args.strategy)(adj, len(adj))
+    serial = time.perf_counter() - start
+    print(f"{'workers':>8} {'seconds':>10} {'speedup':>8} {'colors':>7}")
+    print(f"{'serial':>8} {serial:>10.3f} {1.0:>8.2f} {max(result) + 1:>7}")
+
+    for workers in sorted(set(args.workers)):
+        start = time.perf_counter()
+        (_, result) = color_components(adj, args.strategy, workers)
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>8} {elapsed:>10.3f} {serial / elapsed:>8.2f} {max(result) + 1:>7}")
+
+if __name__ == '__main__':
+    main()
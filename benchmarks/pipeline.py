@@ -0,0 +1,144 @@
+"""
+Times the whole pipeline (setup, allocate_freqs, evaluate_allocation) from 100 to 1M users.
+
+Each case is a seeded, generated uniform scenario whose area grows with the number of users,
+so the density stays the same and the work per user should stay flat.  `main.setup` only
+knows the bundled datasets, so "setup" here is loading the generated scenario from its
+binary file and splitting its users into authorized and cognitive.  Every case runs in
+its own interpreter, which keeps their peak memory apart.  Times, peak memory and the
+colors used are compared against a stored baseline, and the command exits non-zero if any
+case got slower, bigger or used more colors by more than `--threshold`.
+
+Run from the repository root: `python3 -m benchmarks.pipeline`
+Record a baseline first with `--save-baseline`.  Baselines are only comparable on the
+machine they were recorded on.
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+PHASES = ("setup", "allocate", "evaluate")
+METRICS = ("seconds", "peak_mb", "colors")
+
+def run_case(path, transmit_dist):
+    """
+    Runs the pipeline over the scenario at `path` in this process and returns its results.
+    """
+    from data_generation import binary_data
+    from radiograph import tracing
+    from radiograph.simulation import allocate_freqs, evaluate_allocation
+    from radiograph.system import Simulation
+    from radiograph.users import AuthorizedUser, CognitiveUser
+
+    with tracing.traced() as tracer:
+        with tracing.phase("setup"):
+            sim = Simulation(transmit_dist)
+            (users, spectrum) = binary_data.load_dataset(path, sim)
+            auths = [user for user in users if isinstance(user, AuthorizedUser)]
+            cogs = [user for user in users if isinstance(user, CognitiveUser)]
+        allocate_freqs(spectrum, auths, cogs, sim, verbose=False)
+        evaluate_allocation(cogs, spectrum.frequencies, sim, verbose=False)
+
+    totals = tracer.totals()
+    return {
+        "phases": {name: totals.get(name, 0.0) for name in PHASES},
+        "seconds": sum(totals.get(name, 0.0) for name in PHASES),
+        # ru_maxrss is in kilobytes on Linux.
+        "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "colors": tracer.counters.get(tracing.COLORS, 0),
+        "edges": tracer.counters.get(tracing.EDGES, 0),
+    }
+
+def measure(directory, num_users, transmit_dist, args):
+    from data_generation.generate_dataset import generate_dataset
+    path = os.path.join(directory, f"scenario_{num_users}.npy")
+    if not os.path.exists(path):
+        num_authorized = max(int(num_users * args.authorized_share), 1)
+        max_position = math.ceil(math.sqrt(num_users / args.density))
+        generate_dataset(path, num_users, num_authorized, max_position, num_authorized,
+                         seed=args.seed, willing_share=0.5, broadcast_share=0.8)
+
+    runs = []
+    for _ in range(args.repeat):
+        output = subprocess.run([sys.executable, "-m", "benchmarks.pipeline", "--run-case", path, str(transmit_dist)],
+                                check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output))
+    return min(runs, key=lambda result: result["seconds"])
+
+def regressions(result, baseline, threshold, noise_floor):
+    """
+    Lists the metrics of a case that are worse than its baseline by more than `threshold`,
+    ignoring time differences under `noise_floor` seconds.
+    """
+    worse = []
+    for metric in METRICS:
+        (now, before) = (result[metric], baseline.get(metric))
+        if before is None or now <= before * (1 + threshold):
+            continue
+        if metric == "seconds" and now - before < noise_floor:
+            continue
+        worse.append(f"{metric} {before:.3g} -> {now:.3g}")
+    return worse
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--transmit-dist", type=int, nargs="+", default=[5, 10, 25])
+    parser.add_argument("--density", type=float, default=0.01, help="users per unit of area")
+    parser.add_argument("--authorized-share", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case, keeping the fastest")
+    parser.add_argument("--baseline", default="benchmarks/pipeline_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="record these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, e.g. 0.25 for 25%%")
+    parser.add_argument("--noise-floor", type=float, default=0.05, help="seconds of slowdown always ignored")
+    parser.add_argument("--run-case", nargs=2, metavar=("SCENARIO", "TRANSMIT_DIST"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case[0], int(args.run_case[1]))))
+        return
+
+    baselines = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as file:
+            baselines = json.load(file)
+
+    results = {}
+    failed = []
+    print(f"{'users':>9} {'dist':>5} {'setup':>8} {'allocate':>9} {'evaluate':>9} {'total':>8} {'peak MB':>8} {'colors':>7} {'edges':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for num_users in args.users:
+            for transmit_dist in args.transmit_dist:
+                key = f"{num_users}@{transmit_dist}"
+                result = measure(directory, num_users, transmit_dist, args)
+                results[key] = result
+                phases = result["phases"]
+                line = (f"{num_users:>9} {transmit_dist:>5} {phases['setup']:>8.2f} {phases['allocate']:>9.2f} {phases['evaluate']:>9.2f} "
+                        f"{result['seconds']:>8.2f} {result['peak_mb']:>8.0f} {result['colors']:>7} {result['edges']:>10}")
+                if key in baselines:
+                    worse = regressions(result, baselines[key], args.threshold, args.noise_floor)
+                    if worse:
+                        failed.append(key)
+                        line += "  REGRESSION: " + ", ".join(worse)
+                print(line, flush=True)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Saved the baseline to {args.baseline}.")
+    elif not baselines:
+        print(f"No baseline at {args.baseline} to compare with; record one with --save-baseline.")
+    elif failed:
+        print(f"{len(failed)} of {len(results)} cases regressed by more than {args.threshold:.0%}.")
+        sys.exit(1)
+    else:
+        print(f"No case regressed by more than {args.threshold:.0%}.")
+
+if __name__ == '__main__':
+    main()
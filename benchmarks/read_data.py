@@ -0,0 +1,80 @@
+"""
+Compares the rows per second of the users CSV loaders.
+
+The loaders are the original row-by-row `iterrows()` loader, the column-oriented loader
+through pandas, and its standard-library `csv` path.
+The "npy" loader reads the same users from a memory-mapped binary scenario, converted
+from the CSV before timing starts.
+
+Run from the repository root: `python3 -m benchmarks.read_data`
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from data_generation import binary_data, read_data
+from data_generation.generate_dataset import generate_dataset
+from radiograph.frequencies import RadioFrequency, RadioFrequencySpectrum
+from radiograph.system import Simulation
+from radiograph.users import AuthorizedUser, CognitiveUser
+
+def legacy_process_users(dataframe, sim):
+    """
+    The original loader, kept here as the baseline.
+    """
+    import pandas as pd
+    users = []
+    frequencies = []
+    for _, row in dataframe.iterrows():
+        x_pos = row['x_position']
+        y_pos = row['y_position']
+        assigned_frequency = row.get('assigned_frequency', None)
+        willing_to_rent = row.get('willing_to_rent', False)
+        wants_to_broadcast = row.get('wants_to_broadcast', False)
+        if row['user_type'] == 'Authorized':
+            if pd.notna(assigned_frequency):
+                frequency = RadioFrequency(sim, float(assigned_frequency), float(assigned_frequency))
+                frequencies.append(frequency)
+                users.append(AuthorizedUser(sim, x_pos, y_pos, frequency, willing_to_rent))
+            else:
+                raise ValueError(f"Authorized user missing an assigned frequency: {row}")
+        elif row['user_type'] == 'Cognitive':
+            users.append(CognitiveUser(sim, x_pos, y_pos, wants_to_broadcast))
+    return users, RadioFrequencySpectrum(sim, *frequencies)
+
+LOADERS = {
+    "iterrows": lambda path, sim: legacy_process_users(read_data.load_users_from_csv(path), sim),
+    "pandas": lambda path, sim: read_data.load_dataset(path, sim, engine="pandas"),
+    "csv": lambda path, sim: read_data.load_dataset(path, sim, engine="csv"),
+    "npy": lambda path, sim: binary_data.load_dataset(path, sim),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--loaders", nargs="+", choices=sorted(LOADERS), default=["iterrows", "pandas", "csv", "npy"])
+    parser.add_argument("--max-iterrows-rows", type=int, default=100_000, help="skip the slow baseline above this size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'loader':>10} {'seconds':>10} {'rows/s':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for num_rows in args.rows:
+            path = os.path.join(directory, f"users_{num_rows}.csv")
+            side = int((num_rows * 4) ** 0.5) + 1
+            generate_dataset(path, num_rows, max(num_rows // 5, 1), side - 1, 50, seed=args.seed, willing_share=0.5)
+            if "npy" in args.loaders:
+                binary_data.csv_to_binary(path, path[:-len(".csv")] + ".npy")
+            for loader in args.loaders:
+                if loader == "iterrows" and num_rows > args.max_iterrows_rows:
+                    continue
+                sim = Simulation(25)
+                start = time.perf_counter()
+                (users, _) = LOADERS[loader](path[:-len(".csv")] + ".npy" if loader == "npy" else path, sim)
+                elapsed = time.perf_counter() - start
+                assert len(users) == num_rows
+                print(f"{num_rows:>10} {loader:>10} {elapsed:>10.3f} {num_rows / elapsed:>12.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Times the out-of-core tiled allocator on a generated binary scenario, with its peak memory.
+
+Peak memory grows with the tile size rather than the number of users, so a large
+scenario runs in bounded memory with `--tile-users` set to suit the machine.
+
+Run from the repository root: `python3 -m benchmarks.tiled_allocation`
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from algorithms.tiled import allocate_tiled
+from data_generation.generate_dataset import generate_dataset
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--max-position", type=int, default=5000)
+    parser.add_argument("--distribution", default="clustered")
+    parser.add_argument("--transmit-dist", type=int, default=10)
+    parser.add_argument("--tile-users", type=int, nargs="+", default=[50_000, 200_000, 1_000_000])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "scenario.npy")
+        generate_dataset(path, args.users, args.users // 10, args.max_position, args.users,
+                         seed=args.seed, distribution=args.distribution, willing_share=0.2)
+        print(f"{args.users} users, {args.distribution}, transmit distance {args.transmit_dist}")
+        print(f"{'tile users':>10} {'tiles':>6} {'seconds':>9} {'recolored':>10} {'leased':>9} {'peak MB':>8}")
+        for tile_users in args.tile_users:
+            out_dir = os.path.join(directory, f"tiles_{tile_users}")
+            os.mkdir(out_dir)
+            start = time.perf_counter()
+            result = allocate_tiled(path, args.transmit_dist, out_dir, max_tile_users=tile_users, workers=args.workers)
+            elapsed = time.perf_counter() - start
+            leased = int(np.isfinite(result.leases).sum())
+            # ru_maxrss never goes down, so later rows report the largest peak so far.
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(f"{tile_users:>10} {result.num_tiles:>6} {elapsed:>9.2f} {result.recolored:>10} {leased:>9} {peak:>8.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+A binary scenario format for datasets too large to parse from CSV on every start.
+
+A scenario is a single `.npy` file holding one structured array, a record per user, with
+the same information as the CSV schema written by `generate_dataset`.  It is opened as a
+memory map, so opening it takes the same time at any size, and worker processes that open
+the same file share its pages instead of each holding a parsed copy.
+
+Convert with `csv_to_binary` / `binary_to_csv`, and load users with `load_dataset`.
+"""
+import csv
+import math
+
+import numpy as np
+
+from data_generation import read_data
+from radiograph import tracing
+
+DTYPE = np.dtype([
+    ("x_position", np.float64),
+    ("y_position", np.float64),
+    # An index into USER_TYPES.
+    ("user_type", np.uint8),
+    # NaN for users without one.
+    ("assigned_frequency", np.float64),
+    ("willing_to_rent", np.bool_),
+    ("wants_to_broadcast", np.bool_),
+])
+
+USER_TYPES = ("Authorized", "Cognitive")
+
+CSV_HEADER = ["user_id", "user_type", "x_position", "y_position", "assigned_frequency", "willing_to_rent", "wants_to_broadcast"]
+
+def open_scenario(file_path):
+    """
+    Memory-maps a binary scenario read-only and returns its array of user records.
+    """
+    try:
+        records = np.load(file_path, mmap_mode="r")
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"Dataset file not found: {file_path}") from e
+    if records.dtype != DTYPE:
+        raise ValueError(f"{file_path} is not a binary scenario: unexpected record type {records.dtype}")
+    return records
+
+def read_columns(file_path, chunksize=read_data.DEFAULT_CHUNK_ROWS):
+    """
+    Streams a binary scenario as chunks of columns, in the form `read_data.read_columns`
+    produces, copying only one chunk out of the memory map at a time.
+    """
+    records = open_scenario(file_path)
+    user_types = np.array(USER_TYPES)
+    for start in range(0, len(records), chunksize):
+        chunk = records[start:start + chunksize]
+        yield {
+            "user_type": user_types[chunk["user_type"]],
+            "x_position": read_data._as_coordinates(chunk["x_position"]),
+            "y_position": read_data._as_coordinates(chunk["y_position"]),
+            "assigned_frequency": np.array(chunk["assigned_frequency"]),
+            "willing_to_rent": np.array(chunk["willing_to_rent"]),
+            "wants_to_broadcast": np.array(chunk["wants_to_broadcast"]),
+        }
+
+def load_dataset(file_path, sim, chunksize=read_data.DEFAULT_CHUNK_ROWS):
+    """
+    Builds users and their spectrum from a binary scenario, exactly as
+    `read_data.load_dataset` does from the equivalent CSV.
+    """
+    with tracing.phase("load"):
+        return read_data.process_columns(read_columns(file_path, chunksize), sim)
+
+def csv_to_binary(csv_path, binary_path, chunksize=read_data.DEFAULT_CHUNK_ROWS):
+    """
+    Converts a users CSV into a binary scenario a chunk at a time, and returns the number of
+    users written.  Unlike the CSV loader, which skips them, rows of an unknown user type
+    are an error.
+    """
+    try:
+        with open(csv_path, newline='') as file:
+            num_rows = sum(1 for _ in csv.reader(file)) - 1
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"Dataset file not found: {csv_path}") from e
+
+    records = np.lib.format.open_memmap(binary_path, mode="w+", dtype=DTYPE, shape=(max(num_rows, 0),))
+    start = 0
+    for columns in read_data.read_columns(csv_path, "csv", chunksize):
+        user_type = columns["user_type"]
+        codes = np.full(len(user_type), len(USER_TYPES), dtype=np.uint8)
+        for code, name in enumerate(USER_TYPES):
+            codes[user_type == name] = code
+        unknown = np.flatnonzero(codes == len(USER_TYPES))
+        if len(unknown):
+            raise ValueError(f"Unknown user type: {user_type[unknown[0]]} in row: {start + unknown[0]}")
+
+        chunk = records[start:start + len(codes)]
+        chunk["user_type"] = codes
+        for name in ("x_position", "y_position", "assigned_frequency", "willing_to_rent", "wants_to_broadcast"):
+            chunk[name] = columns[name]
+        start += len(codes)
+
+    records.flush()
+    return start
+
+def binary_to_csv(binary_path, csv_path, chunksize=read_data.DEFAULT_CHUNK_ROWS):
+    """
+    Writes a binary scenario back out in the CSV schema of `generate_dataset`.  User ids are
+    numbered a1, a2, ... and c1, c2, ... in file order.
+    """
+    counts = {name: 0 for name in USER_TYPES}
+    with open(csv_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADER)
+        for columns in read_columns(binary_path, chunksize):
+            rows = zip(
+                columns["user_type"].tolist(),
+                columns["x_position"].tolist(),
+                columns["y_position"].tolist(),
+                columns["assigned_frequency"].tolist(),
+                columns["willing_to_rent"].tolist(),
+                columns["wants_to_broadcast"].tolist(),
+            )
+            for (user_type, x, y, frequency, willing, wants) in rows:
+                counts[user_type] += 1
+                authorized = user_type == "Authorized"
+                writer.writerow([
+                    f"{'a' if authorized else 'c'}{counts[user_type]}",
+                    user_type,
+                    x,
+                    y,
+                    "" if math.isnan(frequency) else (int(frequency) if frequency.is_integer() else frequency),
+                    _flag(willing, authorized),
+                    _flag(wants, not authorized),
+                ])
+
+def _flag(value, applies):
+    """
+    Formats a flag like `generate_dataset`, which leaves it blank for users it does not
+    apply to.  A set flag is always written, so nothing is lost.
+    """
+    return value if applies or value else ""
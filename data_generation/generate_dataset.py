@@ -1,75 +1,242 @@
+"""
+Generates random datasets of users, from a handful to tens of millions, in the CSV schema
+read by `read_data` or as a binary scenario (see `binary_data`).
+
+Positions are sampled with NumPy in bulk and are always unique.  A run is fully determined
+by its seed, and rows are written a chunk at a time, so memory use is a few arrays of
+`num_users` values regardless of the output size.
+
+Usage: `python3 -m data_generation.generate_dataset data_files/huge.csv --users 10000000 --authorized 100000 --max-position 20000 --distribution clustered --seed 1`
+or `python3 -m data_generation.generate_dataset --preset large` to regenerate a bundled dataset.
+"""
+import argparse
 import csv
-import random
+import time
+
+import numpy as np
+
+from data_generation import binary_data
+
+DISTRIBUTIONS = ("uniform", "clustered", "hotspot")
+
+# Rows are formatted and written this many at a time.
+DEFAULT_CHUNK_ROWS = 100_000
+
+# After this many rounds of sampling, any positions still missing are drawn uniformly from
+# the whole grid instead, so even a saturated cluster can't stall the generator.
+MAX_SAMPLING_ROUNDS = 8
 
-def generate_dataset(file_name, num_users, num_authorized, max_position, max_frequency):
+# The bundled datasets in data_files/, as (file, generate_dataset arguments).
+PRESETS = {
+    "small": ("data_files/small_dataset.csv", dict(num_users=10, num_authorized=3, max_position=20, max_frequency=10)),
+    "large": ("data_files/large_dataset.csv", dict(num_users=100, num_authorized=20, max_position=200, max_frequency=50)),
+}
+
+def generate_dataset(file_name, num_users, num_authorized, max_position, max_frequency,
+                     seed=None, distribution="uniform", willing_share=1.0, broadcast_share=1.0,
+                     chunksize=DEFAULT_CHUNK_ROWS, **options):
     """
-    Generates a dataset and saves it as a CSV file with unique (x, y) positions for all users.
-    - file_name: Name of the output CSV file.
+    Generates a dataset and saves it with unique (x, y) positions for all users, as a
+    binary scenario if `file_name` ends in ".npy" and as a CSV file otherwise.
+    - file_name: Name of the output file.
     - num_users: Total number of users.
     - num_authorized: Number of authorized users (remaining will be cognitive).
     - max_position: Maximum coordinate values for user positions.
     - max_frequency: Maximum frequency ID to assign to authorized users.
+    - seed: Seed of the random generator; the same seed always writes the same file.
+    - distribution: "uniform", "clustered" or "hotspot" (see `sample_positions`).
+    - willing_share / broadcast_share: Chance each authorized user is willing to rent, and
+      each cognitive user wants to broadcast.
+    - options: Tuning for the distribution, passed on to `sample_positions`.
+    """
+    if not 0 <= num_authorized <= num_users:
+        raise ValueError("num_authorized must be between 0 and num_users.")
+    rng = np.random.default_rng(seed)
+    (x, y) = sample_positions(rng, num_users, max_position, distribution, **options)
+    frequencies = rng.integers(1, max_frequency + 1, size=num_authorized)
+    willing = rng.random(num_authorized) < willing_share
+    wants = rng.random(num_users - num_authorized) < broadcast_share
+
+    if file_name.endswith(".npy"):
+        _write_binary(file_name, x, y, frequencies, willing, wants, chunksize)
+    else:
+        _write_csv(file_name, x, y, frequencies, willing, wants, chunksize)
+
+def sample_positions(rng, num_users, max_position, distribution="uniform", **options):
+    """
+    Returns `num_users` distinct integer positions in [0, max_position]² as arrays `(x, y)`,
+    in random order.
+    - "uniform": every free cell is equally likely.
+    - "clustered": a Poisson-cluster (Thomas) process.  `clusters` centres are placed
+      uniformly, and each user is scattered around a random centre with a normal offset
+      of standard deviation `cluster_spread`.
+    - "hotspot": a uniform background, with a `hotspot_share` of the users instead drawn
+      around `hotspots` centres with standard deviation `hotspot_spread`.
+    """
+    side = max_position + 1
+    num_cells = side * side
+    if num_users > num_cells:
+        raise ValueError(f"Cannot place {num_users} users at unique positions in a {side} x {side} grid.")
+
+    if distribution == "uniform" and 2 * num_users > num_cells:
+        # Dense enough that shuffling every cell is cheaper than sampling and deduplicating.
+        cells = rng.permutation(num_cells)[:num_users]
+    else:
+        sample = _sampler(rng, distribution, num_users, max_position, **options)
+        cells = _unique_cells(rng, sample, num_users, side)
+    return np.divmod(cells, side)
+
+def _sampler(rng, distribution, num_users, max_position, clusters=None, cluster_spread=None,
+             hotspots=5, hotspot_share=0.5, hotspot_spread=None):
+    """
+    Returns a function drawing `count` (possibly repeated or out of bounds) float positions
+    from `distribution`.
+    """
+    if distribution == "uniform":
+        def sample(count):
+            return rng.integers(0, max_position + 1, size=(count, 2))
+    elif distribution == "clustered":
+        clusters = clusters or max(num_users // 100, 1)
+        spread = cluster_spread or max(max_position / 50, 1.0)
+        centres = rng.uniform(0, max_position, size=(clusters, 2))
+        def sample(count):
+            around = centres[rng.integers(clusters, size=count)]
+            return around + rng.normal(0, spread, size=(count, 2))
+    elif distribution == "hotspot":
+        spread = hotspot_spread or max(max_position / 10, 1.0)
+        centres = rng.uniform(0, max_position, size=(hotspots, 2))
+        def sample(count):
+            points = rng.uniform(0, max_position, size=(count, 2))
+            near = np.flatnonzero(rng.random(count) < hotspot_share)
+            points[near] = centres[rng.integers(hotspots, size=len(near))] + rng.normal(0, spread, size=(len(near), 2))
+            return points
+    else:
+        raise ValueError(f"Invalid distribution: must be one of {', '.join(DISTRIBUTIONS)}, not '{distribution}'.")
+    return sample
+
+def _unique_cells(rng, sample, num_users, side):
     """
-    positions = set()  # To keep track of unique (x, y) positions
+    Draws from `sample` in bulk, rounding to grid cells and dropping out of bounds and
+    repeated cells, until at least `num_users` distinct cells are found.  Returns a random
+    `num_users` of them, as indices (x * side + y), in random order.
+
+    Cells `sample` still hasn't found after `MAX_SAMPLING_ROUNDS` are drawn uniformly.  Only
+    a grid of at most twice `num_users` cells is ever listed in full, to pick from its free
+    cells; larger grids are at least half free, so uniform draws fill them quickly.
+    """
+    taken = np.empty(0, dtype=np.int64)
+    for _ in range(MAX_SAMPLING_ROUNDS):
+        missing = num_users - len(taken)
+        if missing <= 0:
+            break
+        # Oversample a little, since some draws are lost to collisions.
+        points = np.rint(sample(missing + missing // 4 + 16)).astype(np.int64)
+        inside = ((points >= 0) & (points < side)).all(axis=1)
+        taken = _distinct(np.concatenate((taken, points[inside, 0] * side + points[inside, 1])))
+
+    missing = num_users - len(taken)
+    if missing > 0 and 2 * num_users > side * side:
+        free = np.setdiff1d(np.arange(side * side), taken, assume_unique=True)
+        taken = np.concatenate((taken, free[rng.permutation(len(free))[:missing]]))
+    while len(taken) < num_users:
+        missing = num_users - len(taken)
+        cells = rng.integers(0, side * side, size=missing + missing // 4 + 16)
+        taken = _distinct(np.concatenate((taken, cells)))
+    return rng.permutation(taken)[:num_users]
 
-    def generate_unique_position():
-        while True:
-            x_position = random.randint(0, max_position)
-            y_position = random.randint(0, max_position)
-            if (x_position, y_position) not in positions:
-                positions.add((x_position, y_position))
-                return x_position, y_position
+def _distinct(cells):
+    """
+    Returns the distinct values of `cells`, sorted.  (A plain sort is much faster than
+    `np.unique` on large int arrays.)
+    """
+    cells = np.sort(cells)
+    if len(cells) == 0:
+        return cells
+    return cells[np.concatenate(([True], cells[1:] != cells[:-1]))]
 
+def _write_csv(file_name, x, y, frequencies, willing, wants, chunksize):
+    num_authorized = len(frequencies)
     with open(file_name, 'w', newline='') as file:
         writer = csv.writer(file)
-        writer.writerow([
-            "user_id",
-            "user_type",
-            "x_position",
-            "y_position",
-            "assigned_frequency",
-            "willing_to_rent",
-            "wants_to_broadcast"
-        ])
-
-        for user_id in range(1, num_users + 1):
-            x_position, y_position = generate_unique_position()
-            if user_id <= num_authorized:
-                frequency = random.randint(1, max_frequency)
-                willing_to_rent = random.choice([True])
-                writer.writerow([
-                    f"a{user_id}",
-                    "Authorized",
-                    x_position,
-                    y_position,
-                    frequency,
-                    willing_to_rent,
-                    ""
-                ])
-            else:
-
-                wants_to_broadcast = random.choice([True])
-                writer.writerow([
-                    f"c{user_id - num_authorized}",
-                    "Cognitive",
-                    x_position,
-                    y_position,
-                    "",
-                    "",
-                    wants_to_broadcast
-                ])
-
-generate_dataset(
-    "../data_files/small_dataset.csv",
-    num_users=10,
-    num_authorized=3,
-    max_position=20,
-    max_frequency=10
-)
-generate_dataset(
-    "../data_files/large_dataset.csv",
-    num_users=100,
-    num_authorized=20,
-    max_position=200,
-    max_frequency=50
-)
\ No newline at end of file
+        writer.writerow(binary_data.CSV_HEADER)
+        for start in range(0, len(x), chunksize):
+            stop = min(start + chunksize, len(x))
+            auth_stop = min(stop, num_authorized)
+            if start < auth_stop:
+                writer.writerows(zip(
+                    (f"a{user_id}" for user_id in range(start + 1, auth_stop + 1)),
+                    ["Authorized"] * (auth_stop - start),
+                    x[start:auth_stop].tolist(),
+                    y[start:auth_stop].tolist(),
+                    frequencies[start:auth_stop].tolist(),
+                    willing[start:auth_stop].tolist(),
+                    [""] * (auth_stop - start),
+                ))
+            cog_start = max(start, num_authorized)
+            if cog_start < stop:
+                writer.writerows(zip(
+                    (f"c{user_id - num_authorized}" for user_id in range(cog_start + 1, stop + 1)),
+                    ["Cognitive"] * (stop - cog_start),
+                    x[cog_start:stop].tolist(),
+                    y[cog_start:stop].tolist(),
+                    [""] * (stop - cog_start),
+                    [""] * (stop - cog_start),
+                    wants[cog_start - num_authorized:stop - num_authorized].tolist(),
+                ))
+
+def _write_binary(file_name, x, y, frequencies, willing, wants, chunksize):
+    num_authorized = len(frequencies)
+    records = np.lib.format.open_memmap(file_name, mode="w+", dtype=binary_data.DTYPE, shape=(len(x),))
+    for start in range(0, len(x), chunksize):
+        stop = min(start + chunksize, len(x))
+        chunk = records[start:stop]
+        chunk["x_position"] = x[start:stop]
+        chunk["y_position"] = y[start:stop]
+        authorized = np.arange(start, stop) < num_authorized
+        chunk["user_type"] = np.where(authorized, 0, 1)
+        chunk["assigned_frequency"] = np.nan
+        chunk["assigned_frequency"][authorized] = frequencies[start:stop][:authorized.sum()]
+        chunk["willing_to_rent"][authorized] = willing[start:stop][:authorized.sum()]
+        cognitive = ~authorized
+        chunk["wants_to_broadcast"][cognitive] = wants[max(start - num_authorized, 0):stop - num_authorized]
+    records.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a random dataset of users.")
+    parser.add_argument("file_name", nargs="?", help="output file; .npy writes a binary scenario, anything else a CSV")
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="regenerate a bundled dataset in data_files/")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--authorized", type=int, default=20)
+    parser.add_argument("--max-position", type=int, default=200)
+    parser.add_argument("--max-frequency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--willing-share", type=float, default=1.0)
+    parser.add_argument("--broadcast-share", type=float, default=1.0)
+    parser.add_argument("--clusters", type=int, default=None)
+    parser.add_argument("--cluster-spread", type=float, default=None)
+    parser.add_argument("--hotspots", type=int, default=5)
+    parser.add_argument("--hotspot-share", type=float, default=0.5)
+    parser.add_argument("--hotspot-spread", type=float, default=None)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    if args.preset:
+        (file_name, sizes) = PRESETS[args.preset]
+    elif args.file_name:
+        file_name = args.file_name
+        sizes = dict(num_users=args.users, num_authorized=args.authorized, max_position=args.max_position, max_frequency=args.max_frequency)
+    else:
+        parser.error("give an output file or a --preset")
+
+    start = time.perf_counter()
+    generate_dataset(
+        file_name, **sizes, seed=args.seed, distribution=args.distribution,
+        willing_share=args.willing_share, broadcast_share=args.broadcast_share, chunksize=args.chunk_rows,
+        clusters=args.clusters, cluster_spread=args.cluster_spread,
+        hotspots=args.hotspots, hotspot_share=args.hotspot_share, hotspot_spread=args.hotspot_spread,
+    )
+    print(f"Wrote {sizes['num_users']} users to {file_name} in {time.perf_counter() - start:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -1,44 +1,168 @@
-import pandas as pd
+import csv
+
+import numpy as np
+
 from radiograph.users import CognitiveUser, AuthorizedUser
 from radiograph.frequencies import RadioFrequency, RadioFrequencySpectrum
+from radiograph import tracing
+
+# Rows are read, validated and turned into users this many at a time.
+DEFAULT_CHUNK_ROWS = 100_000
 
 def load_users_from_csv(file_path):
+    import pandas as pd
     try:
         return pd.read_csv(file_path)
     except FileNotFoundError as e:
         raise FileNotFoundError(f"Dataset file not found: {file_path}") from e
 
-def process_users(dataframe, sim):
+def read_columns(file_path, engine="csv", chunksize=DEFAULT_CHUNK_ROWS):
+    """
+    Streams a users CSV as chunks of columns (see `columns_from_strings` for their form).
+    The "csv" engine uses only the standard library; "pandas" parses through pandas.  The
+    "npy" engine reads a binary scenario instead (see `binary_data`).
+    """
+    if engine == "csv":
+        return _read_columns_csv(file_path, chunksize)
+    elif engine == "pandas":
+        return _read_columns_pandas(file_path, chunksize)
+    elif engine == "npy":
+        from data_generation import binary_data
+        return binary_data.read_columns(file_path, chunksize)
+    raise ValueError(f"Invalid engine choice: must be 'csv', 'pandas' or 'npy', not '{engine}'.")
+
+def _read_columns_csv(file_path, chunksize):
+    try:
+        file = open(file_path, newline='')
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"Dataset file not found: {file_path}") from e
+    with file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if len(rows) == chunksize:
+                yield columns_from_strings(header, rows)
+                rows = []
+        if rows:
+            yield columns_from_strings(header, rows)
+
+def _read_columns_pandas(file_path, chunksize):
+    import pandas as pd
+    try:
+        chunks = pd.read_csv(file_path, chunksize=chunksize, dtype=str, keep_default_na=False)
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"Dataset file not found: {file_path}") from e
+    with chunks:
+        for frame in chunks:
+            yield columns_from_frame(frame)
+
+def columns_from_strings(header, rows):
+    """
+    Converts CSV rows of strings into whole columns at once: `user_type` as a string array,
+    `x_position`/`y_position` as int arrays, `assigned_frequency` as a float array (NaN where
+    blank) and `willing_to_rent`/`wants_to_broadcast` as bool arrays.
+    """
+    raw = dict(zip(header, zip(*rows)))
+    blank = ("",) * len(rows)
+    return _convert_columns(lambda name: raw.get(name, blank))
+
+def columns_from_frame(frame):
+    """
+    Converts a pandas DataFrame of users into the columns `columns_from_strings` produces.
+    """
+    blank = ("",) * len(frame)
+    def column(name):
+        if name not in frame:
+            return blank
+        values = frame[name]
+        return values.where(values.notna(), "").astype(str).to_numpy()
+    return _convert_columns(column)
+
+def _convert_columns(column):
+    return {
+        "user_type": np.array(column("user_type"), dtype=str),
+        "x_position": _as_coordinates(column("x_position")),
+        "y_position": _as_coordinates(column("y_position")),
+        "assigned_frequency": np.array([value or "nan" for value in column("assigned_frequency")], dtype=np.float64),
+        "willing_to_rent": _as_flags(column("willing_to_rent")),
+        "wants_to_broadcast": _as_flags(column("wants_to_broadcast")),
+    }
+
+def _as_coordinates(column):
+    """
+    Parses a column of coordinates, as ints unless some of them are fractional.
+    """
+    try:
+        values = np.array(column, dtype=np.float64)
+    except ValueError as e:
+        raise ValueError("Every user must have a numeric x_position and y_position.") from e
+    if np.isnan(values).any():
+        raise ValueError("Every user must have a numeric x_position and y_position.")
+    if (values == np.floor(values)).all():
+        return values.astype(np.int64)
+    return values
+
+_TRUE_STRINGS = frozenset(("True", "true", "TRUE"))
+
+def _as_flags(column):
+    return np.fromiter(map(_TRUE_STRINGS.__contains__, column), dtype=bool, count=len(column))
+
+def process_columns(chunks, sim, offset=0):
+    """
+    Builds users and the spectrum of their frequencies from chunks of columns.  Each chunk is
+    validated as a whole and its positions claimed with one `Simulation.register_positions`
+    call, before any of its users are created.  Rows are numbered from 0 across all chunks,
+    counting from `offset` when the first chunk doesn't start the file.
+    """
     users = []
     frequencies = []
 
-    for _, row in dataframe.iterrows():
-        x_pos = row['x_position']
-        y_pos = row['y_position']
-        assigned_frequency = row.get('assigned_frequency', None)
-        willing_to_rent = row.get('willing_to_rent', False)
-        wants_to_broadcast = row.get('wants_to_broadcast', False)
+    for columns in chunks:
+        user_type = columns["user_type"]
+        is_authorized = user_type == "Authorized"
+        is_cognitive = user_type == "Cognitive"
+        for row in np.flatnonzero(~(is_authorized | is_cognitive)):
+            print(f"Unknown user type: {user_type[row]} in row: {offset + row}")
 
-        if row['user_type'] == 'Authorized':
-            if pd.notna(assigned_frequency):
-                frequency = RadioFrequency(sim, float(assigned_frequency), float(assigned_frequency))
+        missing = np.flatnonzero(is_authorized & np.isnan(columns["assigned_frequency"]))
+        if len(missing):
+            raise ValueError(f"Authorized user missing an assigned frequency: row {offset + missing[0]}")
+
+        known = np.flatnonzero(is_authorized | is_cognitive)
+        xs = columns["x_position"][known].tolist()
+        ys = columns["y_position"][known].tolist()
+        ids = sim.register_positions(np.column_stack((xs, ys)) if xs else [])
+
+        authorized = is_authorized[known].tolist()
+        assigned = columns["assigned_frequency"][known].tolist()
+        willing = columns["willing_to_rent"][known].tolist()
+        wants = columns["wants_to_broadcast"][known].tolist()
+        for i in range(len(known)):
+            if authorized[i]:
+                frequency = RadioFrequency(sim, assigned[i], assigned[i])
                 frequencies.append(frequency)
-                user = AuthorizedUser(sim, x_pos, y_pos, frequency, willing_to_rent)
-                users.append(user)
+                users.append(AuthorizedUser(sim, xs[i], ys[i], frequency, willing[i], user_id=ids[i]))
             else:
-                raise ValueError(f"Authorized user missing an assigned frequency: {row}")
-        elif row['user_type'] == 'Cognitive':
-            user = CognitiveUser(sim, x_pos, y_pos, wants_to_broadcast)
-            users.append(user)
-        else:
-            print(f"Unknown user type: {row['user_type']} in row: {row}")
+                users.append(CognitiveUser(sim, xs[i], ys[i], wants[i], user_id=ids[i]))
+        offset += len(user_type)
+
     spectrum = RadioFrequencySpectrum(sim, *frequencies)
     return users, spectrum
 
+def process_users(dataframe, sim):
+    return process_columns([columns_from_frame(dataframe)], sim)
+
+def load_dataset(file_path, sim, engine="csv", chunksize=DEFAULT_CHUNK_ROWS):
+    """
+    Reads a users CSV straight into users and a spectrum, a chunk at a time.
+    """
+    with tracing.phase("load"):
+        return process_columns(read_columns(file_path, engine, chunksize), sim)
+
 def get_small_dataset(sim):
-    small_dataset = load_users_from_csv("data_files/small_dataset.csv")
-    return process_users(small_dataset, sim)
+    return load_dataset("data_files/small_dataset.csv", sim)
 
 def get_large_dataset(sim):
-    large_dataset = load_users_from_csv("data_files/large_dataset.csv")
-    return process_users(large_dataset, sim)
\ No newline at end of file
+    return load_dataset("data_files/large_dataset.csv", sim)
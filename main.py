@@ -1,12 +1,21 @@
-from radiograph import frequencies, system, users
+from radiograph import frequencies, system, tracing, users
+from radiograph.scenario import Scenario
 from radiograph.simulation import allocate_freqs, evaluate_allocation
-from data_generation.read_data import get_small_dataset, get_large_dataset
+from algorithms.graph_cache import shared_cache
+from functools import lru_cache
 import random
+import sys
 
 def setup(use_csv=False, dataset="small", transmit_dist=5):
+    with tracing.phase("setup"):
+        return _build_scenario(use_csv, dataset, transmit_dist)
+
+def _build_scenario(use_csv, dataset, transmit_dist):
     sim = system.Simulation(transmit_dist)
 
     if use_csv:
+        # Reading the CSV datasets needs numpy, so only load the reader when it is used.
+        from data_generation.read_data import get_small_dataset, get_large_dataset
         if dataset == "small":
             users_list, spectrum = get_small_dataset(sim)
         elif dataset == "large":
@@ -111,20 +120,39 @@ def setup(use_csv=False, dataset="small", transmit_dist=5):
 
     return spectrum, freqs, auths, cogs, sim
 
-def run_simulation(verbose, shuffle_order=False, use_csv=False, dataset="small", transmit_dist=5):
+@lru_cache(maxsize=None)
+def load_scenario(use_csv=False, dataset="small", transmit_dist=5):
+    """
+    Builds the scenario once per set of options and keeps an immutable snapshot of it, so
+    repeated runs only need to `instantiate` it.
+    """
+    return Scenario.capture(*setup(use_csv, dataset, transmit_dist))
+
+def run_simulation(verbose, shuffle_order=False, use_csv=False, dataset="small", transmit_dist=5, strategy="greedy", rng=None, graph_cache=False):
     """
     Run the simulation with options to use dynamic datasets or hardcoded data.
+    `strategy` picks the graph coloring strategy used for the allocation, and `rng` is the
+    `random.Random` used to shuffle the cognitive users (the global one if not given).
+    With `graph_cache` True, interference graphs are reused from this process's graph cache,
+    and with a `graph_cache` directory they are also shared on disk with other processes and
+    runs.  By default every run builds (and times) its own graph.
     """
-    (spectrum, freqs, auths, cogs, sim) = setup(use_csv, dataset, transmit_dist)
+    cache = None
+    if graph_cache is True:
+        cache = shared_cache()
+    elif graph_cache:
+        cache = shared_cache(graph_cache)
+
+    (spectrum, freqs, auths, cogs, sim) = load_scenario(use_csv, dataset, transmit_dist).instantiate()
 
     if shuffle_order:
-        random.shuffle(cogs)
+        (rng or random).shuffle(cogs)
 
     if verbose:
         system.display_sim_state(spectrum, auths, cogs, sim)
         print("")
 
-    allocate_freqs(spectrum, auths, cogs, sim, verbose)
+    allocate_freqs(spectrum, auths, cogs, sim, verbose, strategy=strategy, cache=cache)
 
     if verbose:
         system.display_sim_state(spectrum, auths, cogs, sim)
@@ -144,9 +172,11 @@ if __name__ == '__main__':
 
     run_simulation(True, use_csv=use_csv_input, dataset=dataset_choice, transmit_dist=transmit_dist)
 
-    iterations = 10
-    social_welfare_results = []
-    for i in range(iterations):
-        social_welfare_results.append(run_simulation(False, True, use_csv=use_csv_input, dataset=dataset_choice, transmit_dist=transmit_dist))
+    # `monte_carlo` imports `main`; point that at this script so it isn't loaded a second
+    # time with its own `load_scenario` cache.
+    sys.modules.setdefault("main", sys.modules[__name__])
+    from monte_carlo import format_summary, run_monte_carlo
 
-    print(f"\nSocial welfare in {iterations} different arrangements of same situation:", social_welfare_results)
+    summary = run_monte_carlo(10, use_csv=use_csv_input, dataset=dataset_choice, transmit_dist=transmit_dist)
+    print("\nSocial welfare over different arrangements of the same situation:")
+    print(format_summary(summary))
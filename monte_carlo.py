@@ -0,0 +1,131 @@
+"""
+Monte Carlo runs of the simulation: the same scenario allocated over many random orderings
+of the cognitive users, summarised as statistics of the social welfare.
+
+Every iteration draws from its own random stream derived from one base seed, so any single
+iteration can be re-run exactly with `run_iteration(seed, iteration, ...)`.
+
+Usage: `python3 monte_carlo.py --iterations 10000 --workers 8 --seed 42`
+"""
+import argparse
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from main import run_simulation
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def iteration_seed(seed, iteration):
+    """
+    Returns the seed of iteration number `iteration` of a run with base `seed`.  Streams are
+    spawned from a `numpy.random.SeedSequence`, so they are statistically independent.
+    """
+    sequence = np.random.SeedSequence(seed, spawn_key=(iteration,))
+    return int(sequence.generate_state(2, np.uint64)[0])
+
+
+def run_iteration(seed, iteration, use_csv=False, dataset="small", transmit_dist=5, strategy="greedy", graph_cache=True):
+    """
+    Runs (or re-runs) a single iteration and returns its social welfare.  Iterations reuse
+    the interference graph through the graph cache (see `run_simulation`).
+    """
+    rng = random.Random(iteration_seed(seed, iteration))
+    return run_simulation(False, True, use_csv, dataset, transmit_dist, strategy, rng, graph_cache)
+
+
+def run_monte_carlo(iterations, seed=None, workers=1, confidence=0.95, **scenario):
+    """
+    Runs `iterations` shuffled allocations of one scenario, across `workers` processes, and
+    returns the summary statistics of their social welfare (see `summarize`).  `scenario`
+    takes the `use_csv`, `dataset`, `transmit_dist`, `strategy` and `graph_cache` options
+    of `run_simulation`.  Without a `seed`, a fresh one is drawn and reported in the summary.
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    run = partial(run_iteration, seed, **scenario)
+
+    if workers > 1:
+        chunksize = max(iterations // (workers * 4), 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            welfare = list(pool.map(run, range(iterations), chunksize=chunksize))
+    else:
+        welfare = [run(iteration) for iteration in range(iterations)]
+
+    summary = summarize(welfare, confidence)
+    summary["seed"] = seed
+    return summary
+
+
+def summarize(values, confidence=0.95):
+    """
+    Returns the count, mean, standard deviation, extremes, percentiles and a normal
+    confidence interval of the mean of `values`, along with the values themselves.
+    """
+    n = len(values)
+    if n == 0:
+        raise ValueError("Cannot summarize zero iterations.")
+    mean = statistics.fmean(values)
+    stdev = statistics.stdev(values) if n > 1 else 0.0
+    margin = statistics.NormalDist().inv_cdf((1 + confidence) / 2) * stdev / n ** 0.5
+    percentiles = np.percentile(values, PERCENTILES)
+    return {
+        "iterations": n,
+        "mean": mean,
+        "stdev": stdev,
+        "min": min(values),
+        "max": max(values),
+        "percentiles": {p: float(value) for p, value in zip(PERCENTILES, percentiles)},
+        "confidence": confidence,
+        "ci_low": mean - margin,
+        "ci_high": mean + margin,
+        "values": list(values),
+    }
+
+
+def format_summary(summary):
+    """
+    Formats the statistics of a `summarize` summary as indented lines of text.
+    """
+    percentiles = ", ".join(f"p{p}={value:.3f}" for p, value in summary["percentiles"].items())
+    return "\n".join([
+        f" Iterations: {summary['iterations']} (seed {summary['seed']})",
+        f" Mean: {summary['mean']:.3f} (stdev {summary['stdev']:.3f})",
+        f" {round(summary['confidence'] * 100)}% CI of mean: [{summary['ci_low']:.3f}, {summary['ci_high']:.3f}]",
+        f" Range: [{summary['min']:.3f}, {summary['max']:.3f}]",
+        f" Percentiles: {percentiles}",
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo runs of the spectrum allocation simulation.")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None, help="base seed; drawn at random if omitted")
+    parser.add_argument("--csv", action="store_true", help="load the scenario from the CSV dataset")
+    parser.add_argument("--dataset", choices=["small", "large"], default="small")
+    parser.add_argument("--transmit-dist", type=int, default=5)
+    parser.add_argument("--strategy", default="greedy")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--graph-cache", metavar="DIR", help="keep interference graphs in DIR, shared between workers and runs")
+    parser.add_argument("--reproduce", type=int, metavar="ITERATION", help="re-run one iteration of --seed and print its welfare")
+    args = parser.parse_args()
+
+    scenario = dict(use_csv=args.csv, dataset=args.dataset, transmit_dist=args.transmit_dist, strategy=args.strategy,
+                    graph_cache=args.graph_cache or True)
+    if args.reproduce is not None:
+        if args.seed is None:
+            parser.error("--reproduce needs the --seed of the original run")
+        print(run_iteration(args.seed, args.reproduce, **scenario))
+        return
+
+    summary = run_monte_carlo(args.iterations, args.seed, args.workers, args.confidence, **scenario)
+    print(format_summary(summary))
+
+
+if __name__ == '__main__':
+    main()
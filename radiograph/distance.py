@@ -0,0 +1,157 @@
+from radiograph import tracing
+from radiograph.lazy import numpy as np
+
+# Candidate pairs are generated and tested in blocks of about this many pairs, which caps
+# the size of the temporary arrays regardless of how many users there are.
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+# Cell offsets covering each unordered pair of neighbouring cells exactly once.
+_HALF_NEIGHBORHOOD = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+def squared_distance(x1, y1, x2, y2):
+    """
+    Returns the squared Euclidean distance between two points.
+    """
+    x_dist = x1 - x2
+    y_dist = y1 - y2
+    return x_dist * x_dist + y_dist * y_dist
+
+
+def within_range(x1, y1, x2, y2, transmit_dist):
+    """
+    Indicates whether two points are within `transmit_dist` of each other, without a `sqrt`.
+    """
+    return squared_distance(x1, y1, x2, y2) <= transmit_dist * transmit_dist
+
+
+def as_positions(positions):
+    """
+    Returns `positions` as an (n, 2) float array of x/y coordinates.
+    """
+    array = np.asarray(positions, dtype=np.float64)
+    return array.reshape(-1, 2)
+
+
+def within_range_mask(positions_a, positions_b, transmit_dist):
+    """
+    Returns an (n, m) boolean array whose entry [i, j] indicates whether point i of
+    `positions_a` is within `transmit_dist` of point j of `positions_b`.
+    """
+    a = as_positions(positions_a)
+    b = as_positions(positions_b)
+    tracing.count(tracing.DISTANCE_EVALUATIONS, len(a) * len(b))
+    x_dist = a[:, 0, np.newaxis] - b[np.newaxis, :, 0]
+    y_dist = a[:, 1, np.newaxis] - b[np.newaxis, :, 1]
+    return x_dist * x_dist + y_dist * y_dist <= transmit_dist * transmit_dist
+
+
+def within_range_blocks(positions_a, positions_b, transmit_dist, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Yields `(start, mask)` pairs covering `within_range_mask(positions_a, positions_b)` a
+    block of rows at a time, where `mask` holds rows `start` through `start + len(mask)`.
+    Each block holds at most about `block_size` entries.
+    """
+    a = as_positions(positions_a)
+    b = as_positions(positions_b)
+    rows = max(block_size // max(len(b), 1), 1)
+    for start in range(0, len(a), rows):
+        yield (start, within_range_mask(a[start:start + rows], b, transmit_dist))
+
+
+def within_range_pairs(positions, transmit_dist, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Returns two index arrays `(i, j)`, with i < j, listing every pair of `positions`
+    within `transmit_dist` of each other.
+
+    Points are bucketed into a grid of `transmit_dist`-wide cells, so only pairs in the
+    same or adjacent cells are ever compared.  Those candidate pairs are generated and
+    tested with array operations, a block at a time.
+    """
+    points = as_positions(positions)
+    num_points = len(points)
+    if num_points < 2:
+        empty = np.empty(0, dtype=np.int64)
+        return (empty, empty)
+
+    cell_size = transmit_dist or 1
+    cols = np.floor(points[:, 0] / cell_size).astype(np.int64)
+    rows = np.floor(points[:, 1] / cell_size).astype(np.int64)
+    cols -= cols.min()
+    rows -= rows.min()
+    # Pad both axes by one cell so that neighbouring-cell offsets never wrap around a row.
+    width = int(rows.max()) + 3
+    keys = (cols + 1) * width + (rows + 1)
+
+    order = np.argsort(keys, kind="stable")
+    (cell_keys, cell_starts, cell_counts) = np.unique(keys[order], return_index=True, return_counts=True)
+    sorted_points = points[order]
+    limit = transmit_dist * transmit_dist
+
+    found_i = []
+    found_j = []
+    for (d_col, d_row) in _HALF_NEIGHBORHOOD:
+        targets = cell_keys + d_col * width + d_row
+        target_cells = np.searchsorted(cell_keys, targets)
+        target_cells[target_cells == len(cell_keys)] = 0
+        matched = cell_keys[target_cells] == targets
+        source_cells = np.flatnonzero(matched)
+        target_cells = target_cells[matched]
+
+        sizes = cell_counts[source_cells] * cell_counts[target_cells]
+        ends = np.cumsum(sizes)
+        block_start = 0
+        while block_start < len(source_cells):
+            done = ends[block_start - 1] if block_start else 0
+            block_end = int(np.searchsorted(ends, done + block_size, side="right"))
+            block_end = max(block_end, block_start + 1)
+
+            (i, j) = _cell_pair_candidates(
+                cell_starts[source_cells[block_start:block_end]],
+                cell_counts[source_cells[block_start:block_end]],
+                cell_starts[target_cells[block_start:block_end]],
+                cell_counts[target_cells[block_start:block_end]],
+            )
+            if d_col == 0 and d_row == 0:
+                keep = i < j
+                i = i[keep]
+                j = j[keep]
+            x_dist = sorted_points[i, 0] - sorted_points[j, 0]
+            y_dist = sorted_points[i, 1] - sorted_points[j, 1]
+            close = x_dist * x_dist + y_dist * y_dist <= limit
+            tracing.count(tracing.DISTANCE_EVALUATIONS, len(i))
+            found_i.append(i[close])
+            found_j.append(j[close])
+            block_start = block_end
+
+    i = order[np.concatenate(found_i)]
+    j = order[np.concatenate(found_j)]
+    return (np.minimum(i, j), np.maximum(i, j))
+
+
+def _cell_pair_candidates(source_starts, source_counts, target_starts, target_counts):
+    """
+    Expands matched cell pairs into the cross product of their (sorted) point indices.
+    """
+    sizes = source_counts * target_counts
+    total = int(sizes.sum())
+    pair_of = np.repeat(np.arange(len(sizes)), sizes)
+    offsets = np.arange(total) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    target_counts = target_counts[pair_of]
+    i = source_starts[pair_of] + offsets // target_counts
+    j = target_starts[pair_of] + offsets % target_counts
+    return (i, j)
+
+
+def adjacency_from_pairs(num_points, i, j):
+    """
+    Converts an edge list into adjacency lists of plain ints, one list per point.
+    """
+    sources = np.concatenate((i, j))
+    targets = np.concatenate((j, i))
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(num_points + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_points), out=indptr[1:])
+    flat = targets[order].tolist()
+    bounds = indptr.tolist()
+    return [flat[bounds[v]:bounds[v + 1]] for v in range(num_points)]
@@ -0,0 +1,241 @@
+"""
+A discrete-event engine for running a scenario over simulated time, rather than allocating
+a single snapshot.
+
+Events are kept in a heap ordered by time:
+- arrival: a new cognitive user appears at a free position, wanting to broadcast.
+- departure: a cognitive user leaves, handing back any band it was leasing.
+- reclaim: an authorized user takes its band back to broadcast on, evicting its lessees.
+- release: an authorized user stops broadcasting, so its band can be leased again.
+
+Arrivals form a Poisson process, users stay for an exponential holding time, and each
+authorized user alternates between exponentially long idle and busy periods.  Each event
+only reallocates the users it affects: an arriving or evicted user takes the first
+leasable band none of its neighbours are on, and a departure only offers its band to
+waiting neighbours.  Neighbours come from an `InterferenceGraph` kept up to date as users
+come and go.
+"""
+import bisect
+import heapq
+import math
+import random
+import time
+
+from algorithms.dynamic_graph import InterferenceGraph
+from radiograph.system import is_not_out_of_range
+from radiograph.users import CognitiveUser
+
+ARRIVAL = "arrival"
+DEPARTURE = "departure"
+RECLAIM = "reclaim"
+RELEASE = "release"
+
+# An arrival that finds no free position in this many random draws is turned away.
+MAX_PLACEMENT_ATTEMPTS = 100
+
+
+class EventScheduler:
+    """
+    A heap of `(time, kind, payload)` events.  Events at the same time come out in the
+    order they were scheduled.
+    """
+    def __init__(self):
+        self.heap = []
+        self.scheduled = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def schedule(self, at, kind, payload=None):
+        heapq.heappush(self.heap, (at, self.scheduled, kind, payload))
+        self.scheduled += 1
+
+    def pop(self):
+        (at, _, kind, payload) = heapq.heappop(self.heap)
+        return (at, kind, payload)
+
+    def peek_time(self):
+        return self.heap[0][0] if self.heap else math.inf
+
+
+class Engine:
+    """
+    Runs arrivals, departures, reclaims and releases over a scenario as returned by
+    `main.setup`, usually after an initial `allocate_freqs`.  Authorized users that are
+    broadcasting start out busy, and the others start out leasing their band.  Means are
+    in units of simulated time, and `arrival_rate` is in users per unit of time.
+    """
+    def __init__(self, spectrum, auths, cogs, sim, rng=None, arrival_rate=1.0, mean_holding=100.0,
+                 mean_idle=200.0, mean_busy=50.0, max_position=None):
+        self.spectrum = spectrum
+        self.auths = list(auths)
+        self.sim = sim
+        self.rng = rng or random.Random()
+        self.arrival_rate = arrival_rate
+        self.mean_holding = mean_holding
+        self.mean_idle = mean_idle
+        self.mean_busy = mean_busy
+        if max_position is None:
+            max_position = max((max(user.position) for user in list(auths) + list(cogs)), default=100)
+        self.max_position = max_position
+
+        self.now = 0.0
+        self.scheduler = EventScheduler()
+        self.handlers = {ARRIVAL: self._arrival, DEPARTURE: self._departure, RECLAIM: self._reclaim, RELEASE: self._release}
+        self.counts = {kind: 0 for kind in self.handlers}
+        self.grants = 0
+        self.evictions = 0
+        self.turned_away = 0
+
+        self.graph = InterferenceGraph(sim, cogs)
+        # Indices into `auths` of the authorized users not broadcasting, in order, whose bands can be leased.
+        self.free_bands = []
+        # Cognitive users that want to broadcast but have no band, as an insertion-ordered set.
+        self.waiting = {}
+
+        for (index, auth) in enumerate(self.auths):
+            if auth.is_broadcasting:
+                self.scheduler.schedule(self._after(self.mean_busy), RELEASE, index)
+            else:
+                self.free_bands.append(index)
+                self.scheduler.schedule(self._after(self.mean_idle), RECLAIM, index)
+        for cog in cogs:
+            if cog.wants_to_broadcast_now and cog.active_frequency is None:
+                self.waiting[cog] = None
+            self.scheduler.schedule(self._after(self.mean_holding), DEPARTURE, cog)
+        if arrival_rate > 0:
+            self.scheduler.schedule(self.rng.expovariate(arrival_rate), ARRIVAL)
+
+    def schedule(self, at, kind, payload=None):
+        self.scheduler.schedule(at, kind, payload)
+
+    def run(self, until=math.inf, max_events=None):
+        """
+        Processes events in time order until simulated time `until` or `max_events` events,
+        and returns the statistics of this run (see `stats`).
+        """
+        processed = 0
+        start = time.perf_counter()
+        while self.scheduler and self.scheduler.peek_time() <= until:
+            if max_events is not None and processed >= max_events:
+                break
+            (self.now, kind, payload) = self.scheduler.pop()
+            self.handlers[kind](payload)
+            self.counts[kind] += 1
+            processed += 1
+        return self.stats(processed, time.perf_counter() - start)
+
+    def stats(self, processed=0, elapsed=0.0):
+        return {
+            "events": processed,
+            "seconds": elapsed,
+            "events_per_second": processed / elapsed if elapsed > 0 else 0.0,
+            "time": self.now,
+            "by_kind": dict(self.counts),
+            "grants": self.grants,
+            "evictions": self.evictions,
+            "turned_away": self.turned_away,
+            "users": len(self.graph),
+            "leasing": sum(len(self.auths[index].assigned_frequency.lessees) for index in self.free_bands),
+            "waiting": len(self.waiting),
+        }
+
+    def _after(self, mean):
+        return self.now + self.rng.expovariate(1 / mean)
+
+    def _arrival(self, _):
+        position = self._free_position()
+        if position is None:
+            self.turned_away += 1
+        else:
+            user = CognitiveUser(self.sim, *position, True)
+            self.graph.add_user(user)
+            self._lease(user)
+            self.scheduler.schedule(self._after(self.mean_holding), DEPARTURE, user)
+        self.scheduler.schedule(self.now + self.rng.expovariate(self.arrival_rate), ARRIVAL)
+
+    def _free_position(self):
+        """
+        Draws random positions until one is free, or returns None if the grid is full or
+        `MAX_PLACEMENT_ATTEMPTS` draws all land on occupied positions.
+        """
+        if len(self.sim.user_positions) >= (self.max_position + 1) ** 2:
+            return None
+        for _ in range(MAX_PLACEMENT_ATTEMPTS):
+            (x, y) = (self.rng.randint(0, self.max_position), self.rng.randint(0, self.max_position))
+            if (x, y) not in self.sim.user_positions:
+                return (x, y)
+        return None
+
+    def _departure(self, user):
+        band = user.active_frequency
+        if band is not None:
+            self._end_lease(user)
+        self.waiting.pop(user, None)
+        neighbors = list(self.graph.neighbors[user])
+        self.graph.remove_user(user)
+        # The departing user only kept its neighbours off its own band.
+        if band is not None:
+            for neighbor in neighbors:
+                if neighbor in self.waiting and self._fits(neighbor, band):
+                    self._grant(band.owner, neighbor)
+
+    def _reclaim(self, index):
+        auth = self.auths[index]
+        band = auth.assigned_frequency
+        evicted = list(band.lessees)
+        for lessee in evicted:
+            self._end_lease(lessee)
+        self.evictions += len(evicted)
+        self.free_bands.pop(bisect.bisect_left(self.free_bands, index))
+        auth.begin_broadcasting(False)
+        for lessee in evicted:
+            self._lease(lessee)
+        self.scheduler.schedule(self._after(self.mean_busy), RELEASE, index)
+
+    def _release(self, index):
+        auth = self.auths[index]
+        band = auth.assigned_frequency
+        auth.stop_broadcasting()
+        band.user_unassigned(auth)
+        bisect.insort(self.free_bands, index)
+        # Waiting users have no band because every other one was taken around them.
+        for user in list(self.waiting):
+            if self._fits(user, band):
+                self._grant(auth, user)
+        self.scheduler.schedule(self._after(self.mean_idle), RECLAIM, index)
+
+    def _lease(self, user):
+        """
+        Leases `user` the first free band that none of its neighbours are on, or else adds
+        it to the waiting users.  At most one band per neighbour is skipped.
+        """
+        taken = {neighbor.active_frequency for neighbor in self.graph.neighbors[user]}
+        for index in self.free_bands:
+            lessor = self.auths[index]
+            if lessor.assigned_frequency not in taken:
+                self._grant(lessor, user)
+                return True
+        self.waiting[user] = None
+        return False
+
+    def _fits(self, user, band):
+        """
+        Indicates whether `user` could join `band` without being in range of anyone on it,
+        as `RadioFrequency.new_user_assigned` would decide.
+        """
+        for other in band.occupants.nearby(user.pos_x, user.pox_y):
+            if is_not_out_of_range(user, other, self.sim):
+                return False
+        return True
+
+    def _grant(self, lessor, user):
+        lessor.grant_frequency(lessor.assigned_frequency, user)
+        user.begin_broadcasting(False)
+        self.waiting.pop(user, None)
+        self.grants += 1
+
+    def _end_lease(self, user):
+        lessor = user.active_frequency.owner
+        user.stop_broadcasting()
+        lessor.revoke_frequency(user)
@@ -0,0 +1,146 @@
+"""
+Structured events from the allocation, for logging and tracing without `print`.
+
+Users and frequencies report what happens to them by calling `emit` with an event kind and
+the objects involved.  Every subscribed sink receives each event as `(kind, fields)`.  With
+nothing subscribed, `emit` returns at once, so no strings are ever formatted.
+
+    with events.subscribed(events.JsonLinesSink("run.jsonl")):
+        allocate_freqs(...)
+"""
+import contextlib
+import json
+import sys
+
+LEASE_GRANTED = "lease_granted"
+LEASE_REVOKED = "lease_revoked"
+ADMISSION_REJECTED = "admission_rejected"
+BROADCAST_STARTED = "broadcast_started"
+BROADCAST_STOPPED = "broadcast_stopped"
+# An authorized user takes back a band it had leased out, or can't because it is in use.
+RECLAIMED = "reclaimed"
+RECLAIM_REFUSED = "reclaim_refused"
+
+KINDS = (LEASE_GRANTED, LEASE_REVOKED, ADMISSION_REJECTED, BROADCAST_STARTED, BROADCAST_STOPPED, RECLAIMED, RECLAIM_REFUSED)
+
+sinks = []
+
+
+def subscribe(sink):
+    sinks.append(sink)
+    return sink
+
+
+def unsubscribe(sink):
+    sinks.remove(sink)
+
+
+@contextlib.contextmanager
+def subscribed(sink):
+    """
+    Subscribes `sink` for the duration of a `with` block, then flushes and unsubscribes it.
+    """
+    subscribe(sink)
+    try:
+        yield sink
+    finally:
+        unsubscribe(sink)
+        sink.flush()
+
+
+def emit(kind, **fields):
+    if not sinks:
+        return
+    for sink in sinks:
+        sink.handle(kind, fields)
+
+
+class NullSink:
+    """
+    Accepts and discards every event.
+    """
+    def handle(self, kind, fields):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ConsoleSink:
+    """
+    Prints each event as a line of text, optionally only events of the given `kinds`.
+    """
+    MESSAGES = {
+        LEASE_GRANTED: "{lessor.id} has leased {frequency} to {user.id}",
+        LEASE_REVOKED: "{lessor.id} has revoked {frequency} from {user.id}",
+        ADMISSION_REJECTED: "{user} cannot transmit on this frequency because they are within range of {blocker}.",
+        BROADCAST_STARTED: "{user.id} has begun broadcasting on {frequency}",
+        BROADCAST_STOPPED: "{user.id} has stopped broadcasting on {frequency}",
+        RECLAIMED: "{user.id} has rented out this frequency but it is not being used, so we'll take it back.",
+        RECLAIM_REFUSED: "{user.id} has rented out this frequency and it is being used, so we cannot broadcast on it.",
+    }
+    # Asked not to steal the band back, the user looks elsewhere instead.
+    LOOKING_ELSEWHERE = "{user.id} has rented out this frequency and it is being used, checking other options"
+
+    def __init__(self, file=None, kinds=None):
+        self.file = file
+        self.kinds = set(kinds) if kinds is not None else None
+
+    def handle(self, kind, fields):
+        if self.kinds is None or kind in self.kinds:
+            message = self.MESSAGES[kind]
+            if kind == RECLAIM_REFUSED and not fields.get("steal", True):
+                message = self.LOOKING_ELSEWHERE
+            print(message.format(**fields), file=self.file or sys.stdout)
+
+    def flush(self):
+        (self.file or sys.stdout).flush()
+
+    def close(self):
+        self.flush()
+
+
+class JsonLinesSink:
+    """
+    Writes each event as a JSON object on its own line, e.g.
+    `{"kind": "lease_granted", "lessor": "a3", "user": "c7", "frequency": 101.1}`.
+    Users are written as their ids and frequencies as their values.  Events are buffered
+    and written `buffer_size` at a time; call `close` (or use it in a `with`) when done.
+    """
+    def __init__(self, path, buffer_size=10_000):
+        self.file = open(path, "w")
+        self.buffer_size = buffer_size
+        self.buffer = []
+
+    def handle(self, kind, fields):
+        self.buffer.append((kind, fields))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        lines = [json.dumps({"kind": kind, **{name: _plain(value) for name, value in fields.items()}}) for (kind, fields) in self.buffer]
+        self.buffer = []
+        if lines:
+            self.file.write("\n".join(lines) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _plain(value):
+    if hasattr(value, "frequency"):
+        return value.frequency
+    if hasattr(value, "id"):
+        return value.id
+    return value
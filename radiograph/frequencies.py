@@ -1,4 +1,8 @@
-from radiograph.system import *
+import bisect
+
+from radiograph import events, tracing
+from radiograph.system import Simulation, is_not_out_of_range
+from radiograph.spatial import SpatialHash
 
 class RadioFrequency:
     """
@@ -8,27 +12,63 @@ class RadioFrequency:
         self.id = id
         self.frequency = freq
         self.sim = sim
+        self.assigned_to = []
+        # Position of each assigned user in `assigned_to`, so users can be removed in O(1).
+        self.slots = {}
+        # Spatial index of assigned users, so admission only looks at nearby co-channel users.
+        self.occupants = SpatialHash(sim.get_transmit_distance() or 1)
         if user:
-            self.assigned_to = [user]
-        else:
-            self.assigned_to = []
+            self.add_occupant(user)
         self.is_active = False
+        # Reverse maps kept in sync by `AuthorizedUser`: who owns this band, and who leases it.
+        self.owner = None
+        self.lessees = {}
     
     def __str__(self):
         return f"[Frequency {self.frequency} ({self.id})]"
+
+    def __contains__(self, user):
+        return user in self.slots
     
     def new_user_assigned(self, user, verbose=True):
-        for existing_user in self.assigned_to:
+        for existing_user in self.occupants.nearby(user.pos_x, user.pox_y):
             if is_not_out_of_range(user, existing_user, self.sim):
+                events.emit(events.ADMISSION_REJECTED, user=user, frequency=self, blocker=existing_user)
+                tracing.count(tracing.ADMISSION_REJECTIONS)
                 if verbose:
                     print(f"{user} cannot transmit on this frequency because they are within range of {existing_user}.")
                 return False
-        self.assigned_to.append(user)
+        self.add_occupant(user)
         return True
 
+    def add_occupant(self, user):
+        """
+        Puts `user` on this frequency without checking for interference, as owners do when
+        broadcasting on their own band.
+        """
+        if user in self.slots:
+            return
+        self.slots[user] = len(self.assigned_to)
+        self.assigned_to.append(user)
+        self.occupants.insert(user, user.pos_x, user.pox_y)
+
     def user_unassigned(self, user):
-        if user in self.assigned_to:
-            self.assigned_to.remove(user)
+        index = self.slots.pop(user, None)
+        if index is None:
+            return
+        # Fill the gap with the last user rather than shifting everyone after it.
+        last_user = self.assigned_to.pop()
+        if last_user is not user:
+            self.assigned_to[index] = last_user
+            self.slots[last_user] = index
+        self.occupants.remove(user, user.pos_x, user.pox_y)
+
+    def user_moved(self, user, old_x, old_y):
+        """
+        Re-indexes an assigned `user` that has moved from (`old_x`, `old_y`).
+        """
+        self.occupants.remove(user, old_x, old_y)
+        self.occupants.insert(user, user.pos_x, user.pox_y)
 
 class RadioFrequencySpectrum:
     """
@@ -37,6 +77,13 @@ class RadioFrequencySpectrum:
     """
     def __init__(self, sim: Simulation, *freqs):
         self.frequencies = freqs
+        # Lookup by id; the first frequency wins if ids repeat, as with a linear search.
+        self.by_id = {}
+        for f in freqs:
+            self.by_id.setdefault(f.id, f)
+        # Frequencies ordered by centre frequency, for band queries by bisection.
+        self.by_centre = sorted(freqs, key=lambda f: f.frequency)
+        self.centres = [f.frequency for f in self.by_centre]
 
 
     def __getitem__(self, index):
@@ -52,7 +99,38 @@ class RadioFrequencySpectrum:
         Search for a radio frequency by `id` and returns that frequency, 
         or `None` if not found.
         """
-        for f in self.frequencies:
-            if f.id == id:
-                return f
-        return None
+        return self.by_id.get(id)
+
+
+    def frequencies_in_band(self, lo, hi):
+        """
+        Returns the frequencies whose centre lies between `lo` and `hi` inclusive,
+        ordered by centre frequency.
+        """
+        start = bisect.bisect_left(self.centres, lo)
+        end = bisect.bisect_right(self.centres, hi)
+        return self.by_centre[start:end]
+
+
+    def owner_of(self, frequency):
+        """
+        Returns the authorized user that owns `frequency` (a frequency or its id),
+        or `None` if nobody does.
+        """
+        return self._resolve(frequency).owner
+
+
+    def lessees_of(self, frequency):
+        """
+        Returns the cognitive users currently leasing `frequency` (a frequency or its id).
+        """
+        return list(self._resolve(frequency).lessees)
+
+
+    def _resolve(self, frequency):
+        if isinstance(frequency, RadioFrequency):
+            return frequency
+        found = self.get_frequency(frequency)
+        if found is None:
+            raise KeyError(f"No frequency with id {frequency} in this spectrum.")
+        return found
@@ -0,0 +1,24 @@
+"""
+Modules that only some code paths need, imported the first time they are used rather than
+when the package is, so importing it stays fast (see `benchmarks.import_time`).
+
+    from radiograph.lazy import numpy as np
+"""
+import importlib
+
+
+class LazyModule:
+    """
+    Stands in for the module `name`, importing it on the first attribute lookup.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.module = None
+
+    def __getattr__(self, attribute):
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+        return getattr(self.module, attribute)
+
+
+numpy = LazyModule("numpy")
@@ -0,0 +1,154 @@
+"""
+Rendering for the utility plots.  Charts are drawn from plain lists, so they can be
+handed to a background process, and are either shown interactively or written to a
+PNG/SVG file (chosen by the file extension) without needing a display.
+"""
+import atexit
+import math
+
+# Above these sizes, bar charts are aggregated into bins and scatter plots are thinned out.
+DEFAULT_MAX_BARS = 2000
+DEFAULT_MAX_POINTS = 5000
+
+_background_renderer = None
+
+
+class BackgroundRenderer:
+    """
+    Renders charts to files in a separate worker process, so the caller never waits on
+    matplotlib.  Call `wait` to block until everything submitted has been written, or use
+    it as a context manager.
+    """
+    def __init__(self):
+        from concurrent.futures import ProcessPoolExecutor
+        self.pool = ProcessPoolExecutor(max_workers=1)
+        self.pending = []
+
+    def submit(self, render, *args):
+        future = self.pool.submit(render, *args)
+        self.pending.append(future)
+        return future
+
+    def wait(self):
+        pending, self.pending = self.pending, []
+        for future in pending:
+            future.result()
+
+    def close(self):
+        self.wait()
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def background_renderer():
+    """
+    Returns a shared `BackgroundRenderer`, started on first use and closed at exit.
+    """
+    global _background_renderer
+    if _background_renderer is None:
+        _background_renderer = BackgroundRenderer()
+        atexit.register(_background_renderer.close)
+    return _background_renderer
+
+
+def dispatch(render, args, path=None, renderer=None):
+    """
+    Calls `render(*args, path)`, in `renderer`'s worker process when writing to a file.
+    """
+    if path is not None and renderer is not None:
+        return renderer.submit(render, *args, path)
+    return render(*args, path)
+
+
+def aggregate_bars(labels, values, max_bars=DEFAULT_MAX_BARS):
+    """
+    If there are more than `max_bars` bars, merges consecutive bars into bins showing their
+    mean value, labelled by the first and last label in the bin.
+    """
+    if len(values) <= max_bars:
+        return (list(labels), list(values))
+    bin_size = math.ceil(len(values) / max_bars)
+    binned_labels = []
+    binned_values = []
+    for start in range(0, len(values), bin_size):
+        end = min(start + bin_size, len(values))
+        binned_labels.append(f"{labels[start]} .. {labels[end - 1]}")
+        binned_values.append(sum(values[start:end]) / (end - start))
+    return (binned_labels, binned_values)
+
+
+def downsample(items, max_points=DEFAULT_MAX_POINTS):
+    """
+    Keeps an evenly spaced subset of at most `max_points` of `items`.
+    """
+    if len(items) <= max_points:
+        return list(items)
+    return list(items[::math.ceil(len(items) / max_points)])
+
+
+def render_utility_graph(labels, utilities, path=None):
+    """
+    Bar chart of the utility of each user (or bin of users).
+    """
+    (fig, ax) = _new_figure(path)
+    ax.bar(labels, utilities)
+    ax.set_xlabel('Users')
+    ax.set_ylabel('Utility')
+    ax.set_title('Utility Distribution Among Users')
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment('right')
+    _finish(fig, path)
+
+
+def render_lots(indices, utilities, nash_indices, nash_utilities, pareto_indices, pareto_utilities, social_welfare, path=None):
+    """
+    Scatter of user utilities, highlighting the Pareto optimal users and the users in Nash
+    equilibrium, with the Pareto frontier and the social welfare drawn as lines.
+    """
+    (fig, ax) = _new_figure(path)
+    ax.scatter(indices, utilities, label='All Users', color='blue', alpha=0.7)
+
+    # Highlight Pareto-optimal utilities
+    ax.scatter(pareto_indices, pareto_utilities, color='red', label='Pareto Optimal')
+
+    # Highlight users in Nash equilibrium with a different marker (e.g., 'x')
+    ax.scatter(nash_indices, nash_utilities, color='green', label='Nash Equilibrium', marker='x')
+
+    # Draw Pareto Frontier Line
+    ax.plot(pareto_indices, pareto_utilities, linestyle='--', color='red', label='Pareto Frontier')
+
+    # Social welfare
+    ax.axhline(social_welfare, color='purple', linestyle='-.', label=f'Social Welfare: {social_welfare:.2f}')
+
+    ax.set_xlabel('User Index')
+    ax.set_ylabel('Utility')
+    ax.set_title('Pareto Frontier of Spectrum Allocation')
+    ax.legend()
+    ax.grid(True)
+    _finish(fig, path)
+
+
+def _new_figure(path):
+    if path is None:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=(10, 6))
+    else:
+        # A bare Figure draws through the Agg canvas and never touches pyplot or a display.
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=(10, 6))
+    return (fig, fig.add_subplot())
+
+
+def _finish(fig, path):
+    fig.tight_layout()
+    if path is None:
+        import matplotlib.pyplot as plt
+        plt.show()
+    else:
+        fig.savefig(path)
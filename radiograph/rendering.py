@@ -0,0 +1,144 @@
+"""
+Text rendering of real space, as shown by `system.display_sim_state`.
+
+Grids larger than the viewport are downsampled to fit it, so only the viewport's cells are
+ever stored and drawing costs time in proportion to the number of users rather than to the
+area they are spread over.  Each frame is built as a single string.  A `GridRenderer` can
+also redraw a live simulation in a terminal, rewriting only the rows that changed since the
+last frame.
+"""
+import sys
+
+from radiograph.lazy import numpy as np
+
+# Grids up to this many cells across are drawn one cell per position.
+DEFAULT_VIEWPORT = 100
+
+EMPTY = "  "
+IN_RANGE = ". "
+ORIGIN = "+"
+
+
+def grid_size(users, transmit_dist):
+    """
+    The width (and height) of the square grid that holds every user and its range.
+    """
+    max_x = max(user.pos_x for user in users) + transmit_dist
+    max_y = max(user.pox_y for user in users) + transmit_dist
+    return max(max_x, max_y) + 1
+
+
+class GridRenderer:
+    """
+    Draws users and their ranges on a grid `size` positions across, shrunk to at most
+    `viewport` cells across by drawing each cell for a square block of positions.  A
+    downsampled cell holding a single user shows its id, and one holding several shows
+    how many there are.
+
+    Leave `size` out to fit each frame to its users with `grid_size`; give it to keep the
+    scale fixed between frames of a live simulation.
+    """
+    def __init__(self, transmit_dist, viewport=DEFAULT_VIEWPORT, size=None, file=None):
+        self.transmit_dist = transmit_dist
+        self.viewport = viewport
+        self.size = size
+        self.file = file
+        self.previous = None
+
+    def lines(self, users):
+        """
+        Returns the rows of a frame, top row first, including the borders above and below.
+        """
+        size = self.size if self.size is not None else grid_size(users, self.transmit_dist)
+        scale = -(-size // self.viewport)
+        cells = -(-size // scale)
+
+        xs = np.fromiter((user.pos_x for user in users), np.int64, len(users))
+        ys = np.fromiter((user.pox_y for user in users), np.int64, len(users))
+        marked = np.zeros(cells * cells, bool)
+        _mark_range(marked, xs, ys, self.transmit_dist, size, scale, cells)
+
+        inside = np.flatnonzero((xs >= 0) & (xs < size) & (ys >= 0) & (ys < size))
+        flat = (ys[inside] // scale) * cells + xs[inside] // scale
+        counts = np.bincount(flat, minlength=cells * cells)
+        # Where a cell holds a single user, the index in `users` of that user.
+        occupant = np.full(cells * cells, -1)
+        occupant[flat] = inside
+        (counts, occupant, marked) = (counts.tolist(), occupant.tolist(), marked.tolist())
+
+        def cell(index):
+            if counts[index] == 1:
+                return users[occupant[index]].id
+            if counts[index] > 1:
+                return str(counts[index]) if counts[index] < 100 else "**"
+            if marked[index]:
+                return IN_RANGE
+            if index == 0:
+                return ORIGIN
+            return EMPTY
+
+        # Only rows with something in them need building cell by cell.
+        blank = (EMPTY + " ") * cells + "|"
+        busy = {index // cells for index in range(cells * cells) if marked[index] or counts[index]} | {0}
+        border = "---" * cells
+        rows = [border]
+        for y in reversed(range(cells)):
+            if y in busy:
+                rows.append("".join(cell(y * cells + x) + " " for x in range(cells)) + "|")
+            else:
+                rows.append(blank)
+        rows.append(border)
+        return rows
+
+    def frame(self, users):
+        return "\n".join(self.lines(users))
+
+    def draw(self, users):
+        """
+        Prints a whole frame in a single write.
+        """
+        print(self.frame(users), file=self.file or sys.stdout)
+
+    def redraw(self, users):
+        """
+        Updates a live view in a terminal, moving the cursor to rewrite only the rows that
+        changed since the last call.  The first call, or one whose frame has a different
+        number of rows, clears the screen and draws the whole frame.  Returns how many
+        rows were written.
+        """
+        lines = self.lines(users)
+        if self.previous is None or len(self.previous) != len(lines):
+            changed = list(range(len(lines)))
+            out = ["\x1b[2J"]
+        else:
+            changed = [row for row in range(len(lines)) if lines[row] != self.previous[row]]
+            out = []
+        for row in changed:
+            out.append(f"\x1b[{row + 1};1H{lines[row]}\x1b[K")
+        out.append(f"\x1b[{len(lines) + 1};1H")
+        file = self.file or sys.stdout
+        file.write("".join(out))
+        file.flush()
+        self.previous = lines
+        return len(changed)
+
+
+def _mark_range(marked, xs, ys, dist, size, scale, cells):
+    """
+    Marks the cells on the grid along the eight rays of length `dist` out of each position
+    (`xs`, `ys`).  Rather than every step along a ray, only the first step and the steps at
+    which it crosses into a new cell are visited, which is every step when `scale` is 1.
+    """
+    rounds = -(-dist // scale)
+    (forward_x, back_x) = (scale - xs % scale, xs % scale + 1)
+    (forward_y, back_y) = (scale - ys % scale, ys % scale + 1)
+    rays = ((1, 0, (forward_x,)), (-1, 0, (back_x,)), (0, 1, (forward_y,)), (0, -1, (back_y,)),
+            (1, 1, (forward_x, forward_y)), (1, -1, (forward_x, back_y)),
+            (-1, 1, (back_x, forward_y)), (-1, -1, (back_x, back_y)))
+    for (sign_x, sign_y, firsts) in rays:
+        for first in firsts:
+            for steps in [np.ones_like(first)] + [first + crossing * scale for crossing in range(rounds)]:
+                new_x = xs + sign_x * steps
+                new_y = ys + sign_y * steps
+                ok = (steps <= dist) & (new_x >= 0) & (new_x < size) & (new_y >= 0) & (new_y < size)
+                marked[(new_y[ok] // scale) * cells + new_x[ok] // scale] = True
@@ -0,0 +1,64 @@
+from collections import namedtuple
+
+from radiograph.frequencies import RadioFrequency, RadioFrequencySpectrum
+from radiograph.system import Simulation
+from radiograph.users import AuthorizedUser, CognitiveUser
+
+class Scenario(namedtuple("Scenario", [
+    "transmit_dist",
+    # (id, frequency) of each band in the spectrum, in spectrum order.
+    "frequencies",
+    # (user id, x, y, index of the assigned band in `frequencies` or -1, wants to broadcast)
+    "authorized",
+    # (user id, x, y, wants to broadcast)
+    "cognitive",
+    # Occupied positions and the state of the id allocator, copied into each new simulation.
+    "positions",
+    "num_ids_issued",
+    "free_ids",
+])):
+    """
+    An immutable snapshot of a scenario before any allocation: where everyone is, who owns
+    which band, and who wants to broadcast.  Load a scenario once, then `instantiate` it for
+    each run to get fresh users and frequencies, with no file I/O and without validating
+    every position again.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def capture(cls, spectrum, freqs, auths, cogs, sim):
+        """
+        Snapshots a scenario as returned by `main.setup`.
+        """
+        index_of = {freq: index for index, freq in enumerate(spectrum.frequencies)}
+        return cls(
+            sim.get_transmit_distance(),
+            tuple((freq.id, freq.frequency) for freq in spectrum.frequencies),
+            tuple(
+                (auth.uid, auth.pos_x, auth.pox_y, index_of.get(auth.assigned_frequency, -1), auth.wants_to_broadcast_now)
+                for auth in auths
+            ),
+            tuple((cog.uid, cog.pos_x, cog.pox_y, cog.wants_to_broadcast_now) for cog in cogs),
+            frozenset(sim.user_positions),
+            sim.num_ids_issued,
+            tuple(sim.free_ids),
+        )
+
+    def instantiate(self):
+        """
+        Builds fresh, unallocated objects for this scenario in time proportional to the
+        number of users, returned as `(spectrum, freqs, auths, cogs, sim)` like `main.setup`.
+        """
+        sim = Simulation(self.transmit_dist)
+        sim.user_positions = set(self.positions)
+        sim.num_ids_issued = self.num_ids_issued
+        sim.free_ids = list(self.free_ids)
+
+        freqs = [RadioFrequency(sim, id, freq) for (id, freq) in self.frequencies]
+        spectrum = RadioFrequencySpectrum(sim, *freqs)
+        auths = [
+            AuthorizedUser(sim, x, y, freqs[freq_index] if freq_index >= 0 else None, wants, user_id=uid)
+            for (uid, x, y, freq_index, wants) in self.authorized
+        ]
+        cogs = [CognitiveUser(sim, x, y, wants, user_id=uid) for (uid, x, y, wants) in self.cognitive]
+        return (spectrum, freqs, auths, cogs, sim)
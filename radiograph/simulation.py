@@ -1,9 +1,11 @@
-from radiograph import frequencies, system, users, utilities
+import os
+
+from radiograph import frequencies, plotting, system, tracing, users, utilities
 from algorithms.coloring import allocate_with_coloring
 from radiograph.utilities import is_pareto_optimal, plot_utility_graph, plot_lots
 
 
-def allocate_freqs(spectrum, auths, cogs, sim, verbose=True):
+def allocate_freqs(spectrum, auths, cogs, sim, verbose=True, graph=None, strategy="greedy", workers=1, cache=None):
     if verbose:
         print("\n\n-- Allocating Frequencies to Users Wanting to Broadcast --\n")
     willing_to_rent = []
@@ -29,27 +31,41 @@ def allocate_freqs(spectrum, auths, cogs, sim, verbose=True):
     if verbose:
         print("")
 
-    allocate_with_coloring(willing_to_rent, want_to_rent, sim, verbose)
+    with tracing.phase("allocate"):
+        allocate_with_coloring(willing_to_rent, want_to_rent, sim, verbose, graph, strategy, workers, cache)
 
-def evaluate_allocation(users, frequencies, sim, verbose=True):
-    if verbose:
-        print("\n\n-- Allocation Evaluation --")
-        print("\nUtilities:")
-    util_sum = 0
-    for user in users:
-        util = utilities.calculate_utility(user, frequencies, sim)
+def evaluate_allocation(users, frequencies, sim, verbose=True, plot_dir=None, renderer=None, plot_format="png"):
+    """
+    Sums the users' utilities into the social welfare.  When `verbose`, also reports
+    utilities and equilibria and shows the plots.  With a `plot_dir` the plots are instead
+    written there as `utilities` and `pareto` files in `plot_format` (png or svg), rendered
+    by `renderer` or else a shared background process, so this never waits on them.
+    """
+    with tracing.phase("evaluate"):
         if verbose:
-            print(f" - {user}: {round(util, 3)}")
-        util_sum += util
-    if verbose:
-        print(f" Social Welfare: {round(util_sum, 3)}")
+            print("\n\n-- Allocation Evaluation --")
+            print("\nUtilities:")
+        util_sum = 0
+        for user in users:
+            util = utilities.calculate_utility(user, frequencies, sim)
+            if verbose:
+                print(f" - {user}: {round(util, 3)}")
+            util_sum += util
+        if verbose:
+            print(f" Social Welfare: {round(util_sum, 3)}")
     
-        print(f"\nIs in Nash Equilibrium? {utilities.is_nash_equilibrium(users, frequencies, sim)}")
+            print(f"\nIs in Nash Equilibrium? {utilities.is_nash_equilibrium(users, frequencies, sim)}")
+
+            print(f"Is Pareto Optimal? {is_pareto_optimal(users, frequencies, sim)}")
 
-        print(f"Is Pareto Optimal? {is_pareto_optimal(users, frequencies, sim)}")
+            if plot_dir is None:
+                plot_utility_graph(users, frequencies, sim)
+                plot_lots(users, frequencies, sim)
 
-        plot_utility_graph(users, frequencies, sim)
-        plot_lots(users, frequencies, sim)
+        if plot_dir is not None:
+            renderer = renderer or plotting.background_renderer()
+            plot_utility_graph(users, frequencies, sim, os.path.join(plot_dir, f"utilities.{plot_format}"), renderer)
+            plot_lots(users, frequencies, sim, os.path.join(plot_dir, f"pareto.{plot_format}"), renderer)
 
 
     return round(util_sum, 3)
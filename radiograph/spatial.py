@@ -0,0 +1,54 @@
+import math
+
+class SpatialHash:
+    """
+    A uniform-grid spatial hash.  Items are bucketed into square cells of side `cell_size`,
+    so when `cell_size` is at least the transmit distance, every item within range of a
+    point lives in that point's cell or one of the eight cells around it.
+    """
+    def __init__(self, cell_size):
+        if cell_size <= 0:
+            raise ValueError("Spatial hash cell size must be positive.")
+        self.cell_size = cell_size
+        self.cells = {}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def cell_of(self, x, y):
+        """
+        Returns the (column, row) key of the cell containing the point (`x`, `y`).
+        """
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def insert(self, item, x, y):
+        """
+        Adds `item` to the cell containing (`x`, `y`).
+        """
+        self.cells.setdefault(self.cell_of(x, y), []).append(item)
+        self.size += 1
+
+    def remove(self, item, x, y):
+        """
+        Removes `item` from the cell containing (`x`, `y`), where it must have been inserted.
+        """
+        key = self.cell_of(x, y)
+        bucket = self.cells[key]
+        bucket.remove(item)
+        if not bucket:
+            del self.cells[key]
+        self.size -= 1
+
+    def nearby(self, x, y):
+        """
+        Yields every item in the cell containing (`x`, `y`) and in the eight cells around it.
+        These are candidates only; callers still need to check the actual distance.
+        """
+        (col, row) = self.cell_of(x, y)
+        cells = self.cells
+        for d_col in (-1, 0, 1):
+            for d_row in (-1, 0, 1):
+                bucket = cells.get((col + d_col, row + d_row))
+                if bucket:
+                    yield from bucket
@@ -1,128 +1,137 @@
+import heapq
 from math import sqrt
 
+from radiograph import tracing
+from radiograph.distance import squared_distance, within_range
+from radiograph.lazy import numpy as np
+from radiograph.rendering import DEFAULT_VIEWPORT, GridRenderer
+
 class Simulation:
     def __init__(self, transmit_dist):
-        self.user_ids = []
-        self.user_positions = []
+        # Occupied (x, y) positions, hashed so placing a user is O(1).
+        self.user_positions = set()
         self.transmit_dist = transmit_dist
+        # Compact id allocator: ids freed by departed users are reused smallest first.
+        self.num_ids_issued = 0
+        self.free_ids = []
 
     def check_pos(self, x, y):
         if (x, y) in self.user_positions:
             raise Exception(f"More than one user cannot be placed in the same position. ({x}, {y}) is already occupied.")
         else:
-            self.user_positions.append((x, y))
+            self.user_positions.add((x, y))
+
+    def release_pos(self, x, y):
+        """
+        Frees the position (`x`, `y`) so another user may be placed there.
+        """
+        self.user_positions.remove((x, y))
+
+    def move_pos(self, old_x, old_y, x, y):
+        """
+        Moves the occupant of (`old_x`, `old_y`) to (`x`, `y`), which must be free unless
+        it is where the occupant already is.
+        """
+        if (old_x, old_y) == (x, y):
+            return
+        self.check_pos(x, y)
+        self.user_positions.remove((old_x, old_y))
 
     def next_user_id(self):
-        new_id = len(self.user_ids)
-        self.user_ids.append(new_id)
+        if self.free_ids:
+            return heapq.heappop(self.free_ids)
+        new_id = self.num_ids_issued
+        self.num_ids_issued += 1
         return new_id
 
+    def release_user_id(self, user_id):
+        """
+        Returns `user_id` to the allocator so a later user may reuse it.
+        """
+        heapq.heappush(self.free_ids, user_id)
+
+    def remove_user(self, user):
+        """
+        Takes `user` out of the simulation, freeing both its position and its id.
+        """
+        self.release_pos(user.pos_x, user.pox_y)
+        self.release_user_id(user.uid)
+
+    def register_positions(self, positions):
+        """
+        Validates and claims a whole array of (x, y) `positions` in one call, returning a
+        new user id for each.  Either every position is claimed or, if any is negative,
+        repeated or already occupied, none are and an exception is raised.
+        """
+        points = np.asarray(positions).reshape(-1, 2)
+        if (points < 0).any():
+            raise Exception("x & y positions must not be negative.")
+        points = [tuple(point) for point in points.tolist()]
+
+        claimed = set(points)
+        if len(claimed) != len(points):
+            seen = set()
+            for point in points:
+                if point in seen:
+                    raise Exception(f"More than one user cannot be placed in the same position. {point} appears more than once.")
+                seen.add(point)
+        if not self.user_positions.isdisjoint(claimed):
+            point = next(point for point in points if point in self.user_positions)
+            raise Exception(f"More than one user cannot be placed in the same position. {point} is already occupied.")
+
+        self.user_positions |= claimed
+        return [self.next_user_id() for _ in points]
 
     def get_transmit_distance(self):
         return self.transmit_dist
 
 
 def user_distance(user1, user2):
-    x_dist = user1.pos_x - user2.pos_x
-    y_dist = user1.pox_y - user2.pox_y
-    return sqrt((x_dist ** 2) + (y_dist ** 2))
+    return sqrt(squared_distance(user1.pos_x, user1.pox_y, user2.pos_x, user2.pox_y))
 
 
 def is_not_out_of_range(user1, user2, sim):
-    return user_distance(user1, user2) <= sim.get_transmit_distance()
-
+    if tracing.tracer is not None:
+        tracing.tracer.count(tracing.DISTANCE_EVALUATIONS)
+    return within_range(user1.pos_x, user1.pox_y, user2.pos_x, user2.pox_y, sim.get_transmit_distance())
 
-def display_sim_state(spectrum, auth_users, cog_users, sim):
-    print("\n\n-- System State --")
 
+def display_sim_state(spectrum, auth_users, cog_users, sim, viewport=DEFAULT_VIEWPORT):
+    """
+    Prints the users, real space and the radio spectrum.  Real space is drawn by a
+    `GridRenderer`, downsampled to `viewport` cells across if it is any larger.
+    """
     all_users = auth_users + cog_users
 
-    print("\nUsers:")
+    out = ["\n\n-- System State --", "\nUsers:"]
     for user in all_users:
-        print(f" - {user}", end="")
         if user.wants_to_broadcast_now:
-            if user.is_broadcasting:
-                emoji = "✅"
-            else:
-                emoji = "❌"
-            print(f" wants to broadcast {emoji}")
+            emoji = "✅" if user.is_broadcasting else "❌"
+            out.append(f" - {user} wants to broadcast {emoji}")
         else:
-            print("")
+            out.append(f" - {user}")
 
     #Display real space with the ranges of each user
-    print("\nReal Space (not entirely mathematically accurate):")
-
-    # Determine grid size for real space
-    max_x = max(user.pos_x for user in all_users) + sim.get_transmit_distance()
-    max_y = max(user.pox_y for user in all_users) + sim.get_transmit_distance()
-    grid_size = max(max_x, max_y) + 1
-
-    real_space = [["  " for _ in range(grid_size)] for _ in range(grid_size)]
-
-    real_space[0][0] = "+"
-
-    def check_in_range(val):
-        return val < grid_size and val >= 0
-    
-    def plot_range(x, y):
-        real_space[y][x] = ". "
-
-    for user in all_users:
-
-        for dist in range(1, sim.get_transmit_distance() + 1):
-            new_x_pos = user.pos_x + dist
-            new_y_pos = user.pox_y + dist
-            new_x_neg = user.pos_x - dist
-            new_y_neg = user.pox_y - dist
-            if check_in_range(new_x_pos):
-                plot_range(new_x_pos, user.pox_y)
-            if check_in_range(new_x_neg):
-                plot_range(new_x_neg, user.pox_y)
-            if check_in_range(new_y_pos):
-                plot_range(user.pos_x, new_y_pos)
-            if check_in_range(new_y_neg):
-                plot_range(user.pos_x, new_y_neg)
-
-            if check_in_range(new_y_neg) and check_in_range(new_x_neg):
-                plot_range(new_x_neg, new_y_neg)
-            if check_in_range(new_y_neg) and check_in_range(new_x_pos):
-                plot_range(new_x_pos, new_y_neg)
-            if check_in_range(new_y_pos) and check_in_range(new_x_neg):
-                plot_range(new_x_neg, new_y_pos)
-            if check_in_range(new_y_pos) and check_in_range(new_x_pos):
-                plot_range(new_x_pos, new_y_pos)
-
-    for user in all_users:
-        real_space[user.pox_y][user.pos_x] = user.id
-    
-    print_cartesian(real_space)
+    out.append("\nReal Space (not entirely mathematically accurate):")
+    out.extend(GridRenderer(sim.get_transmit_distance(), viewport).lines(all_users))
 
     #Display the rf spectrum, who owns which frequency, and who is currently broadcasting on it
-    print("\nRadio Spectrum:")
+    out.append("\nRadio Spectrum:")
     for freq in spectrum.frequencies:
-        print(freq.frequency)
+        out.append(str(freq.frequency))
         if len(freq.assigned_to) > 0:
             for user in freq.assigned_to:
-                print(f"   - User {user.id} is actively broadcasting")
+                out.append(f"   - User {user.id} is actively broadcasting")
         else:
-            print(f"   - No active broadcast")
-        for user in auth_users:
-            if freq == user.assigned_frequency:
-                print(f"   - Frequency owned by authorized user {user.id}")
+            out.append(f"   - No active broadcast")
+        if freq.owner is not None:
+            out.append(f"   - Frequency owned by authorized user {freq.owner.id}")
+    print("\n".join(out))
 
 def print_cartesian(input_data):
-
-    for row in input_data:
-        print("--", end ="-")
-    print("")
-
-    for row in reversed(input_data):
-        for cell in row:
-            print("", end ="")
-            print(cell, end =" ")
-        print("|")
-    
-    print("", end ="")
-    for row in input_data:
-        print("--", end ="-")
-    print("")
\ No newline at end of file
+    """
+    Prints a dense grid of cells, given as a list of rows from the bottom up.
+    """
+    border = "---" * len(input_data)
+    rows = ["".join(f"{cell} " for cell in row) + "|" for row in reversed(input_data)]
+    print("\n".join([border] + rows + [border]))
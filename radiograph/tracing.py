@@ -0,0 +1,153 @@
+"""
+Per-phase timing, memory and counters for the allocation pipeline.
+
+The pipeline marks its phases (loading, setup, graph construction, coloring, lessor
+assignment, evaluation) with `phase` and counts work with `count`.  Both do nothing but
+check a module global unless a `Tracer` is active:
+
+    with tracing.traced(tracing.Tracer(memory=True)) as tracer:
+        run_simulation(False, use_csv=True, dataset="large")
+    tracer.write_chrome_trace("run.trace.json")
+
+Chrome traces open in `chrome://tracing` or https://ui.perfetto.dev.
+"""
+import contextlib
+import os
+import time
+
+# Counters kept by the pipeline.
+DISTANCE_EVALUATIONS = "distance_evaluations"
+EDGES = "edges"
+COLORS = "colors"
+ADMISSION_REJECTIONS = "admission_rejections"
+
+# The active tracer, if any.
+tracer = None
+
+
+class Tracer:
+    """
+    Records each phase's wall time and, with `memory`, the most memory `tracemalloc` saw
+    allocated at any point while it ran (tracing allocations slows Python down noticeably),
+    along with counters.  Phases nest, and each one's peak covers the phases inside it.
+    """
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.origin = time.perf_counter()
+        self.phases = []
+        self.counters = {}
+        self.running = []
+
+    def start(self):
+        import tracemalloc
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        else:
+            self.started_tracemalloc = False
+
+    def stop(self):
+        import tracemalloc
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        import tracemalloc
+        record = {"name": name, "depth": len(self.running), "start": time.perf_counter() - self.origin}
+        if self.memory:
+            (current, peak) = tracemalloc.get_traced_memory()
+            # Resetting the peak for this phase would lose the enclosing phase's, so hand it up first.
+            if self.running:
+                self.running[-1]["peak_bytes"] = max(self.running[-1]["peak_bytes"], peak)
+            tracemalloc.reset_peak()
+            record["peak_bytes"] = current
+        self.running.append(record)
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - self.origin - record["start"]
+            self.running.pop()
+            if self.memory:
+                record["peak_bytes"] = max(record["peak_bytes"], tracemalloc.get_traced_memory()[1])
+                if self.running:
+                    self.running[-1]["peak_bytes"] = max(self.running[-1]["peak_bytes"], record["peak_bytes"])
+            self.phases.append(record)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def totals(self):
+        """
+        Sums the wall time of each phase by name, for phases that ran more than once.
+        """
+        totals = {}
+        for record in self.phases:
+            totals[record["name"]] = totals.get(record["name"], 0.0) + record["seconds"]
+        return totals
+
+    def to_dict(self):
+        return {
+            "phases": sorted(self.phases, key=lambda record: record["start"]),
+            "totals": self.totals(),
+            "counters": dict(self.counters),
+        }
+
+    def write_json(self, path):
+        import json
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def write_chrome_trace(self, path):
+        """
+        Writes the phases as complete events and the counters as counter events in the
+        Chrome trace event format.
+        """
+        import json
+        pid = os.getpid()
+        trace_events = []
+        for record in sorted(self.phases, key=lambda record: record["start"]):
+            event = {"name": record["name"], "ph": "X", "pid": pid, "tid": 0,
+                     "ts": record["start"] * 1e6, "dur": record["seconds"] * 1e6}
+            if "peak_bytes" in record:
+                event["args"] = {"peak_bytes": record["peak_bytes"]}
+            trace_events.append(event)
+        end = max((record["start"] + record["seconds"] for record in self.phases), default=0.0)
+        for (name, value) in self.counters.items():
+            trace_events.append({"name": name, "ph": "C", "pid": pid, "tid": 0, "ts": end * 1e6, "args": {name: value}})
+        with open(path, "w") as file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, file)
+
+
+@contextlib.contextmanager
+def traced(new_tracer=None):
+    """
+    Makes `new_tracer` (or a new `Tracer`) the active tracer for the duration of a `with`
+    block.
+    """
+    global tracer
+    previous = tracer
+    tracer = new_tracer or Tracer()
+    tracer.start()
+    try:
+        yield tracer
+    finally:
+        tracer.stop()
+        tracer = previous
+
+
+_untraced = contextlib.nullcontext()
+
+
+def phase(name):
+    """
+    Times a `with` block as the phase `name` of the active tracer, if there is one.
+    """
+    if tracer is None:
+        return _untraced
+    return tracer.phase(name)
+
+
+def count(name, amount=1):
+    if tracer is not None:
+        tracer.count(name, amount)
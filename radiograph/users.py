@@ -1,18 +1,22 @@
-from .frequencies import *
-from .system import *
-
 import abc
-import math
+
+from . import events
+from .frequencies import RadioFrequency
+from .system import Simulation, user_distance
 
 class _UserBase(abc.ABC):
     """`
     An abstract class to encompass the similarities of both cognitive and authorized users.
     """
-    def __init__(self, sim, x, y, wants_to_broadcast_now=False):
-        if x < 0 or y < 0:
-            raise Exception("x & y positions must not be negative.")
+    def __init__(self, sim, x, y, wants_to_broadcast_now=False, user_id=None):
         self.sim = sim
-        sim.check_pos(x, y)
+        if user_id is None:
+            if x < 0 or y < 0:
+                raise Exception("x & y positions must not be negative.")
+            sim.check_pos(x, y)
+            user_id = sim.next_user_id()
+        # A given `user_id` means the position was already claimed via `Simulation.register_positions`.
+        self.uid = user_id
         self.pos_x = x
         self.pox_y = y
         self.is_broadcasting = False
@@ -30,7 +34,7 @@ class _UserBase(abc.ABC):
         """
         Returns the Euclidean distance from some `other` user.
         """
-        return math.sqrt((self.pos_x - other.pos_x) ** 2 + (self.pox_y - other.pox_y) ** 2)
+        return user_distance(self, other)
 
 
 class CognitiveUser(_UserBase):
@@ -38,9 +42,9 @@ class CognitiveUser(_UserBase):
     Represents a cognitive user in the graph system.  A cognitive user, we have defined as
     a device user that can search for available frequency bands on which to communicate.
     """
-    def __init__(self, sim: Simulation, x, y, wants_to_broadcast_now=False, freq: RadioFrequency=None):
-        super().__init__(sim, x, y, wants_to_broadcast_now)
-        self.id = f"c{self.sim.next_user_id()}"
+    def __init__(self, sim: Simulation, x, y, wants_to_broadcast_now=False, freq: RadioFrequency=None, user_id=None):
+        super().__init__(sim, x, y, wants_to_broadcast_now, user_id)
+        self.id = f"c{self.uid}"
         self.active_frequency = freq
 
     @property
@@ -62,6 +66,7 @@ class CognitiveUser(_UserBase):
         if (self.active_frequency):
             self.is_broadcasting = True
             self.active_frequency.is_active = True
+            events.emit(events.BROADCAST_STARTED, user=self, frequency=self.active_frequency)
             if verbose:
                 print(f"{self.id} has begun broadcasting on {self.active_frequency}")
         else:
@@ -73,7 +78,7 @@ class CognitiveUser(_UserBase):
         return f"[{base + ext}]"
     
     def stop_broadcasting(self):
-        print(f"{self.id} has stopped broadcasting on {self.active_frequency}")
+        events.emit(events.BROADCAST_STOPPED, user=self, frequency=self.active_frequency)
         self.is_broadcasting = False
         self.active_frequency.is_active = False
 
@@ -88,10 +93,12 @@ class AuthorizedUser(_UserBase):
     users have dedicated frequencies assigned to them, which they are permitted to "lease"
     to other cognitive users when not in use.
     """
-    def __init__(self, sim: Simulation, x, y, assigned_freq: RadioFrequency, wants_to_broadcast_now=False):
-        super().__init__(sim, x, y, wants_to_broadcast_now)
-        self.id = f"a{self.sim.next_user_id()}"
+    def __init__(self, sim: Simulation, x, y, assigned_freq: RadioFrequency, wants_to_broadcast_now=False, user_id=None):
+        super().__init__(sim, x, y, wants_to_broadcast_now, user_id)
+        self.id = f"a{self.uid}"
         self.assigned_frequency = assigned_freq
+        if assigned_freq is not None:
+            assigned_freq.owner = self
         self.has_rented_frequency = None
 
     def grant_frequency(self, frequency: RadioFrequency, user: CognitiveUser):
@@ -104,16 +111,24 @@ class AuthorizedUser(_UserBase):
         if frequency != self.assigned_frequency:
             raise IndexError(f"{frequency} is not assigned to this authorized user ({self.id})")
         frequency.user_unassigned(self)
-        user.set_frequency(frequency)
+        # A rejection is reported through the ADMISSION_REJECTED event rather than printed.
+        user.set_frequency(frequency, verbose=False)
+        if user.active_frequency is frequency:
+            frequency.lessees[user] = None
+            events.emit(events.LEASE_GRANTED, lessor=self, user=user, frequency=frequency)
         user.renting_from = self
         self.has_rented_frequency = user
 
     def revoke_frequency(self, user: CognitiveUser):
         the_freq = user.active_frequency
         the_freq.user_unassigned(user)
+        the_freq.lessees.pop(user, None)
         user.set_frequency(None)
+        events.emit(events.LEASE_REVOKED, lessor=self, user=user, frequency=the_freq)
         user.renting_from = None
-        self.has_rented_frequency = None
+        # The band may still be leased to others: keep track of one, and keep it active for them.
+        self.has_rented_frequency = next(iter(the_freq.lessees), None)
+        the_freq.is_active = bool(the_freq.lessees)
 
     def begin_broadcasting(self, verbose=True):
 
@@ -124,9 +139,10 @@ class AuthorizedUser(_UserBase):
         
         if self.try_freq(self.assigned_frequency):
             self.is_broadcasting = True
+            events.emit(events.BROADCAST_STARTED, user=self, frequency=self.assigned_frequency)
             if verbose:
                 print(f"{self.id} has begun broadcasting on {self.assigned_frequency}")
-            self.assigned_frequency.assigned_to.append(self)
+            self.assigned_frequency.add_occupant(self)
             self.assigned_frequency.is_active = True
         else:
             if verbose:
@@ -142,18 +158,18 @@ class AuthorizedUser(_UserBase):
         else:
             if steal:
                 if freq.is_active:
-                    print(f"{self.id} has rented out this frequency and it is being used, so we cannot broadcast on it.")
+                    events.emit(events.RECLAIM_REFUSED, user=self, frequency=freq, steal=True)
                     return False
                 else:
-                    print(f"{self.id} has rented out this frequency but it is not being used, so we'll take it back.")
+                    events.emit(events.RECLAIMED, user=self, frequency=freq)
                     self.revoke_frequency(self.has_rented_frequency)
                     return True
             else:
-                print(f"{self.id} has rented out this frequency and it is being used, checking other options")
+                events.emit(events.RECLAIM_REFUSED, user=self, frequency=freq, steal=False)
             
     
     def stop_broadcasting(self):
-        print(f"{self.id} has stopped broadcasting on {self.assigned_frequency}")
+        events.emit(events.BROADCAST_STOPPED, user=self, frequency=self.assigned_frequency)
         self.is_broadcasting = False
         self.assigned_frequency.is_active = False
 
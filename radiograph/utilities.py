@@ -1,8 +1,9 @@
-import matplotlib.pyplot as plt
-
+from radiograph import plotting
 from radiograph.frequencies import RadioFrequency
 from radiograph.users import AuthorizedUser, _UserBase
 from radiograph.system import is_not_out_of_range
+from radiograph.distance import within_range_pairs
+from radiograph.lazy import numpy as np
 
 def distance_utility(distance, rangef):
     return 101 ** -(distance / rangef) - 1
@@ -22,55 +23,178 @@ def calculate_utility(user: _UserBase, frequencies: list[RadioFrequency], sim):
         return max(utility, 0.0)
     return 0.0
 
-def is_nash_equilibrium(users, frequencies, sim):
+def occupancy_counts(frequencies):
+    """
+    Returns how many users are on each of `frequencies`, as an array.
     """
-    Determines if the current state of the users is a Nash equilibrium.
-    """
-    for user in users:
-        current_utility = calculate_utility(user, frequencies, sim)
-        # Test each alternative frequency for improvement in utility
-        for frequency in frequencies:
-            original_frequency = user.active_frequency
-            is_potential_option = user.set_frequency(frequency, False)
-            if not is_potential_option:
-                # If this is not a possible solution, revert and continue to the next one
-                user.set_frequency(original_frequency, False)
-                continue
-            if calculate_utility(user, frequencies, sim) > current_utility:
-                # If utility improves, revert and return False (not Nash equilibrium)
-                user.set_frequency(original_frequency, False)
-                return False
-            user.set_frequency(original_frequency, False)  # Revert to original
-    return True
+    return np.array([len(frequency.assigned_to) for frequency in frequencies], dtype=np.int64)
 
 
-def is_pareto_optimal(users, frequencies, sim):
+def feasibility_matrix(users, frequencies, sim):
     """
-    Determines if the current state of the users is on the Pareto frontier.
-    A state is Pareto optimal if no user can improve their utility without
-    reducing another user's utility.
+    Returns a (users x frequencies) boolean array whose entry [u, f] indicates whether user
+    u could join frequency f without being within range of anyone else already on it.
+    Nothing is assigned to test this; the live state is only read.
+    """
+    feasible = np.ones((len(users), len(frequencies)), dtype=bool)
+
+    # Every distinct user on any of the frequencies, with one (point, frequency) entry per membership.
+    point_of = {user: index for index, user in enumerate(users)}
+    points = list(users)
+    member_points = []
+    member_freqs = []
+    for freq_index, frequency in enumerate(frequencies):
+        for occupant in frequency.assigned_to:
+            if occupant not in point_of:
+                point_of[occupant] = len(points)
+                points.append(occupant)
+            member_points.append(point_of[occupant])
+            member_freqs.append(freq_index)
+    if not member_points:
+        return feasible
+
+    member_points = np.array(member_points, dtype=np.int64)
+    member_freqs = np.array(member_freqs, dtype=np.int64)
+    by_point = np.argsort(member_points, kind="stable")
+    member_freqs = member_freqs[by_point]
+    memberships = np.bincount(member_points, minlength=len(points))
+    first_membership = np.cumsum(memberships) - memberships
+
+    # Block each user from every frequency that someone within its range is on.
+    (i, j) = within_range_pairs([(p.pos_x, p.pox_y) for p in points], sim.get_transmit_distance())
+    blocked_users = np.concatenate((i, j))
+    blockers = np.concatenate((j, i))
+    is_user = blocked_users < len(users)
+    blocked_users = blocked_users[is_user]
+    blockers = blockers[is_user]
+
+    counts = memberships[blockers]
+    rows = np.repeat(blocked_users, counts)
+    offsets = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    cols = member_freqs[np.repeat(first_membership[blockers], counts) + offsets]
+    feasible[rows, cols] = False
+    return feasible
+
+
+def best_responses(users, frequencies, sim, block_size=4096):
     """
-    current_utilities = [calculate_utility(user, frequencies, sim) for user in users]
+    For each user, finds the frequency other than its current one that it would most like
+    to move to.  Returns `(best_utilities, best_indices)`: the utility the user would have
+    there and the index of that frequency in `frequencies`, or 0.0 and -1 if there is none.
 
-    for user in users:
-        for frequency in frequencies:
-            original_frequency = user.active_frequency
-            user.set_frequency(frequency, verbose=False)
+    A user that wants to broadcast and moves to a frequency with n users on it would get a
+    utility of 1 / (n + 1), so its best response is the feasible frequency with the fewest
+    users.  Users that do not want to broadcast gain nothing from moving.
+    """
+    best_utilities = np.zeros(len(users))
+    best_indices = np.full(len(users), -1, dtype=np.int64)
+    if not frequencies:
+        return (best_utilities, best_indices)
+
+    feasible = feasibility_matrix(users, frequencies, sim)
+    occupancy = occupancy_counts(frequencies)
+    index_of = {frequency: index for index, frequency in enumerate(frequencies)}
+
+    # Staying put is not a deviation.
+    for row, user in enumerate(users):
+        current = index_of.get(getattr(user, "active_frequency", None))
+        if current is not None:
+            feasible[row, current] = False
+
+    # Columns from least to most occupied, so the first feasible column is the best one.
+    by_occupancy = np.argsort(occupancy, kind="stable")
+    for start in range(0, len(users), block_size):
+        block = feasible[start:start + block_size][:, by_occupancy]
+        first = block.argmax(axis=1)
+        found = block[np.arange(len(block)), first]
+        best_indices[start:start + len(block)] = np.where(found, by_occupancy[first], -1)
+
+    wants = np.array([user.wants_to_broadcast_now for user in users], dtype=bool)
+    has_option = (best_indices >= 0) & wants
+    best_utilities[has_option] = 1.0 / (occupancy[best_indices[has_option]] + 1)
+    best_indices[~has_option] = -1
+    return (best_utilities, best_indices)
+
+
+def nash_deviations(users, frequencies, sim):
+    """
+    Returns the users that could raise their utility by moving to another frequency on
+    their own, without changing any assignment to find out.
+    """
+    (best_utilities, _) = best_responses(users, frequencies, sim)
+    return [
+        user for user, best in zip(users, best_utilities)
+        if best > calculate_utility(user, frequencies, sim)
+    ]
+
+
+def is_nash_equilibrium(users, frequencies, sim):
+    """
+    Determines if the current state of the users is a Nash equilibrium: no user has a
+    profitable unilateral deviation.  See `nash_deviations` for which users do.
+    """
+    return not nash_deviations(users, frequencies, sim)
 
-            # Calculate new utilities
-            new_utilities = [calculate_utility(u, frequencies, sim) for u in users]
 
-            # Check if any user improves without harming others
-            better_for_someone = any(new > old for new, old in zip(new_utilities, current_utilities))
-            no_worse_for_others = all(new >= old for new, old in zip(new_utilities, current_utilities))
+def pareto_improvements(users, frequencies, sim, block_size=4096):
+    """
+    Returns `(user, frequency)` moves that would make at least one user better off without
+    making any user worse off, at most one (the best) per user.
 
-            # Revert to the original state
-            user.set_frequency(original_frequency, verbose=False)
+    A unilateral move only changes utilities on the channel the user leaves, whose other
+    users each gain, and the channel it joins, whose users each lose.  So each move is
+    judged from per-channel counters in O(1), rather than by recomputing everyone's utility.
+    """
+    if not frequencies:
+        return []
+
+    feasible = feasibility_matrix(users, frequencies, sim)
+    occupancy = occupancy_counts(frequencies)
+    index_of = {frequency: index for index, frequency in enumerate(frequencies)}
+
+    current_utilities = np.array([calculate_utility(user, frequencies, sim) for user in users])
+    # Users on each channel whose utility is positive, and so would change with its occupancy.
+    earners = np.zeros(len(frequencies), dtype=np.int64)
+    # Whether the users left behind on a user's current channel would gain if it moved off.
+    others_gain = np.zeros(len(users), dtype=bool)
+    current_indices = []
+    for row, user in enumerate(users):
+        current = index_of.get(getattr(user, "active_frequency", None))
+        current_indices.append(current)
+        if current is not None:
+            feasible[row, current] = False
+            if current_utilities[row] > 0:
+                earners[current] += 1
+    for row, current in enumerate(current_indices):
+        if current is not None and users[row] in frequencies[current]:
+            others_gain[row] = earners[current] - (current_utilities[row] > 0) > 0
+
+    wants = np.array([user.wants_to_broadcast_now for user in users], dtype=bool)
+    # Joining a channel only costs nothing if nobody on it is currently earning anything.
+    joinable = earners == 0
+    join_utilities = 1.0 / (occupancy + 1)
+
+    improvements = []
+    for start in range(0, len(users), block_size):
+        stop = min(start + block_size, len(users))
+        new = np.where(wants[start:stop, np.newaxis], join_utilities[np.newaxis, :], 0.0)
+        old = current_utilities[start:stop, np.newaxis]
+        better = (new > old) | ((new == old) & others_gain[start:stop, np.newaxis])
+        improving = feasible[start:stop] & joinable[np.newaxis, :] & better
+        for row in np.flatnonzero(improving.any(axis=1)):
+            choices = np.flatnonzero(improving[row])
+            best = choices[np.argmin(occupancy[choices])]
+            improvements.append((users[start + row], frequencies[best]))
+    return improvements
 
-            if better_for_someone and no_worse_for_others:
-                return False  # Not Pareto optimal
 
-    return True
+def is_pareto_optimal(users, frequencies, sim):
+    """
+    Determines if the current state of the users is on the Pareto frontier.
+    A state is Pareto optimal if no user can improve their utility without
+    reducing another user's utility.  See `pareto_improvements` for the moves that would.
+    """
+    return not pareto_improvements(users, frequencies, sim)
 
 
 def calculate_social_welfare(users, frequencies):
@@ -80,60 +204,42 @@ def calculate_social_welfare(users, frequencies):
     return sum(calculate_utility(user, frequencies) for user in users if user.is_broadcasting)
 
 
-def plot_utility_graph(users, frequencies, sim):
+def plot_utility_graph(users, frequencies, sim, path=None, renderer=None, max_bars=plotting.DEFAULT_MAX_BARS):
     """
-    Plots the utilities of all users for visualization.
+    Plots the utilities of all users for visualization.  With a `path` the chart is written
+    to that PNG/SVG file instead of shown, in `renderer`'s worker process if one is given.
+    Past `max_bars` users, neighbouring users are grouped into bars of their mean utility.
     """
     utilities = [calculate_utility(user, frequencies, sim) for user in users]
     labels = [str(user) for user in users]
+    (labels, utilities) = plotting.aggregate_bars(labels, utilities, max_bars)
 
-    plt.figure(figsize=(10, 6))
-    plt.bar(labels, utilities)
-    plt.xlabel('Users')
-    plt.ylabel('Utility')
-    plt.title('Utility Distribution Among Users')
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.show()
+    return plotting.dispatch(plotting.render_utility_graph, (labels, utilities), path, renderer)
 
 
-def plot_lots(users, frequencies, sim):
+def plot_lots(users, frequencies, sim, path=None, renderer=None, max_points=plotting.DEFAULT_MAX_POINTS):
+    """
+    Plots user utilities against the Pareto frontier and Nash equilibrium.  `path` and
+    `renderer` work as for `plot_utility_graph`; past `max_points` users, an evenly spaced
+    sample of them is drawn.
+    """
     utilities = [calculate_utility(user, frequencies, sim) for user in users]
 
     # Determine the users in Nash equilibrium
-    nash_indices = [i for i, user in enumerate(users) if is_nash_equilibrium([user], frequencies, sim)]
-
-    # Identify Pareto optimal points
-    pareto_indices = [
-        i for i, utility in enumerate(utilities)
-        if all(utility >= other for j, other in enumerate(utilities) if j != i)
-    ]
-    pareto_utilities = [utilities[i] for i in pareto_indices]
-
-    # Plot utilities for all users
-    plt.figure(figsize=(10, 6))
-    plt.scatter(range(len(utilities)), utilities, label='All Users', color='blue', alpha=0.7)
-
-    # Highlight Pareto-optimal utilities
-    plt.scatter(pareto_indices, pareto_utilities, color='red', label='Pareto Optimal')
-
-    # Highlight users in Nash equilibrium with a different marker (e.g., 'x')
-    plt.scatter(nash_indices, [utilities[i] for i in nash_indices], color='green', label='Nash Equilibrium', marker='x')
-
-    # Draw Pareto Frontier Line
-    pareto_indices, pareto_utilities = zip(*sorted(zip(pareto_indices, pareto_utilities)))
-    plt.plot(pareto_indices, pareto_utilities, linestyle='--', color='red', label='Pareto Frontier')
-
-    # Social welfare
-    social_welfare = sum(utilities)
-    plt.axhline(social_welfare, color='purple', linestyle='-.', label=f'Social Welfare: {social_welfare:.2f}')
-
-    # Customize the plot
-    plt.xlabel('User Index')
-    plt.ylabel('Utility')
-    plt.title('Pareto Frontier of Spectrum Allocation')
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
-
-    plt.show()
+    deviating = set(nash_deviations(users, frequencies, sim))
+    nash_indices = [i for i, user in enumerate(users) if user not in deviating]
+
+    # Identify Pareto optimal points: those no other user's utility exceeds
+    best = max(utilities, default=0.0)
+    pareto_indices = [i for i, utility in enumerate(utilities) if utility >= best]
+
+    indices = plotting.downsample(range(len(utilities)), max_points)
+    nash_indices = plotting.downsample(nash_indices, max_points)
+    pareto_indices = plotting.downsample(pareto_indices, max_points)
+    args = (
+        indices, [utilities[i] for i in indices],
+        nash_indices, [utilities[i] for i in nash_indices],
+        pareto_indices, [utilities[i] for i in pareto_indices],
+        sum(utilities),
+    )
+    return plotting.dispatch(plotting.render_lots, args, path, renderer)
@@ -1,9 +1,33 @@
 import unittest
+import numpy as np
 from radiograph.users import *
 from radiograph.frequencies import *
 from radiograph.system import *
 from radiograph.simulation import allocate_freqs
-from data_generation import read_data
+from data_generation import binary_data, read_data
+from data_generation import generate_dataset
+from algorithms.coloring import build_interference_graph, assign_color_classes
+from algorithms.dynamic_graph import InterferenceGraph
+from algorithms import strategies
+from algorithms.components import connected_components, color_components
+from algorithms.tiled import allocate_tiled
+from algorithms.graph_cache import GraphCache
+from radiograph import distance
+from radiograph import utilities, plotting
+from radiograph.simulation import evaluate_allocation
+import os
+import subprocess
+import sys
+import tempfile
+import monte_carlo
+import main
+from radiograph.scenario import Scenario
+from radiograph import engine, events, tracing
+from radiograph.rendering import GridRenderer
+import io
+import contextlib
+import json
+import random
 
 class TestFrequency(unittest.TestCase):
     def test_create_frequency_no_user(self):
@@ -21,6 +45,34 @@ class TestFrequency(unittest.TestCase):
         self.assertEqual(freq.assigned_to, [cog])
         self.assertEqual(freq.is_active, False)
 
+    def test_unassign_keeps_index(self):
+        sim = Simulation(5)
+        freq = RadioFrequency(sim, 1, 107.9)
+        cogs = [CognitiveUser(sim, 10 * i, 0) for i in range(4)]
+        for cog in cogs:
+            cog.set_frequency(freq)
+        self.assertEqual(len(freq.assigned_to), 4)
+
+        freq.user_unassigned(cogs[1])
+        freq.user_unassigned(cogs[1])
+        self.assertEqual(sorted(u.id for u in freq.assigned_to), sorted(u.id for u in [cogs[0], cogs[2], cogs[3]]))
+        self.assertNotIn(cogs[1], freq)
+
+        # The spot cogs[1] left is free again, but (23, 0) is still next to cogs[2]
+        self.assertTrue(freq.new_user_assigned(CognitiveUser(sim, 10, 1), False))
+        self.assertFalse(freq.new_user_assigned(CognitiveUser(sim, 23, 0), False))
+
+    def test_moved_occupant_is_reindexed(self):
+        sim = Simulation(5)
+        freq = RadioFrequency(sim, 1, 107.9)
+        cog0 = CognitiveUser(sim, 0, 0)
+        cog0.set_frequency(freq)
+        graph = InterferenceGraph(sim, [cog0])
+
+        graph.move_user(cog0, 50, 50)
+        self.assertTrue(freq.new_user_assigned(CognitiveUser(sim, 1, 1), False))
+        self.assertFalse(freq.new_user_assigned(CognitiveUser(sim, 52, 52), False))
+
 class TestSpectrum(unittest.TestCase):
     def test_create_spectrum(self):
         sim = Simulation(5)
@@ -34,6 +86,35 @@ class TestSpectrum(unittest.TestCase):
         self.assertEqual(spectrum.get_frequency(3), freq3)
         self.assertEqual(spectrum.get_frequency(4), None)
 
+    def test_frequencies_in_band(self):
+        sim = Simulation(5)
+        freqs = [RadioFrequency(sim, i, 100.0 + 1.1 * i) for i in range(10)]
+        spectrum = RadioFrequencySpectrum(sim, *reversed(freqs))
+
+        self.assertEqual(spectrum.frequencies_in_band(102.2, 104.5), freqs[2:5])
+        self.assertEqual(spectrum.frequencies_in_band(90.0, 99.0), [])
+        self.assertEqual(spectrum.frequencies_in_band(0, 1000), freqs)
+
+    def test_owner_and_lessee_maps(self):
+        sim = Simulation(5)
+        freq1 = RadioFrequency(sim, 1, 107.9)
+        freq2 = RadioFrequency(sim, 2, 103.5)
+        spectrum = RadioFrequencySpectrum(sim, freq1, freq2)
+        auth = AuthorizedUser(sim, 3, 4, freq1)
+        cog = CognitiveUser(sim, 3, 5)
+
+        self.assertEqual(spectrum.owner_of(freq1), auth)
+        self.assertEqual(spectrum.owner_of(2), None)
+        self.assertEqual(spectrum.lessees_of(1), [])
+
+        auth.grant_frequency(freq1, cog)
+        self.assertEqual(spectrum.lessees_of(freq1), [cog])
+
+        auth.revoke_frequency(cog)
+        self.assertEqual(spectrum.lessees_of(freq1), [])
+        with self.assertRaises(KeyError):
+            spectrum.owner_of(3)
+
 class TestCognitiveUser(unittest.TestCase):
     def test_create_cognitive(self):
         sim = Simulation(5)
@@ -126,6 +207,25 @@ class TestAuthorizedUser(unittest.TestCase):
         self.assertEqual(cog.active_frequency, None)
         self.assertEqual(auth.has_rented_frequency, None)
 
+    def test_revoke_one_of_two_lessees(self):
+        sim = Simulation(5)
+        freq1 = RadioFrequency(sim, 1, 107.9)
+        auth = AuthorizedUser(sim, 0, 0, freq1)
+        (cog1, cog2) = (CognitiveUser(sim, 10, 0), CognitiveUser(sim, 20, 0))
+        for cog in (cog1, cog2):
+            auth.grant_frequency(freq1, cog)
+            cog.begin_broadcasting(False)
+
+        cog2.stop_broadcasting()
+        auth.revoke_frequency(cog2)
+        self.assertIs(auth.has_rented_frequency, cog1)
+        self.assertTrue(freq1.is_active)
+
+        cog1.stop_broadcasting()
+        auth.revoke_frequency(cog1)
+        self.assertIsNone(auth.has_rented_frequency)
+        self.assertFalse(freq1.is_active)
+
     def test_cant_rent_while_using(self):
         sim = Simulation(5)
         freq1 = RadioFrequency(sim, 1, 107.9)
@@ -224,12 +324,181 @@ class TestVisualization(unittest.TestCase):
 
         display_sim_state(spectrum, [], [u00], sim)
     
+class TestGridRenderer(unittest.TestCase):
+    def test_small_grid_matches_dense_grid(self):
+        sim = Simulation(1)
+        user = CognitiveUser(sim, 2, 2)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            print_cartesian([["+", "  ", "  ", "  "], ["  ", ". ", ". ", ". "], ["  ", ". ", "c0", ". "], ["  ", ". ", ". ", ". "]])
+        self.assertEqual(GridRenderer(1).frame([user]) + "\n", out.getvalue())
+
+    def test_large_grid_is_downsampled(self):
+        sim = Simulation(10)
+        users = [CognitiveUser(sim, x, y) for (x, y) in [(0, 0), (1, 1), (5000, 5000), (9990, 20)]]
+        lines = GridRenderer(10, viewport=50).lines(users)
+        self.assertEqual(len(lines), 52)
+        self.assertEqual(lines[-2].split()[0], "2")
+        self.assertIn(users[2].id, lines[26])
+        self.assertEqual(set(lines[1]), {" ", "|"})
+
+    def test_redraw_writes_changed_rows(self):
+        sim = Simulation(2)
+        users = [CognitiveUser(sim, 5, 5), CognitiveUser(sim, 20, 20)]
+        out = io.StringIO()
+        renderer = GridRenderer(2, size=30, file=out)
+        self.assertEqual(renderer.redraw(users), 32)
+        self.assertEqual(renderer.redraw(users), 0)
+        # The second user leaves, clearing the five rows it was drawn on.
+        self.assertEqual(renderer.redraw(users[:1]), 5)
+        self.assertTrue(out.getvalue().startswith("\x1b[2J"))
+
+class TestPlotting(unittest.TestCase):
+    def setUp(self):
+        self.sim = Simulation(5)
+        self.freq0 = RadioFrequency(self.sim, 0, 100.0)
+        auth = AuthorizedUser(self.sim, 50, 50, self.freq0)
+        self.cogs = [CognitiveUser(self.sim, 10 * i, 0, True) for i in range(5)]
+        for cog in self.cogs[:3]:
+            auth.grant_frequency(self.freq0, cog)
+            cog.begin_broadcasting(False)
+
+    def test_aggregate_bars(self):
+        (labels, values) = plotting.aggregate_bars([str(i) for i in range(10)], list(range(10)), 4)
+        self.assertEqual(labels, ["0 .. 2", "3 .. 5", "6 .. 8", "9 .. 9"])
+        self.assertEqual(values, [1.0, 4.0, 7.0, 9.0])
+        self.assertEqual(plotting.aggregate_bars(["a"], [1.0], 4), (["a"], [1.0]))
+
+    def test_writes_files_in_background(self):
+        with tempfile.TemporaryDirectory() as plot_dir, plotting.BackgroundRenderer() as renderer:
+            welfare = evaluate_allocation(self.cogs, [self.freq0], self.sim, False, plot_dir, renderer, "svg")
+            renderer.wait()
+            self.assertEqual(welfare, 1.0)
+            self.assertEqual(sorted(os.listdir(plot_dir)), ["pareto.svg", "utilities.svg"])
+
+    def test_writes_aggregated_chart_in_process(self):
+        with tempfile.TemporaryDirectory() as plot_dir:
+            path = os.path.join(plot_dir, "utilities.png")
+            utilities.plot_utility_graph(self.cogs, [self.freq0], self.sim, path, max_bars=2)
+            utilities.plot_lots(self.cogs, [self.freq0], self.sim, os.path.join(plot_dir, "pareto.png"), max_points=2)
+            self.assertTrue(os.path.getsize(path) > 0)
+
 class TestDataRead(unittest.TestCase):
     def test_small_data(self):
         sim = Simulation(5)
         data = read_data.get_small_dataset(sim)
 
+    def write_csv(self, directory, lines):
+        path = os.path.join(directory, "users.csv")
+        with open(path, "w") as file:
+            file.write("user_id,user_type,x_position,y_position,assigned_frequency,willing_to_rent,wants_to_broadcast\n")
+            file.write("\n".join(lines) + "\n")
+        return path
+
+    def describe(self, users, spectrum):
+        return (
+            [(u.id, u.position, type(u.pos_x), u.wants_to_broadcast_now) for u in users],
+            [(f.id, f.owner.id) for f in spectrum.frequencies],
+        )
+
+    def test_engines_and_chunks_agree(self):
+        expected = self.describe(*read_data.process_users(read_data.load_users_from_csv("data_files/large_dataset.csv"), Simulation(5)))
+        for engine in ["csv", "pandas"]:
+            for chunksize in [7, 1000]:
+                loaded = read_data.load_dataset("data_files/large_dataset.csv", Simulation(5), engine, chunksize)
+                self.assertEqual(self.describe(*loaded), expected)
+        self.assertIs(expected[0][0][2], int)
+
+    def test_invalid_rows(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_csv(directory, ["a1,Authorized,1,1,,True,"])
+            with self.assertRaises(ValueError):
+                read_data.load_dataset(path, Simulation(5))
+
+            path = self.write_csv(directory, ["c1,Cognitive,1,1,,,True", "c2,Cognitive,1,1,,,True"])
+            with self.assertRaises(Exception):
+                read_data.load_dataset(path, Simulation(5))
+
+            path = self.write_csv(directory, ["c1,Cognitive,1,1,,,True", "x1,Martian,2,2,,,True", "a1,Authorized,3,3,7,False,"])
+            (users, spectrum) = read_data.load_dataset(path, Simulation(5))
+            self.assertEqual([u.id for u in users], ["c0", "a1"])
+            self.assertEqual(spectrum.get_frequency(7.0).owner, users[1])
+
+    def test_invalid_rows_numbered_across_chunks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            lines = [f"c{i},Cognitive,{i},0,,,True" for i in range(5)]
+            path = self.write_csv(directory, lines + ["x1,Martian,9,9,,,True", "a1,Authorized,8,8,,True,"])
+            for engine in ["csv", "pandas"]:
+                out = io.StringIO()
+                with contextlib.redirect_stdout(out), self.assertRaisesRegex(ValueError, "row 6$"):
+                    read_data.load_dataset(path, Simulation(5), engine, chunksize=4)
+                self.assertEqual(out.getvalue(), "Unknown user type: Martian in row: 5\n")
+
+    def test_binary_round_trip(self):
+        expected = self.describe(*read_data.load_dataset("data_files/large_dataset.csv", Simulation(5)))
+        with tempfile.TemporaryDirectory() as directory:
+            binary_path = os.path.join(directory, "users.npy")
+            self.assertEqual(binary_data.csv_to_binary("data_files/large_dataset.csv", binary_path, chunksize=7), 100)
+            self.assertIsInstance(binary_data.open_scenario(binary_path), np.memmap)
+            for chunksize in [7, 1000]:
+                loaded = binary_data.load_dataset(binary_path, Simulation(5), chunksize)
+                self.assertEqual(self.describe(*loaded), expected)
+
+            csv_path = os.path.join(directory, "users.csv")
+            binary_data.binary_to_csv(binary_path, csv_path)
+            with open(csv_path) as converted, open("data_files/large_dataset.csv") as original:
+                self.assertEqual(converted.read().splitlines(), original.read().splitlines())
+
+    def test_binary_rejects_unknown_types(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_csv(directory, ["c1,Cognitive,1,1,,,True", "x1,Martian,2,2,,,True"])
+            with self.assertRaises(ValueError):
+                binary_data.csv_to_binary(path, os.path.join(directory, "users.npy"))
+
+    def test_csv_engine_does_not_import_pandas(self):
+        code = "import sys; from data_generation import read_data; from radiograph.system import Simulation; read_data.get_small_dataset(Simulation(5)); assert 'pandas' not in sys.modules"
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+class TestGenerateDataset(unittest.TestCase):
+    def test_positions_unique_for_every_distribution(self):
+        for distribution in generate_dataset.DISTRIBUTIONS:
+            rng = np.random.default_rng(1)
+            # Up to every cell of the grid, which a clustered sampler alone would never fill.
+            for num_users in [50, 300, 21 * 21]:
+                (x, y) = generate_dataset.sample_positions(rng, num_users, 20, distribution, clusters=2, cluster_spread=1)
+                self.assertEqual(len(set(zip(x.tolist(), y.tolist()))), num_users)
+                self.assertTrue(((x >= 0) & (x <= 20) & (y >= 0) & (y <= 20)).all())
+        with self.assertRaises(ValueError):
+            generate_dataset.sample_positions(np.random.default_rng(1), 21 * 21 + 1, 20)
+
+    def test_saturated_cluster_on_huge_grid(self):
+        # The one cluster holds a handful of cells, so nearly every position comes from the
+        # fallback, which must not list the 400M cells of the grid.
+        rng = np.random.default_rng(1)
+        (x, y) = generate_dataset.sample_positions(rng, 1000, 20000, "clustered", clusters=1, cluster_spread=0.1)
+        self.assertEqual(len(set(zip(x.tolist(), y.tolist()))), 1000)
+        self.assertTrue(((x >= 0) & (x <= 20000) & (y >= 0) & (y <= 20000)).all())
+
+    def test_seeded_and_loadable(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, name) for name in ["a.csv", "b.csv", "c.npy"]]
+            for path in paths:
+                generate_dataset.generate_dataset(path, 200, 30, 50, 10, seed=7, distribution="hotspot", willing_share=0.5, chunksize=64)
+            with open(paths[0]) as a, open(paths[1]) as b:
+                self.assertEqual(a.read(), b.read())
+
+            (users, spectrum) = read_data.load_dataset(paths[0], Simulation(5))
+            self.assertEqual(sum(isinstance(u, AuthorizedUser) for u in users), 30)
+            (binary_users, _) = binary_data.load_dataset(paths[2], Simulation(5))
+            self.assertEqual([(u.id, u.position, u.wants_to_broadcast_now) for u in users],
+                             [(u.id, u.position, u.wants_to_broadcast_now) for u in binary_users])
+
 class TestMisc(unittest.TestCase):
+    def test_numpy_loaded_on_first_use(self):
+        code = ("import sys, main; from radiograph.system import Simulation; assert 'numpy' not in sys.modules; "
+                "Simulation(5).register_positions([(1, 2)]); assert 'numpy' in sys.modules")
+        subprocess.run([sys.executable, "-c", code], check=True)
+
     def test_users_on_same_freq(self):
         sim = Simulation(5)
         freq1 = RadioFrequency(sim, 1, 107.9)
@@ -274,6 +543,177 @@ class TestMisc(unittest.TestCase):
         with self.assertRaises(Exception):
             u2 = CognitiveUser(sim, 3, 4)
 
+class TestSimulationRegistry(unittest.TestCase):
+    def test_leaving_frees_position_and_id(self):
+        sim = Simulation(5)
+        u1 = CognitiveUser(sim, 3, 4)
+        u2 = CognitiveUser(sim, 5, 6)
+        sim.remove_user(u1)
+
+        u3 = CognitiveUser(sim, 3, 4)
+        self.assertEqual(u3.id, u1.id)
+        self.assertNotEqual(u3.id, u2.id)
+        self.assertEqual(CognitiveUser(sim, 0, 0).uid, 2)
+
+    def test_register_positions(self):
+        sim = Simulation(5)
+        CognitiveUser(sim, 1, 1)
+        ids = sim.register_positions([(0, 0), (2, 3), (4, 4)])
+        self.assertEqual(ids, [1, 2, 3])
+
+        cog = CognitiveUser(sim, 2, 3, True, user_id=ids[1])
+        self.assertEqual(cog.id, "c2")
+        self.assertEqual(cog.position, (2, 3))
+        with self.assertRaises(Exception):
+            CognitiveUser(sim, 4, 4)
+
+    def test_register_positions_is_all_or_nothing(self):
+        sim = Simulation(5)
+        CognitiveUser(sim, 1, 1)
+        with self.assertRaises(Exception):
+            sim.register_positions([(5, 5), (1, 1)])
+        with self.assertRaises(Exception):
+            sim.register_positions([(6, 6), (7, 7), (6, 6)])
+        with self.assertRaises(Exception):
+            sim.register_positions([(8, 8), (-1, 2)])
+
+        self.assertEqual(sim.register_positions([(5, 5), (6, 6), (7, 7), (8, 8)]), [1, 2, 3, 4])
+
+    def test_move_to_same_position(self):
+        sim = Simulation(5)
+        CognitiveUser(sim, 1, 1)
+        sim.move_pos(1, 1, 1, 1)
+        self.assertIn((1, 1), sim.user_positions)
+        with self.assertRaises(Exception):
+            CognitiveUser(sim, 1, 1)
+
+class TestEquilibrium(unittest.TestCase):
+    def setUp(self):
+        self.sim = Simulation(5)
+        self.freq0 = RadioFrequency(self.sim, 0, 100.0)
+        self.freq1 = RadioFrequency(self.sim, 1, 101.1)
+        self.freqs = [self.freq0, self.freq1]
+        self.auth0 = AuthorizedUser(self.sim, 50, 50, self.freq0)
+        self.auth1 = AuthorizedUser(self.sim, 60, 60, self.freq1)
+
+    def test_feasibility_matrix(self):
+        cog0 = CognitiveUser(self.sim, 0, 0, True)
+        cog1 = CognitiveUser(self.sim, 3, 3, True)
+        cog2 = CognitiveUser(self.sim, 20, 0, True)
+        self.auth0.grant_frequency(self.freq0, cog0)
+
+        feasible = utilities.feasibility_matrix([cog0, cog1, cog2], self.freqs, self.sim)
+        self.assertEqual(feasible.tolist(), [[True, True], [False, True], [True, True]])
+
+    def test_unserved_user_deviates_without_mutation(self):
+        cog0 = CognitiveUser(self.sim, 0, 0, True)
+        cog1 = CognitiveUser(self.sim, 20, 0, True)
+        cog2 = CognitiveUser(self.sim, 40, 0, True)
+        self.auth0.grant_frequency(self.freq0, cog0)
+        self.auth0.grant_frequency(self.freq0, cog1)
+        cog0.begin_broadcasting(False)
+        cog1.begin_broadcasting(False)
+
+        cogs = [cog0, cog1, cog2]
+        self.assertEqual(utilities.nash_deviations(cogs, self.freqs, self.sim), [cog0, cog1, cog2])
+        self.assertFalse(utilities.is_nash_equilibrium(cogs, self.freqs, self.sim))
+        self.assertEqual(sorted(u.id for u in self.freq0.assigned_to), sorted([cog0.id, cog1.id]))
+        self.assertEqual(self.freq1.assigned_to, [])
+        self.assertEqual(cog2.active_frequency, None)
+
+    def test_equilibrium(self):
+        cog0 = CognitiveUser(self.sim, 0, 0, True)
+        cog1 = CognitiveUser(self.sim, 3, 0, True)
+        self.auth0.grant_frequency(self.freq0, cog0)
+        self.auth1.grant_frequency(self.freq1, cog1)
+        cog0.begin_broadcasting(False)
+        cog1.begin_broadcasting(False)
+
+        self.assertTrue(utilities.is_nash_equilibrium([cog0, cog1], self.freqs, self.sim))
+
+    def test_pareto_move_to_empty_channel(self):
+        cog0 = CognitiveUser(self.sim, 0, 0, True)
+        cog1 = CognitiveUser(self.sim, 20, 0, True)
+        self.auth0.grant_frequency(self.freq0, cog0)
+        self.auth0.grant_frequency(self.freq0, cog1)
+        cog0.begin_broadcasting(False)
+        cog1.begin_broadcasting(False)
+
+        moves = utilities.pareto_improvements([cog0, cog1], self.freqs, self.sim)
+        self.assertEqual(moves, [(cog0, self.freq1), (cog1, self.freq1)])
+        self.assertFalse(utilities.is_pareto_optimal([cog0, cog1], self.freqs, self.sim))
+        self.assertEqual(cog0.active_frequency, self.freq0)
+
+    def test_pareto_optimal_when_every_move_hurts(self):
+        cog0 = CognitiveUser(self.sim, 0, 0, True)
+        cog1 = CognitiveUser(self.sim, 20, 0, True)
+        cog2 = CognitiveUser(self.sim, 40, 0, True)
+        self.auth0.grant_frequency(self.freq0, cog0)
+        self.auth0.grant_frequency(self.freq0, cog1)
+        self.auth1.grant_frequency(self.freq1, cog2)
+        for cog in [cog0, cog1, cog2]:
+            cog.begin_broadcasting(False)
+
+        # Joining freq1 would halve cog2's utility, and nobody gains by joining freq0.
+        self.assertTrue(utilities.is_pareto_optimal([cog0, cog1, cog2], self.freqs, self.sim))
+
+    def test_idle_occupant_leaving_is_pareto_improvement(self):
+        cog0 = CognitiveUser(self.sim, 0, 0, True)
+        idle = CognitiveUser(self.sim, 20, 0, False)
+        self.auth0.grant_frequency(self.freq0, cog0)
+        self.auth0.grant_frequency(self.freq0, idle)
+        cog0.begin_broadcasting(False)
+
+        moves = utilities.pareto_improvements([cog0, idle], self.freqs, self.sim)
+        self.assertIn((idle, self.freq1), moves)
+
+class TestScenario(unittest.TestCase):
+    def test_instantiate_matches_setup(self):
+        (spectrum, freqs, auths, cogs, sim) = main.setup(False, "large", 13)
+        scenario = Scenario.capture(spectrum, freqs, auths, cogs, sim)
+        (spectrum2, freqs2, auths2, cogs2, sim2) = scenario.instantiate()
+
+        self.assertEqual([(f.id, f.frequency) for f in freqs2], [(f.id, f.frequency) for f in freqs])
+        self.assertEqual([(a.id, a.position, a.assigned_frequency.id) for a in auths2], [(a.id, a.position, a.assigned_frequency.id) for a in auths])
+        self.assertEqual([(c.id, c.position, c.wants_to_broadcast_now) for c in cogs2], [(c.id, c.position, c.wants_to_broadcast_now) for c in cogs])
+        self.assertEqual(spectrum2.owner_of(freqs2[3]), auths2[3])
+        with self.assertRaises(Exception):
+            CognitiveUser(sim2, *cogs[0].position)
+
+    def test_runs_do_not_share_state(self):
+        scenario = main.load_scenario(False, "large", 13)
+        (spectrum, freqs, auths, cogs, sim) = scenario.instantiate()
+        allocate_freqs(spectrum, auths, cogs, sim, False)
+
+        (spectrum2, freqs2, auths2, cogs2, sim2) = scenario.instantiate()
+        self.assertTrue(any(cog.is_broadcasting for cog in cogs))
+        self.assertFalse(any(cog.is_broadcasting for cog in cogs2))
+        self.assertTrue(all(freq.assigned_to == [] for freq in freqs2))
+
+        (spectrum3, freqs3, auths3, cogs3, sim3) = main.setup(False, "large", 13)
+        allocate_freqs(spectrum3, auths3, cogs3, sim3, False)
+        expected = evaluate_allocation(cogs3, freqs3, sim3, False)
+        self.assertEqual(main.run_simulation(False, dataset="large", transmit_dist=13), expected)
+
+class TestMonteCarlo(unittest.TestCase):
+    def test_iterations_are_reproducible(self):
+        scenario = dict(dataset="large", transmit_dist=13)
+        serial = monte_carlo.run_monte_carlo(6, seed=7, **scenario)
+        parallel = monte_carlo.run_monte_carlo(6, seed=7, workers=2, **scenario)
+
+        self.assertEqual(serial["values"], parallel["values"])
+        self.assertEqual(serial["values"][4], monte_carlo.run_iteration(7, 4, **scenario))
+        self.assertNotEqual(monte_carlo.iteration_seed(7, 0), monte_carlo.iteration_seed(7, 1))
+
+    def test_summarize(self):
+        summary = monte_carlo.summarize([1.0, 2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(summary["mean"], 3.0)
+        self.assertEqual(summary["percentiles"][50], 3.0)
+        self.assertLess(summary["ci_low"], 3.0)
+        self.assertGreater(summary["ci_high"], 3.0)
+        with self.assertRaises(ValueError):
+            monte_carlo.summarize([])
+
 class TestFrequencyAllocation(unittest.TestCase):
     def test_cogs_want_broadcast_happy(self):
         sim = Simulation(5)
@@ -361,5 +801,603 @@ class TestFrequencyAllocation(unittest.TestCase):
         self.assertEqual(cog2.is_broadcasting, True)
         self.assertEqual(cog4.is_broadcasting, True)
 
+class TestInterferenceGraph(unittest.TestCase):
+    def test_matches_all_pairs(self):
+        sim = Simulation(5)
+        cogs = [CognitiveUser(sim, x, y, True) for (x, y) in [(0, 0), (3, 4), (4, 4), (10, 10), (14, 13), (30, 2), (9, 5)]]
+
+        graph = build_interference_graph(cogs, sim)
+
+        for i in range(len(cogs)):
+            expected = [j for j in range(len(cogs)) if j != i and is_not_out_of_range(cogs[i], cogs[j], sim)]
+            self.assertEqual(sorted(graph[i]), expected)
+
+    def test_edges_across_cells(self):
+        sim = Simulation(5)
+        cog0 = CognitiveUser(sim, 4, 4)
+        cog1 = CognitiveUser(sim, 6, 6)
+        cog2 = CognitiveUser(sim, 10, 5)
+
+        graph = build_interference_graph([cog0, cog1, cog2], sim)
+        self.assertEqual(sorted(graph[0]), [1])
+        self.assertEqual(sorted(graph[1]), [0, 2])
+        self.assertEqual(sorted(graph[2]), [1])
+
+def random_adjacency(seed, V=80, p=0.08):
+    rng = random.Random(seed)
+    adj = [[] for _ in range(V)]
+    for u in range(V):
+        for w in range(u + 1, V):
+            if rng.random() < p:
+                adj[u].append(w)
+                adj[w].append(u)
+    return adj
+
+class TestGraphCache(unittest.TestCase):
+    def scenario(self, seed, count=300, transmit_dist=8):
+        sim = Simulation(transmit_dist)
+        rng = random.Random(seed)
+        positions = rng.sample([(x, y) for x in range(120) for y in range(120)], count)
+        return ([CognitiveUser(sim, x, y) for (x, y) in positions], sim)
+
+    def test_matches_built_graph_in_any_order(self):
+        (cogs, sim) = self.scenario(0)
+        cache = GraphCache()
+        for seed in range(3):
+            random.Random(seed).shuffle(cogs)
+            expected = build_interference_graph(cogs, sim)
+            self.assertEqual([sorted(neighbors) for neighbors in cache.adjacency(cogs, sim)], [sorted(neighbors) for neighbors in expected])
+        self.assertEqual((cache.misses, cache.hits), (1, 2))
+
+        # A different transmit distance is a different graph.
+        cache.adjacency(cogs, Simulation(3))
+        self.assertEqual(cache.misses, 2)
+
+    def test_disk_and_eviction(self):
+        (cogs, sim) = self.scenario(1)
+        (other_cogs, other_sim) = self.scenario(2)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = GraphCache(directory, max_entries=1)
+            expected = cache.adjacency(cogs, sim)
+            cache.adjacency(other_cogs, other_sim)
+            self.assertEqual(len(cache), 1)
+            self.assertEqual(len(os.listdir(directory)), 4)
+
+            # Evicted from memory, and a new process would start with nothing in memory.
+            for reader in (cache, GraphCache(directory)):
+                self.assertEqual(reader.adjacency(cogs, sim), expected)
+                self.assertEqual(reader.disk_hits, 1)
+
+    def test_cached_allocation_is_unchanged(self):
+        cache = GraphCache()
+        for seed in range(3):
+            leases = []
+            for use_cache in (None, cache):
+                (spectrum, freqs, auths, cogs, sim) = main.load_scenario(True, "large", 25).instantiate()
+                random.Random(seed).shuffle(cogs)
+                allocate_freqs(spectrum, auths, cogs, sim, False, strategy="dsatur", cache=use_cache)
+                leases.append([(cog.uid, cog.active_frequency.id if cog.active_frequency else None) for cog in cogs])
+            self.assertEqual(leases[0], leases[1])
+        self.assertEqual(cache.hits, 2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            welfare = main.run_simulation(False, True, True, "large", 25, rng=random.Random(0), graph_cache=directory)
+            self.assertEqual(welfare, main.run_simulation(False, True, True, "large", 25, rng=random.Random(0)))
+
+    def test_run_simulation_cache_is_opt_in(self):
+        from algorithms.graph_cache import shared_cache
+        lookups = lambda: shared_cache().hits + shared_cache().misses
+        before = lookups()
+        main.run_simulation(False, dataset="large", transmit_dist=13)
+        self.assertEqual(lookups(), before)
+        main.run_simulation(False, dataset="large", transmit_dist=13, graph_cache=True)
+        self.assertEqual(lookups(), before + 1)
+
+class TestColoringStrategies(unittest.TestCase):
+    def test_strategies_give_proper_colorings(self):
+        for name in ["greedy", "largest_first", "smallest_last", "dsatur"]:
+            for seed in range(3):
+                adj = random_adjacency(seed)
+                (V, result) = strategies.get_strategy(name)(adj, len(adj))
+                self.assertEqual(V, len(adj))
+                for u in range(V):
+                    self.assertGreaterEqual(result[u], 0)
+                    for w in adj[u]:
+                        self.assertNotEqual(result[u], result[w], f"{name} gave neighbours {u} and {w} the same color")
+
+    def test_dsatur_beats_bad_order(self):
+        # Crown graph: u_i is adjacent to v_j for i != j.  First-fit in interleaved order
+        # needs one color per pair, but the graph is bipartite.
+        n = 5
+        adj = [[] for _ in range(2 * n)]
+        for i in range(n):
+            for j in range(n):
+                if i != j:
+                    adj[2 * i].append(2 * j + 1)
+                    adj[2 * j + 1].append(2 * i)
+
+        (_, greedy) = strategies.get_strategy("greedy")(adj, 2 * n)
+        (_, dsatur) = strategies.get_strategy("dsatur")(adj, 2 * n)
+        (_, smallest_last) = strategies.get_strategy("smallest_last")(adj, 2 * n)
+        self.assertEqual(max(greedy) + 1, n)
+        self.assertEqual(max(dsatur) + 1, 2)
+        self.assertEqual(max(smallest_last) + 1, 2)
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            strategies.get_strategy("rainbow")
+
+    def test_allocate_with_strategy(self):
+        sim = Simulation(5)
+        freq0 = RadioFrequency(sim, 0, 100.0)
+        freq1 = RadioFrequency(sim, 1, 101.1)
+        spectrum = RadioFrequencySpectrum(sim, freq0, freq1)
+        auths = [AuthorizedUser(sim, 2, 2, freq0, False), AuthorizedUser(sim, 3, 3, freq1, False)]
+        cogs = [CognitiveUser(sim, 3, 4, True), CognitiveUser(sim, 2, 5, True), CognitiveUser(sim, 4, 9, True), CognitiveUser(sim, 9, 2, True)]
+
+        allocate_freqs(spectrum, auths, cogs, sim, False, strategy="dsatur")
+
+        for cog in cogs:
+            self.assertEqual(cog.is_broadcasting, True)
+
+class TestComponentColoring(unittest.TestCase):
+    def clustered_adjacency(self):
+        adj = random_adjacency(0, V=30, p=0.15)
+        # Append three disjoint copies, plus an isolated vertex.
+        V = len(adj)
+        graph = []
+        for copy in range(3):
+            graph.extend([[w + copy * V for w in neighbors] for neighbors in adj])
+        graph.append([])
+        return graph
+
+    def test_connected_components(self):
+        adj = [[1], [0, 2], [1], [], [5], [4]]
+        self.assertEqual(connected_components(adj), [[0, 1, 2], [3], [4, 5]])
+
+    def test_matches_whole_graph_greedy(self):
+        adj = self.clustered_adjacency()
+        (_, whole) = strategies.get_strategy("greedy")(adj, len(adj))
+        (V, by_component) = color_components(adj, "greedy", workers=1, batch_vertices=10)
+        self.assertEqual(V, len(adj))
+        self.assertEqual(by_component, whole)
+
+    def test_parallel_gives_proper_coloring(self):
+        adj = self.clustered_adjacency()
+        (V, result) = color_components(adj, "dsatur", workers=2, batch_vertices=10)
+        for u in range(V):
+            for w in adj[u]:
+                self.assertNotEqual(result[u], result[w])
+
+    def test_allocate_in_parallel(self):
+        sim = Simulation(5)
+        freq0 = RadioFrequency(sim, 0, 100.0)
+        freq1 = RadioFrequency(sim, 1, 101.1)
+        spectrum = RadioFrequencySpectrum(sim, freq0, freq1)
+        auths = [AuthorizedUser(sim, 50, 50, freq0, False), AuthorizedUser(sim, 60, 60, freq1, False)]
+        cogs = [CognitiveUser(sim, 3, 4, True), CognitiveUser(sim, 2, 5, True), CognitiveUser(sim, 30, 30, True), CognitiveUser(sim, 31, 31, True)]
+
+        allocate_freqs(spectrum, auths, cogs, sim, False, workers=2)
+
+        for cog in cogs:
+            self.assertEqual(cog.is_broadcasting, True)
+
+class TestColorClassAssignment(unittest.TestCase):
+    def test_largest_classes_go_to_first_lessors(self):
+        sim = Simulation(5)
+        freqs = [RadioFrequency(sim, i, 100.0 + i) for i in range(3)]
+        lessors = [AuthorizedUser(sim, 100 + 20 * i, 100, freqs[i]) for i in range(3)]
+        classes = [[CognitiveUser(sim, 10 * i, 10 * c) for i in range(size)] for c, size in enumerate([1, 3, 2])]
+
+        matches = assign_color_classes(lessors, classes, sim)
+        self.assertEqual(matches, [(lessors[0], 1), (lessors[1], 2), (lessors[2], 0)])
+
+    def test_avoids_lessor_in_range_of_class(self):
+        sim = Simulation(5)
+        freq0 = RadioFrequency(sim, 0, 100.0)
+        freq1 = RadioFrequency(sim, 1, 101.1)
+        near = AuthorizedUser(sim, 1, 1, freq0)
+        far = AuthorizedUser(sim, 50, 50, freq1)
+        big = [CognitiveUser(sim, 0, 0), CognitiveUser(sim, 2, 2), CognitiveUser(sim, 20, 20)]
+        small = [CognitiveUser(sim, 30, 30)]
+
+        matches = assign_color_classes([near, far], [big, small], sim)
+        self.assertEqual(matches, [(far, 0), (near, 1)])
+
+    def test_more_lessors_than_classes(self):
+        sim = Simulation(5)
+        freqs = [RadioFrequency(sim, i, 100.0 + i) for i in range(4)]
+        auths = [AuthorizedUser(sim, 30 + 10 * i, 30, freqs[i], False) for i in range(4)]
+        cog0 = CognitiveUser(sim, 0, 0, True)
+        cog1 = CognitiveUser(sim, 1, 1, True)
+
+        allocate_freqs(RadioFrequencySpectrum(sim, *freqs), auths, [cog0, cog1], sim, False)
+
+        self.assertEqual(cog0.active_frequency, freqs[0])
+        self.assertEqual(cog1.active_frequency, freqs[1])
+        self.assertEqual(freqs[0].assigned_to, [cog0])
+        self.assertEqual(freqs[1].assigned_to, [cog1])
+        self.assertEqual(freqs[2].assigned_to, [])
+
+class TestTiledAllocation(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "scenario.npy")
+        generate_dataset.generate_dataset(self.path, 1500, 150, 150, 1000, seed=2, distribution="clustered", willing_share=0.3, broadcast_share=0.8)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_one_tile_matches_object_allocation(self):
+        sim = Simulation(6)
+        (users, spectrum) = binary_data.load_dataset(self.path, sim)
+        auths = [user for user in users if isinstance(user, AuthorizedUser)]
+        cogs = [user for user in users if isinstance(user, CognitiveUser)]
+        allocate_freqs(spectrum, auths, cogs, sim, False)
+        expected = [user.active_frequency.frequency if isinstance(user, CognitiveUser) and user.active_frequency else None for user in users]
+
+        result = allocate_tiled(self.path, 6, tile_size=10 ** 6)
+        self.assertEqual(result.num_tiles, 1)
+        self.assertEqual([None if np.isnan(lease) else lease for lease in result.leases.tolist()], expected)
+
+    def test_tiles_reconciled(self):
+        records = binary_data.open_scenario(self.path)
+        positions = np.column_stack((records["x_position"], records["y_position"]))
+        (i, j) = distance.within_range_pairs(positions, 6)
+        for workers in [1, 2]:
+            result = allocate_tiled(self.path, 6, tile_size=20, workers=workers)
+            self.assertGreater(result.num_tiles, 1)
+            self.assertGreater(result.recolored, 0)
+            colored = (result.colors[i] >= 0) & (result.colors[j] >= 0)
+            self.assertFalse((colored & (result.colors[i] == result.colors[j])).any())
+            self.assertFalse((result.leases[i] == result.leases[j]).any())
+
+class TestEvents(unittest.TestCase):
+    class Unprintable:
+        def __str__(self):
+            raise AssertionError("formatted with nothing subscribed")
+
+    def test_nothing_formatted_without_sinks(self):
+        events.emit(events.LEASE_GRANTED, lessor=self.Unprintable(), user=self.Unprintable(), frequency=self.Unprintable())
+
+        sim = Simulation(5)
+        cog = CognitiveUser(sim, 0, 0, True, RadioFrequency(sim, 1, 100.0))
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            cog.begin_broadcasting(False)
+            cog.stop_broadcasting()
+        self.assertEqual(out.getvalue(), "")
+
+    def test_console_sink(self):
+        sim = Simulation(5)
+        freq = RadioFrequency(sim, 1, 100.0)
+        auth = AuthorizedUser(sim, 0, 0, freq)
+        cog = CognitiveUser(sim, 10, 10, True)
+        out = io.StringIO()
+        with events.subscribed(events.ConsoleSink(out, kinds=[events.LEASE_GRANTED, events.RECLAIMED])):
+            auth.grant_frequency(freq, cog)
+            auth.begin_broadcasting(False)
+        self.assertEqual(out.getvalue().splitlines(), [
+            "a0 has leased [Frequency 100.0 (1)] to c1",
+            "a0 has rented out this frequency but it is not being used, so we'll take it back.",
+        ])
+
+    def test_rejected_lease_prints_nothing(self):
+        sim = Simulation(5)
+        freq = RadioFrequency(sim, 1, 100.0)
+        auth = AuthorizedUser(sim, 50, 50, freq)
+        (cog0, cog1) = (CognitiveUser(sim, 0, 0, True), CognitiveUser(sim, 1, 1, True))
+        auth.grant_frequency(freq, cog0)
+        out = io.StringIO()
+        rejected = []
+        sink = events.NullSink()
+        sink.handle = lambda kind, fields: rejected.append(kind)
+        with contextlib.redirect_stdout(out), events.subscribed(sink):
+            auth.grant_frequency(freq, cog1)
+        self.assertIsNone(cog1.active_frequency)
+        self.assertEqual(out.getvalue(), "")
+        self.assertEqual(rejected, [events.ADMISSION_REJECTED])
+
+    def test_json_lines_sink(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "events.jsonl")
+            with events.JsonLinesSink(path, buffer_size=2) as sink, events.subscribed(sink):
+                (spectrum, freqs, auths, cogs, sim) = main.setup(False, "small", 5)
+                allocate_freqs(spectrum, auths, cogs, sim, False)
+            with open(path) as file:
+                records = [json.loads(line) for line in file]
+        granted = [record for record in records if record["kind"] == events.LEASE_GRANTED]
+        self.assertEqual(len(granted), sum(1 for cog in cogs if cog.active_frequency))
+        self.assertEqual(set(granted[0]), {"kind", "lessor", "user", "frequency"})
+        self.assertIsInstance(granted[0]["frequency"], float)
+
+class TestTracing(unittest.TestCase):
+    def test_phases_and_counters(self):
+        with tracing.traced() as tracer:
+            (spectrum, freqs, auths, cogs, sim) = main.setup(True, "small", 5)
+            allocate_freqs(spectrum, auths, cogs, sim, False)
+            evaluate_allocation(cogs, freqs, sim, False)
+        self.assertIsNone(tracing.tracer)
+
+        names = [record["name"] for record in tracer.to_dict()["phases"]]
+        self.assertEqual(names, ["setup", "load", "allocate", "graph", "coloring", "lessor_assignment", "evaluate"])
+        self.assertEqual([record["depth"] for record in tracer.to_dict()["phases"]], [0, 1, 0, 1, 1, 1, 0])
+
+        want = [cog for cog in cogs if cog.wants_to_broadcast_now]
+        graph = build_interference_graph(want, sim)
+        self.assertEqual(tracer.counters[tracing.EDGES], sum(len(neighbors) for neighbors in graph) // 2)
+        self.assertEqual(tracer.counters[tracing.COLORS], max(strategies.greedy_coloring(graph, len(want))[1]) + 1)
+        self.assertGreater(tracer.counters[tracing.DISTANCE_EVALUATIONS], 0)
+
+    def test_peak_memory(self):
+        with tracing.traced(tracing.Tracer(memory=True)) as tracer:
+            with tracing.phase("outer"):
+                with tracing.phase("inner"):
+                    block = bytearray(10_000_000)
+                    del block
+        (inner, outer) = tracer.phases
+        self.assertGreaterEqual(inner["peak_bytes"], 10_000_000)
+        self.assertGreaterEqual(outer["peak_bytes"], inner["peak_bytes"])
+
+    def test_exports(self):
+        with tracing.traced() as tracer:
+            with tracing.phase("work"):
+                tracing.count(tracing.ADMISSION_REJECTIONS, 3)
+        with tempfile.TemporaryDirectory() as directory:
+            tracer.write_json(os.path.join(directory, "trace.json"))
+            tracer.write_chrome_trace(os.path.join(directory, "chrome.json"))
+            with open(os.path.join(directory, "trace.json")) as file:
+                summary = json.load(file)
+            with open(os.path.join(directory, "chrome.json")) as file:
+                chrome = json.load(file)
+        self.assertEqual(summary["counters"], {tracing.ADMISSION_REJECTIONS: 3})
+        self.assertEqual(list(summary["totals"]), ["work"])
+        self.assertEqual([(event["name"], event["ph"]) for event in chrome["traceEvents"]],
+                         [("work", "X"), (tracing.ADMISSION_REJECTIONS, "C")])
+
+class TestEngine(unittest.TestCase):
+    def test_scheduler_order(self):
+        scheduler = engine.EventScheduler()
+        for (at, kind) in [(2.0, "b"), (1.0, "a"), (2.0, "c"), (0.5, "z")]:
+            scheduler.schedule(at, kind)
+        self.assertEqual([scheduler.pop()[1] for _ in range(4)], ["z", "a", "b", "c"])
+        self.assertEqual(scheduler.peek_time(), float("inf"))
+
+    def test_reclaim_evicts_and_reallocates(self):
+        sim = Simulation(5)
+        freqs = [RadioFrequency(sim, i, 100.0 + i) for i in range(2)]
+        auths = [AuthorizedUser(sim, 50 + 10 * i, 50, freqs[i]) for i in range(2)]
+        cogs = [CognitiveUser(sim, 0, 0, True), CognitiveUser(sim, 20, 0, True)]
+        allocate_freqs(RadioFrequencySpectrum(sim, *freqs), auths, cogs, sim, False)
+        self.assertEqual([cog.active_frequency for cog in cogs], [freqs[0], freqs[0]])
+
+        run = engine.Engine(RadioFrequencySpectrum(sim, *freqs), auths, cogs, sim, random.Random(0), arrival_rate=0)
+        run._reclaim(0)
+        self.assertTrue(auths[0].is_broadcasting)
+        self.assertEqual(freqs[0].lessees, {})
+        self.assertEqual([cog.active_frequency for cog in cogs], [freqs[1], freqs[1]])
+        run._release(0)
+        self.assertFalse(auths[0].is_broadcasting)
+        self.assertNotIn(auths[0], freqs[0])
+
+    def test_arrivals_turned_away_when_full(self):
+        sim = Simulation(1)
+        freq = RadioFrequency(sim, 0, 100.0)
+        auth = AuthorizedUser(sim, 0, 0, freq)
+        run = engine.Engine(RadioFrequencySpectrum(sim, freq), [auth], [], sim, random.Random(0), arrival_rate=1.0,
+                            mean_holding=1e9, mean_idle=1e9, max_position=2)
+        stats = run.run(max_events=50)
+        self.assertEqual(stats["events"], 50)
+        self.assertEqual(stats["users"], 8)
+        self.assertEqual(stats["turned_away"], 50 - 8)
+
+    def test_invariants_hold_over_a_run(self):
+        (spectrum, freqs, auths, cogs, sim) = main.setup(False, "large", 13)
+        allocate_freqs(spectrum, auths, cogs, sim, False)
+        run = engine.Engine(spectrum, auths, cogs, sim, random.Random(3), arrival_rate=2.0, mean_holding=20, mean_idle=10, mean_busy=10, max_position=80)
+        stats = run.run(max_events=3000)
+        self.assertEqual(stats["events"], 3000)
+        self.assertGreater(stats["by_kind"][engine.RECLAIM], 0)
+
+        users = list(run.graph.neighbors)
+        self.assertEqual(len(sim.user_positions), len(users) + len(auths))
+        for user in users:
+            band = user.active_frequency
+            if band is None:
+                self.assertIn(user, run.waiting)
+                continue
+            self.assertNotIn(user, run.waiting)
+            self.assertFalse(band.owner.is_broadcasting)
+            self.assertIn(user, band.lessees)
+            for neighbor in run.graph.neighbors[user]:
+                self.assertIsNot(neighbor.active_frequency, band)
+
+class TestDynamicGraph(unittest.TestCase):
+    def test_matches_rebuild_after_moves(self):
+        sim = Simulation(5)
+        cogs = [CognitiveUser(sim, x, y, True) for (x, y) in [(0, 0), (3, 4), (12, 12), (20, 3), (8, 8)]]
+        graph = InterferenceGraph(sim, cogs)
+
+        graph.move_user(cogs[0], 10, 10)
+        graph.move_user(cogs[3], 4, 6)
+
+        rebuilt = build_interference_graph(cogs, sim)
+        self.assertEqual([sorted(n) for n in graph.adjacency(cogs)], [sorted(n) for n in rebuilt])
+        self.assertTrue(graph.are_neighbors(cogs[0], cogs[2]))
+        self.assertFalse(graph.are_neighbors(cogs[0], cogs[1]))
+
+    def test_positions_stay_consistent(self):
+        sim = Simulation(5)
+        cog0 = CognitiveUser(sim, 0, 0)
+        cog1 = CognitiveUser(sim, 3, 4)
+        graph = InterferenceGraph(sim, [cog0, cog1])
+
+        with self.assertRaises(Exception):
+            graph.move_user(cog0, 3, 4)
+        self.assertEqual(cog0.position, (0, 0))
+
+        graph.move_user(cog0, 1, 1)
+        self.assertEqual(cog0.position, (1, 1))
+        CognitiveUser(sim, 0, 0)
+        with self.assertRaises(Exception):
+            CognitiveUser(sim, 1, 1)
+
+        graph.remove_user(cog1)
+        self.assertNotIn(cog1, graph)
+        self.assertEqual(graph.adjacency([cog0]), [[]])
+        CognitiveUser(sim, 3, 4)
+
+    def test_remove_assigned_user(self):
+        sim = Simulation(5)
+        freq0 = RadioFrequency(sim, 0, 100.0)
+        auth0 = AuthorizedUser(sim, 20, 20, freq0, False)
+        cog0 = CognitiveUser(sim, 0, 0, True)
+        graph = InterferenceGraph(sim, [cog0])
+        auth0.grant_frequency(freq0, cog0)
+        cog0.begin_broadcasting(False)
+
+        graph.remove_user(cog0)
+        self.assertNotIn(cog0, freq0.assigned_to)
+        self.assertEqual(freq0.lessees, {})
+        self.assertIsNone(cog0.active_frequency)
+        self.assertIsNone(auth0.has_rented_frequency)
+
+        # A new user at the same spot gets the recycled id and is admitted to the same band.
+        cog1 = CognitiveUser(sim, 0, 0, True)
+        self.assertEqual(cog1.uid, cog0.uid)
+        auth0.grant_frequency(freq0, cog1)
+        self.assertIs(cog1.active_frequency, freq0)
+        self.assertEqual(freq0.assigned_to, [cog1])
+
+    def test_remove_lessee_emits_events(self):
+        sim = Simulation(5)
+        freq0 = RadioFrequency(sim, 0, 100.0)
+        auth0 = AuthorizedUser(sim, 20, 20, freq0, False)
+        cog0 = CognitiveUser(sim, 0, 0, True)
+        graph = InterferenceGraph(sim, [cog0])
+        auth0.grant_frequency(freq0, cog0)
+        cog0.begin_broadcasting(False)
+
+        seen = []
+        sink = events.NullSink()
+        sink.handle = lambda kind, fields: seen.append((kind, fields["user"]))
+        with events.subscribed(sink):
+            graph.remove_user(cog0)
+        self.assertEqual(seen, [(events.BROADCAST_STOPPED, cog0), (events.LEASE_REVOKED, cog0)])
+        self.assertFalse(freq0.is_active)
+
+    def test_remove_lessor(self):
+        sim = Simulation(5)
+        freq0 = RadioFrequency(sim, 0, 100.0)
+        auth0 = AuthorizedUser(sim, 20, 20, freq0, False)
+        cogs = [CognitiveUser(sim, 0, 0, True), CognitiveUser(sim, 10, 0, True)]
+        graph = InterferenceGraph(sim, [auth0] + cogs)
+        for cog in cogs:
+            auth0.grant_frequency(freq0, cog)
+            cog.begin_broadcasting(False)
+
+        graph.remove_user(auth0)
+        self.assertIsNone(freq0.owner)
+        self.assertEqual(freq0.lessees, {})
+        self.assertEqual(freq0.assigned_to, [])
+        self.assertFalse(freq0.is_active)
+        for cog in cogs:
+            self.assertIsNone(cog.active_frequency)
+            self.assertIsNone(cog.renting_from)
+            self.assertFalse(cog.is_broadcasting)
+
+    def test_remove_broadcasting_owner(self):
+        sim = Simulation(5)
+        freq0 = RadioFrequency(sim, 0, 100.0)
+        auth0 = AuthorizedUser(sim, 20, 20, freq0, True)
+        graph = InterferenceGraph(sim, [auth0])
+        auth0.begin_broadcasting(False)
+
+        graph.remove_user(auth0)
+        self.assertFalse(freq0.is_active)
+        self.assertNotIn(auth0, freq0)
+
+    def test_allocate_with_dynamic_graph(self):
+        sim = Simulation(5)
+        freq0 = RadioFrequency(sim, 0, 100.0)
+        spectrum = RadioFrequencySpectrum(sim, freq0)
+        auth0 = AuthorizedUser(sim, 20, 20, freq0, False)
+        cog0 = CognitiveUser(sim, 0, 0, True)
+        cog1 = CognitiveUser(sim, 1, 1, True)
+        graph = InterferenceGraph(sim, [cog0, cog1])
+
+        graph.move_user(cog1, 9, 9)
+        allocate_freqs(spectrum, [auth0], [cog0, cog1], sim, False, graph)
+
+        self.assertEqual(cog0.is_broadcasting, True)
+        self.assertEqual(cog1.is_broadcasting, True)
+
+class TestDistanceKernel(unittest.TestCase):
+    def test_mask_matches_scalar(self):
+        a = [(0, 0), (3, 4), (10, 10)]
+        b = [(0, 5), (6, 8), (2, 2), (15, 10)]
+        mask = distance.within_range_mask(a, b, 5)
+        for i, (x1, y1) in enumerate(a):
+            for j, (x2, y2) in enumerate(b):
+                self.assertEqual(bool(mask[i, j]), distance.within_range(x1, y1, x2, y2, 5))
+
+    def test_blocks_cover_mask(self):
+        a = [(x, x % 7) for x in range(50)]
+        b = [(x % 11, x) for x in range(30)]
+        full = distance.within_range_mask(a, b, 6)
+        rows = 0
+        for start, mask in distance.within_range_blocks(a, b, 6, block_size=64):
+            self.assertTrue((mask == full[start:start + len(mask)]).all())
+            rows += len(mask)
+        self.assertEqual(rows, len(a))
+
+    def test_pairs_match_brute_force(self):
+        rng = random.Random(3)
+        positions = [(rng.uniform(0, 60), rng.uniform(0, 60)) for _ in range(300)]
+        (i, j) = distance.within_range_pairs(positions, 7, block_size=50)
+        found = set(zip(i.tolist(), j.tolist()))
+
+        expected = set()
+        for p in range(len(positions)):
+            for q in range(p + 1, len(positions)):
+                if distance.within_range(*positions[p], *positions[q], 7):
+                    expected.add((p, q))
+        self.assertEqual(found, expected)
+
+class TestPipelineBenchmark(unittest.TestCase):
+    def test_baseline_comparison(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline_path = os.path.join(directory, "baseline.json")
+            command = [sys.executable, "-m", "benchmarks.pipeline", "--users", "200", "--transmit-dist", "5", "--baseline", baseline_path]
+            subprocess.run(command + ["--save-baseline"], capture_output=True, check=True)
+            with open(baseline_path) as file:
+                self.assertEqual(list(json.load(file)), ["200@5"])
+            result = subprocess.run(command + ["--threshold", "100"], capture_output=True, text=True, check=True)
+        self.assertIn("No case regressed", result.stdout)
+
+        from benchmarks.pipeline import regressions
+        baseline = {"seconds": 1.0, "peak_mb": 100.0, "colors": 5}
+        self.assertEqual(regressions({"seconds": 1.2, "peak_mb": 100.0, "colors": 5}, baseline, 0.25, 0.05), [])
+        self.assertEqual(len(regressions({"seconds": 1.5, "peak_mb": 200.0, "colors": 7}, baseline, 0.25, 0.05)), 3)
+        # Small cases only vary by noise, so slowdowns under the noise floor are let through.
+        self.assertEqual(regressions({"seconds": 0.02, "peak_mb": 1.0, "colors": 1}, {"seconds": 0.01}, 0.25, 0.05), [])
+
+class TestImports(unittest.TestCase):
+    def loaded_after_import(self, module):
+        code = f"import sys, {module}; print(' '.join(sorted(m for m in ('numpy', 'pandas', 'matplotlib') if m in sys.modules)))"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        return result.stdout.split()
+
+    def test_simulation_import_is_light(self):
+        self.assertEqual(self.loaded_after_import("radiograph.simulation"), [])
+
+    def test_main_import_is_light(self):
+        self.assertEqual(self.loaded_after_import("main"), [])
+
+    def test_numpy_loaded_on_use(self):
+        sim = Simulation(5)
+        self.assertEqual(sim.register_positions([(1, 2), (3, 4)]), [0, 1])
+        self.assertTrue(utilities.is_nash_equilibrium([], [], sim))
+
 if __name__ == '__main__':
     unittest.main()